@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark of the prognostic and diffusion kernels: time per step of
+the slice based stencils (prognostics.py, diffusion.py) compared to the
+former kernels based on index arrays (fancy indexing).
+
+Usage:  python bench_stencil.py             (grids 150x60 and 1500x200)
+        python bench_stencil.py nx nz
+"""
+
+import sys
+from timeit import repeat
+
+import numpy as np
+
+from config import Config
+from prognostics import prog_isendens, prog_velocity, prog_tracers
+from diffusion import horizontal_diffusion, DiffusionOperator
+
+
+def setup_config(nx, nz):
+    """
+    Configuration of the namelist with the grid size nx, nz (and a moist
+    configuration with latent heating).
+    """
+    return Config.from_namelist('namelist', nx=nx, nz=nz, idbg=0, imoist=1,
+                                imoist_diff=1, idthdt=1, irelax=1)
+
+
+def fancy_step(config, sold, snow, uold, unow, mtg, qold, qnow, dthetadt, tau,
+               dtdx):
+    """
+    One step of the former kernels using index arrays.
+    """
+    nx, nb, nz, nxb, dt, dth = config.nx, config.nb, config.nz, config.nxb, \
+        config.dt, config.dth
+    k = np.arange(1, nz-1)
+
+    # isentropic density
+    snew = np.zeros((nxb, nz))
+    i = nb + np.arange(0, nx)
+    snew[i, :] = sold[i, :] - dtdx/2 * ((unow[i+1, :]+unow[i+2, :]) *
+                 snow[i+1, :] - (unow[i-1, :]+unow[i, :]) * snow[i-1, :])
+    ii, kk = np.ix_(i, k)
+    snew[ii, kk] = snew[ii, kk] - dt/dth * (snow[ii, kk+1]-snow[ii, kk-1]) * \
+        (dthetadt[ii, kk]+dthetadt[ii, kk+1]) / 2
+
+    # tracers
+    qnew = np.zeros(qnow.shape)
+    qnew[:, i, :] = qold[:, i, :] - dtdx/2 * ((qnow[:, i+1, :] -
+                    qnow[:, i-1, :]) * (unow[i, :] + unow[i+1, :]))
+    qnew[:, ii, kk] = qnew[:, ii, kk] - dt/dth * (qnow[:, ii, kk+1] -
+        qnow[:, ii, kk-1]) * (dthetadt[ii, kk]+dthetadt[ii, kk+1]) / 2
+
+    # velocity
+    unew = np.zeros((nx+1+2*nb, nz))
+    i = nb + np.arange(0, nx+1)
+    unew[i, :] = uold[i, :] - unow[i, :] * dtdx * (unow[i+1, :] -
+                 unow[i-1, :]) - 2*dtdx*(mtg[i, :]-mtg[i-1, :])
+    ii, kk = np.ix_(i, k)
+    unew[ii, kk] = unew[ii, kk] - dt/dth * (unow[ii, kk+1]-unow[ii, kk-1]) * \
+        (dthetadt[ii, kk+1]+dthetadt[ii-1, kk+1] + dthetadt[ii, kk] +
+         dthetadt[ii-1, kk]) / 4
+
+    # diffusion
+    taumat = np.ones(unew.shape)*tau
+    sel = taumat > 0
+    i = np.arange(nb, nx+1+nb)
+    unew[i, :] = (unew[i, :] + taumat[i, :]*(unew[i-1, :] - 2.*unew[i, :] +
+                  unew[i+1, :])/4.)*sel[i, :] + unew[i, :]*~sel[i, :]
+    i = np.arange(nb, nx+nb)
+    snew[i, :] = (snew[i, :] + taumat[i, :]*(snew[i-1, :] - 2.*snew[i, :] +
+                  snew[i+1, :])/4.)*sel[i, :] + snew[i, :]*~sel[i, :]
+    qnew[:, i, :] = (qnew[:, i, :] + taumat[i, :]*(qnew[:, i-1, :] -
+                     2.*qnew[:, i, :] + qnew[:, i+1, :])/4.)*sel[i, :] + \
+        qnew[:, i, :]*~sel[i, :]
+
+    return snew, unew, qnew
+
+
+def bench(nx, nz, number=20):
+    config = setup_config(nx, nz)
+
+    rng = np.random.default_rng(0)
+    nxb, nxb1, nb = config.nxb, config.nxb1, config.nb
+    sold, snow = 100. + rng.random((2, nxb, nz))
+    uold, unow = 10. + rng.random((2, nxb1, nz))
+    mtg = 3e5 + rng.random((nxb, nz))
+    qold, qnow = 1e-3*rng.random((2, 3, nxb, nz))
+    dthetadt = 1e-3*rng.random((nxb, nz+1))
+    tau = np.full(nz, 0.1)
+    tau[-nz//2:] = np.linspace(0.1, 1., nz//2)
+    diffop = DiffusionOperator(tau)
+    dtdx = config.dt/config.dx
+
+    snew = np.zeros_like(snow)
+    unew = np.zeros_like(unow)
+    qnew = np.zeros_like(qnow)
+
+    def slice_step():
+        prog_isendens(config, sold, snow, unow, dtdx, dthetadt, snew=snew)
+        prog_tracers(config, unow, qold, qnow, dtdx, dthetadt, qnew=qnew)
+        prog_velocity(config, uold, unow, mtg, dtdx, dthetadt, unew=unew)
+        horizontal_diffusion(config, diffop, unew, snew, qnew=qnew)
+
+    def fancy():
+        return fancy_step(config, sold, snow, uold, unow, mtg, qold, qnow,
+                          dthetadt, tau, dtdx)
+
+    # both kernels give the same result on the interior
+    slice_step()
+    sref, uref, qref = fancy()
+    i, iu = slice(nb, nb+nx), slice(nb, nb+nx+1)
+    assert np.array_equal(snew[i], sref[i])
+    assert np.array_equal(unew[iu], uref[iu])
+    assert np.array_equal(qnew[:, i], qref[:, i])
+
+    t_fancy = min(repeat(fancy, number=number, repeat=5))/number
+    t_slice = min(repeat(slice_step, number=number, repeat=5))/number
+    print('grid %5d x %3d: fancy indexing %8.3f ms/step, slices %8.3f '
+          'ms/step, speedup %5.2f' % (nx, nz, 1e3*t_fancy, 1e3*t_slice,
+                                      t_fancy/t_slice))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        bench(int(sys.argv[1]), int(sys.argv[2]))
+    else:
+        for nx, nz in ((150, 60), (1500, 200)):
+            bench(nx, nz)
+
+# END OF BENCH_STENCIL.PY
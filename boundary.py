@@ -1,49 +1,104 @@
 # -*- coding: utf-8 -*-
 import numpy as np
+from stencil import work
 
 
 def periodic(phi,nx,nb):
     """
     This subroutine makes the array phi(n1,n2) periodic. At the left
     and right border the number of 'nb' points is overwritten. The
-    periodicity of this operation is 'nx'.
+    periodicity of this operation is 'nx'. A stack of fields
+    phi(ntracer,n1,n2) or an ensemble phi(nens,n1,n2) is treated in one
+    operation.
     Based on periodic.m from the full isentropic model in MATLAB, 2014.
 
     Input:  periodic(phi,nx,nb)
     Output: phi
     """
-    phi[0:nb,:] = phi[nx:(nb+nx),:]
-    phi[(nb+nx):(nx+2*nb),:] = phi[nb:(2*nb),:]
+    phi[...,0:nb,:] = phi[...,nx:(nb+nx),:]
+    phi[...,(nb+nx):(nx+2*nb),:] = phi[...,nb:(2*nb),:]
 
     return phi
 
 
-def relax(phi,nx,nb,phi1,phi2):
+# relaxation weights of the standard 8 point relaxation zone
+rel8 = np.array([1, 0.99, 0.95, 0.8, 0.5, 0.2, 0.05, 0.01])
+
+
+def relax_weights(nr=8):
+    """
+    Relaxation weights for a relaxation zone of nr grid points, obtained
+    by stretching the standard 8 point profile (identical for nr = 8).
+
+    Input:  relax_weights(nr)
+    Output: rel
+    """
+    return np.interp(np.linspace(0,7,nr),np.arange(8),rel8)
+
+
+class RelaxOperator:
     """
-    Relaxation of boundary conditions.
+    Relaxation of boundary conditions over nr grid points on each side
+    of a field with n points in x. The weight profiles are computed once;
+    every call updates both relaxation zones with one broadcast operation
+    per side, in place. phi can be a single field phi(n,nz), a stack
+    phi(ntracer,n,nz) with boundary values (ntracer,nz) (or an ensemble
+    phi(nens,n,nz), or both), or a 1-D array.
     Based on relax.m from the full isentropic model in MATLAB, 2014.
 
-    Input:  relax(phi,nx,nb,phi1,phi2)
-    Output: phi
+    Usage:  relop = RelaxOperator(nx+2*nb,nr)
+            relop.apply(phi,phi1,phi2)
     """
 
-    # Relaxation is done over nr grid points
-    nr = 8
-    n = 2*nb + nx
+    def __init__(self,n,nr=8):
+        rel = relax_weights(nr)
 
-    # initialize relaxation array
-    rel = np.array([1, 0.99, 0.95, 0.8, 0.5, 0.2, 0.05, 0.01])
+        # left zone: points 0...nr-1, right zone: points n-nr...n-1
+        self.left = slice(0,nr)
+        self.right = slice(n-nr,n)
+        self.wl = rel[:,np.newaxis]
+        self.wr = rel[::-1,np.newaxis]
+        self.wl1 = 1 - self.wl
+        self.wr1 = 1 - self.wr
 
-    # relaxation boundary conditions
-    if len(list(phi.shape)) == 2: #Marina: phi.ndim == 2
-        for i in range(0,nr):
-            phi[i,:] = phi1*rel[i] + phi[i,:]*(1 - rel[i])
-            phi[n-1-i,:] = phi2*rel[i] + phi[n-1-i,:]*(1 - rel[i])
-    else:
-        for i in range(0,nr):
-            phi[i] = phi1*rel[i] + phi[i]*(1 - rel[i])
-            phi[n-1-i] = phi2*rel[i] + phi[n-1-i]*(1 - rel[i])
+    def _relax_zone(self,phi,bnd,zone,w,w1):
+        # phi[zone] = bnd*w + phi[zone]*(1-w)
+        phiz = phi[...,zone,:]
+        tmp = work(phiz.shape,phi.dtype,5)
+        np.multiply(bnd[...,np.newaxis,:],w,out=tmp)
+        np.multiply(phiz,w1,out=phiz)
+        np.add(phiz,tmp,out=phiz)
 
-    return phi
+    def apply(self,phi,phi1,phi2):
+        """
+        Relax phi towards the boundary values phi1 (left) and phi2 (right).
+
+        Input:  apply(phi,phi1,phi2)
+        Output: phi
+        """
+        if phi.ndim == 1:
+            phi2d = phi[:,np.newaxis]
+            phi1 = np.reshape(phi1,(1,))
+            phi2 = np.reshape(phi2,(1,))
+        else:
+            phi2d = phi
+            phi1 = np.asarray(phi1)
+            phi2 = np.asarray(phi2)
+
+        self._relax_zone(phi2d,phi1,self.left,self.wl,self.wl1)
+        self._relax_zone(phi2d,phi2,self.right,self.wr,self.wr1)
+
+        return phi
+
+
+def relax(phi,nx,nb,phi1,phi2,nr=8):
+    """
+    Relaxation of boundary conditions over nr grid points.
+    Based on relax.m from the full isentropic model in MATLAB, 2014.
+
+    Input:  relax(phi,nx,nb,phi1,phi2,nr)
+    Output: phi
+    """
+    return RelaxOperator(2*nb + nx,nr).apply(phi,phi1,phi2)
 
 # END OF BOUNDARY.PY
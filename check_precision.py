@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Verification of the single precision run modes: runs the model with the
+exercise namelists in double precision and with the float32 modes of the
+namelist option 'precision', and reports the field-wise error of every
+output field against the double precision run. For ex5 the runs are also
+compared to the stored reference output_ex5.npz.
+
+The error of a field is given as the maximum absolute difference and as
+the maximum difference relative to the maximum magnitude of the field in
+the reference.
+
+Usage:  python check_precision.py               (ex2, ex4, ex5; single)
+        python check_precision.py namelist_ex5 [single tracers ...]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from config import Config
+from model import run
+
+namelists = ('namelist_ex2', 'namelist_ex4', 'namelist_ex5')
+reference = {'namelist_ex5': 'output_ex5.npz'}
+
+# output fields (time, z, x) and (time, x)
+fields = ('height', 'horizontal_velocity', 'isentropic_density',
+          'specific_humidity', 'specific_cloud_liquid_water_content',
+          'specific_rain_water_content', 'accumulated_precipitation',
+          'precipitation_rate', 'cloud_number_density', 'rain_number_density',
+          'latent_heat_tendency')
+
+
+def run_model(nlname, precision, out_fname):
+    """
+    Run the model with the namelist nlname in the given precision and
+    write the output to out_fname.npz.
+    """
+    config = Config.from_namelist(nlname, precision=precision,
+                                  out_fname=out_fname, itime=0, iprtcfl=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(config).write()
+    return np.load(out_fname + '.npz')
+
+
+def field_errors(ref, out):
+    """
+    Maximum absolute and relative error of the fields in out against ref.
+
+    Input:  field_errors(ref,out)
+    Output: {name: (abs_err, rel_err)}
+    """
+    err = {}
+    for name in fields:
+        if name in ref.files and name in out.files:
+            a, b = ref[name], out[name]
+            abs_err = np.max(np.abs(b - a))
+            scale = np.max(np.abs(a))
+            err[name] = (abs_err, abs_err/scale if scale > 0 else abs_err)
+    return err
+
+
+def report(title, err):
+    print(title)
+    for name, (abs_err, rel_err) in err.items():
+        print('    %-38s abs %10.3e   rel %10.3e' % (name, abs_err, rel_err))
+
+
+def check(nlname, precisions, outdir):
+    """
+    Run nlname in double precision and the given precisions and report
+    the errors.
+    """
+    out = {}
+    for precision in ('double',) + tuple(precisions):
+        out_fname = os.path.join(outdir, '%s_%s' % (nlname, precision))
+        out[precision] = run_model(nlname, precision, out_fname)
+
+    for precision in precisions:
+        report('%s: %s against double' % (nlname, precision),
+               field_errors(out['double'], out[precision]))
+
+    if nlname in reference and os.path.exists(reference[nlname]):
+        ref = np.load(reference[nlname])
+        for precision in ('double',) + tuple(precisions):
+            report('%s: %s against %s' % (nlname, precision,
+                                          reference[nlname]),
+                   field_errors(ref, out[precision]))
+
+
+if __name__ == '__main__':
+    nls = [a for a in sys.argv[1:] if a.startswith('namelist')]
+    precisions = [a for a in sys.argv[1:] if not a.startswith('namelist')]
+    with tempfile.TemporaryDirectory() as outdir:
+        for nlname in (nls or namelists):
+            check(nlname, tuple(precisions or ['single']), outdir)
+
+# END OF CHECK_PRECISION.PY
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Checkpoints of the model state for restarting long integrations.
+
+A checkpoint is a .npz file with the arrays of the model state at the end
+of a time step. It is written under a temporary name and then renamed, so
+an interrupted write leaves the previous checkpoint intact.
+"""
+
+import os
+import numpy as np
+
+
+def write_checkpoint(fname,arrays):
+    """
+    Write the arrays (dict name: array) to fname.npz atomically.
+
+    Input:  write_checkpoint(fname,arrays)
+    Output: none
+    """
+    tmp = fname + '.tmp.npz'
+    with open(tmp,'wb') as f:
+        np.savez(f,**arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp,fname + '.npz')
+
+
+def read_checkpoint(fname):
+    """
+    Read all arrays of the checkpoint fname.npz.
+
+    Input:  read_checkpoint(fname)
+    Output: arrays (dict name: array)
+    """
+    with np.load(fname + '.npz') as data:
+        return {name: data[name] for name in data.files}
+
+
+def restore(arrays,saved):
+    """
+    Copy the saved arrays into the arrays of the model, in place. Output
+    fields (nout,...) of a run with fewer output steps fill the first
+    output steps, such that a run can be continued beyond its end time.
+
+    Input:  restore(arrays,saved)
+    Output: none
+    """
+    for name, phi in arrays.items():
+        if name not in saved:
+            raise ValueError('checkpoint: %s is missing' % name)
+        val = saved[name]
+        if val.shape == phi.shape:
+            phi[...] = val
+        elif val.ndim > 0 and val.shape[1:] == phi.shape[1:] and \
+                len(val) <= len(phi):
+            phi[:len(val)] = val
+        else:
+            raise ValueError('checkpoint: %s has the shape %s instead of %s'
+                             % (name, val.shape, phi.shape))
+
+# END OF CHECKPOINT.PY
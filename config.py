@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Model configuration as an explicit object instead of the module namelist.
+
+Config holds all namelist options and the quantities derived from them.
+It is created from one of the namelist files (or directly) and passed to
+model.run, which passes it on to the functions and operators of the model
+modules. Any number of configurations can thus be run one after the
+other (or side by side) in the same process.
+
+Usage:  config = Config.from_namelist('namelist_ex5', topomx=1500)
+        config = dataclasses.replace(config, u00=20.)
+"""
+
+import importlib.util
+from dataclasses import dataclass, field, fields
+
+
+@dataclass
+class Config:
+    """
+    Namelist options (see namelist.py for their meaning). The defaults are
+    the values of namelist.py, except for the options that are missing in
+    the older namelists (mtn_topo, ..., h_moistLayer_low, imoist_pert),
+    which default to the behaviour of the original model.
+
+    The derived quantities (dx, dth, nts, nout, ...) are computed from the
+    options and can not be set.
+    """
+
+    # topography and moisture setups
+    mtn_topo: int = 0
+    leeHill_rel: float = 5/8
+    w_ratio: float = 5/16
+    h_ratio: float = 3/4
+    surf_friction: int = 0
+    moist_setup: int = 0
+    h_moistLayer_up: int = 12
+    h_moistLayer_low: int = 6
+    imoist_pert: int = 0
+
+    # output control
+    out_fname: str = 'outputs/output_ws'
+    iout: float = 1800
+    iiniout: int = 1
+    icheckpoint: int = 0
+    irestart: int = 0
+    istream: int = 0
+    nout_queue: int = 0
+    out_compress: str = 'none'
+    out_dtype: str = 'float64'
+    out_quant: dict = field(default_factory=dict)
+
+    # domain size
+    xl: float = 150000.
+    nx: int = 150
+    thl: float = 60.
+    nz: int = 60
+    dt: float = 2
+    diff: float = 0.3
+    time: float = 12*60*60
+
+    # topography
+    topomx: float = 1000
+    topowd: float = 20000
+    topotim: float = 7200
+
+    # initial atmosphere
+    u00: float = 0.
+    bv00: float = 0.01
+    th00: float = 280.
+    ishear: int = 1
+    k_shl: int = 6
+    k_sht: int = 12
+    u00_sh: float = 10.
+
+    # boundaries
+    nab: int = 30
+    diffabs: float = 1.
+    irelax: int = 1
+    nb: int = 2
+    nrelax: int = 8
+
+    # floating point precision
+    precision: str = 'double'
+    prs_double: int = 1
+
+    # print options
+    idbg: int = 0
+    iprtcfl: int = 1
+    itime: int = 1
+
+    # physics: moisture
+    imoist: int = 1
+    imoist_diff: int = 1
+    imicrophys: int = 1
+    idthdt: int = 1
+    iern: int = 0
+    ithermo_tab: int = 1
+    micro_thresh: float = 1e-12
+    irain_tab: int = 1
+
+    # Kessler scheme
+    vt_mult: float = 1.
+    autoconv_th: float = 0.0001
+    autoconv_mult: float = 2.
+    sediment_on: int = 1
+
+    # physical constants
+    g: float = 9.81
+    cp: float = 1004.
+    r: float = 287.
+    r_v: float = 461.
+    pref: float = 100*1000.
+    z00: float = 0.
+
+    # derived quantities
+    dx: float = field(init=False)
+    rdcp: float = field(init=False)
+    cpdr: float = field(init=False)
+    prs00: float = field(init=False)
+    exn00: float = field(init=False)
+    dth: float = field(init=False)
+    nts: float = field(init=False)
+    nout: int = field(init=False)
+    nx1: int = field(init=False)
+    nz1: int = field(init=False)
+    nxb: int = field(init=False)
+    nxb1: int = field(init=False)
+
+    def __post_init__(self):
+        # as in the namelist files
+        self.dx = self.xl/self.nx
+        self.rdcp = self.r/self.cp
+        self.cpdr = self.cp/self.r
+        self.prs00 = self.pref
+        self.exn00 = self.cp*(self.prs00/self.pref)**self.rdcp
+        self.dth = self.thl/self.nz
+        self.nts = round(self.time/self.dt,0)
+        self.nout = int(self.nts/self.iout)
+        self.nx1 = self.nx + 1
+        self.nz1 = self.nz + 1
+        self.nxb = self.nx + 2*self.nb
+        self.nxb1 = self.nx1 + 2*self.nb
+
+    @classmethod
+    def from_namelist(cls,name='namelist',**overrides):
+        """
+        Configuration of the namelist module name (e.g. 'namelist_ex5'),
+        with the options in overrides replaced. Options missing in the
+        namelist take the defaults of Config.
+
+        Input:  Config.from_namelist(name,**overrides)
+        Output: config
+        """
+        # the file is executed anew: a previously imported (and possibly
+        # modified) namelist module never leaks into the result
+        origin = importlib.util.find_spec(name).origin
+        spec = importlib.util.spec_from_file_location('_' + name, origin)
+        namelist = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(namelist)
+        options = {f.name: getattr(namelist,f.name) for f in fields(cls)
+                   if f.init and hasattr(namelist,f.name)}
+        options.update(overrides)
+        return cls(**options)
+
+
+# options of the initial state, in which the members of an ensemble run
+# can differ (see model.run)
+member_options = ('u00', 'u00_sh', 'ishear', 'k_shl', 'k_sht', 'surf_friction',
+                  'topomx', 'topowd', 'mtn_topo', 'leeHill_rel', 'w_ratio',
+                  'h_ratio', 'moist_setup', 'h_moistLayer_up',
+                  'h_moistLayer_low', 'imoist_pert')
+
+# END OF CONFIG.PY
@@ -1,17 +1,20 @@
 # -*- coding: utf-8 -*-
+import copy
 import numpy as np
-from namelist import idbg, nz, g, dth, cp, pref, rdcp		# global variables
 
-def diag_montgomery(prs,mtg, exn, th0,topo,topofact):
+def diag_montgomery(config,prs,mtg, exn, th0,topo,topofact):
     """
     Diagnostic computation of Montgomery
     Calculate Exner function and Montgomery potential.
     Based on diag_montgomery.m from the full isentropic model in MATLAB, 2014.
 
-    Input:  diag_montgomery(prs,mtg,th0,topo,topofact)
+    Input:  diag_montgomery(config,prs,mtg,th0,topo,topofact)
     Output: exn,mtg
     """
-    if idbg == 1:
+    g, cp, pref, rdcp, dth, nz = config.g, config.cp, config.pref, \
+        config.rdcp, config.dth, config.nz
+
+    if config.idbg == 1:
         print('Diagnostic step: Exner function and Montgomery potential ...\n')
 
     # *** Exercise 2.2 Diagnostic computation of Montgomery ***
@@ -19,36 +22,41 @@ def diag_montgomery(prs,mtg, exn, th0,topo,topofact):
 
     # Computation of Exner function
     # *** Edit here ***
-    # exn = np.zeros((nxb,nz1))
-    k = np.arange(0,nz+1) # maybe use nz1 here
-    exn[:,k] = cp*(prs[:,k]/pref)**rdcp
+    # (evaluated in place into the exn buffer)
+    np.divide(prs,pref,out=exn)
+    np.power(exn,rdcp,out=exn)
+    np.multiply(exn,cp,out=exn)
     
     # add lower boundary condition at height mtg[:,0]
     # *** Edit here ***
-    mtg_staggered = g * topo.squeeze()*topofact + th0[0]*exn[:,0]
-    mtg[:,0] =  mtg_staggered + dth/2*exn[:,0]    
+    mtg_staggered = g * topo[...,0]*topofact + th0[0]*exn[...,0]
+    mtg[...,0] =  mtg_staggered + dth/2*exn[...,0]    
 
-    # integration loop upwards
+    # integration upwards
     # *** Edit here ***
-    for k in range(1,nz):
-        mtg[:,k] = mtg[:,k-1] + dth*exn[:,k]
+    # mtg[:,k] = mtg[:,k-1] + dth*exn[:,k] as a cumulative sum over the
+    # vertical axis
+    np.multiply(exn[...,1:nz],dth,out=mtg[...,1:nz])
+    np.cumsum(mtg,axis=-1,out=mtg)
 
     # *** Exercise 2.2 Diagnostic computation  ***
 
     return exn,mtg
 
 
-def diag_pressure(prs0,prs,snew):
+def diag_pressure(config,prs0,prs,snew):
     """
     Diagnostic computation of pressure
     Diagnostic computation of pressure with upper boundary condition
     and integration downwards.
     Based on diag_pressure.m from the full isentropic model in MATLAB, 2014.
 
-    Input:  diag_pressure(prs0,prs,snew)
+    Input:  diag_pressure(config,prs0,prs,snew)
     Output: prs
     """
-    if idbg == 1:
+    g, dth, nz = config.g, config.dth, config.nz
+
+    if config.idbg == 1:
         print('Diagnostic step: Pressure ...\n')
 
     # *** Exercise 2.2 Diagnostic computation of pressure ***
@@ -58,15 +66,188 @@ def diag_pressure(prs0,prs,snew):
 	
     ## Upper boundary condition
     # *** edit here ***
-    prs[:,nz] = prs0[nz]
+    prs[...,nz] = prs0[nz]
 				
-    # integration loop downwards
+    # integration downwards
     # *** edit here ***
-    for k in range(nz-1,-1,-1):
-        prs[:,k] = prs[:,k+1] + g*dth*snew[:,k]
+    # prs[:,k] = prs[:,k+1] + g*dth*snew[:,k] as a cumulative sum over
+    # the reversed vertical axis
+    # (in the type of prs, which may be more precise than snew)
+    np.multiply(snew,g*dth,out=prs[...,0:nz],dtype=prs.dtype)
+    np.cumsum(prs[...,::-1],axis=-1,out=prs[...,::-1])
 
     # *** Exercise 2.2 Diagnostic computation of pressure ***
 
     return prs
 
+
+def diag_height(config,prs,exn,th0,topo,topofact,zht):
+    """
+    Diagnostic computation of geometric height (staggered)
+    Integration of the hypsometric equation upwards from the
+    topography, needed for output and microphysics schemes.
+
+    Input:  diag_height(config,prs,exn,th0,topo,topofact,zht)
+    Output: zht
+    """
+    g, rdcp = config.g, config.rdcp
+
+    if config.idbg == 1:
+        print('Diagnostic step: Geometric height ...\n')
+
+    # lower boundary condition
+    zht[...,0] = topo[...,0]*topofact
+
+    # layer thicknesses
+    # zht[:,k] = zht[:,k-1] - rdcp/g*0.5*(th0[k-1]*exn[:,k-1] +
+    #            th0[k]*exn[:,k])*(prs[:,k] - prs[:,k-1])/
+    #            (0.5*(prs[:,k] + prs[:,k-1]))
+    zht[...,1:] = -(rdcp/g*0.5*(th0[:-1]*exn[...,:-1] + th0[1:]*exn[...,1:])*
+                  (prs[...,1:] - prs[...,:-1])/
+                  (0.5*(prs[...,1:] + prs[...,:-1])))
+
+    # integration upwards as a cumulative sum over the vertical axis
+    np.cumsum(zht,axis=-1,out=zht)
+
+    return zht
+
+
+class ThermoState:
+    """
+    Thermodynamic diagnostics on the model levels, computed once per time
+    step after the height and shared by the microphysics schemes. All
+    fields are preallocated (nxb,nz) arrays that are updated in place.
+
+    rho     ... density [kg/m3]
+    t       ... temperature [K]
+    p       ... pressure [Pa]
+    gam     ... L/cp_d/exner, latent heating per unit condensate [K]
+    dz      ... layer thickness [m]
+    zml     ... height of the model level [m]
+    dz_dx   ... slope of the model level
+    w       ... vertical velocity [m/s]
+
+    dzmin   ... smallest layer thickness [m]
+
+    The Exner function exn is divided by cp_exn to obtain exn/cp (by
+    default config.cp; the Kessler scheme uses its own value of cp). dz_dx and w are only
+    computed if the velocity is passed to update. For an ensemble of nens
+    members the fields are (nens,nxb,nz).
+
+    Usage:  thermo = ThermoState(config,cp_exn,nens)
+            thermo.update(snew,th0,prs,exn,zht,u,dthetadt)
+    """
+
+    def __init__(self,config,cp_exn=None,nens=None):
+        self.config = config
+        self.cp_exn = config.cp if cp_exn is None else cp_exn
+        ens = () if nens is None else (nens,)
+        nxb, nz = config.nxb, config.nz
+
+        self.rho = np.zeros(ens+(nxb,nz))
+        self.t = np.zeros(ens+(nxb,nz))
+        self.p = np.zeros(ens+(nxb,nz))
+        self.gam = np.zeros(ens+(nxb,nz))
+        self.dz = np.zeros(ens+(nxb,nz))
+        self.zml = np.zeros(ens+(nxb,nz))
+        self.dz_dx = np.zeros(ens+(nxb,nz))
+        self.w = np.zeros(ens+(nxb,nz))
+
+        # exn/cp and exn/cp*th0 on the staggered levels
+        self._pii = np.zeros(ens+(nxb,nz+1))
+        self._piith = np.zeros(ens+(nxb,nz+1))
+
+    def update(self,snew,th0,prs,exn,zht,u=None,dthetadt=None):
+        """
+        Compute the diagnostics of the current time step.
+
+        Input:  update(snew,th0,prs,exn,zht,u,dthetadt)
+        Output: thermo
+        """
+        config = self.config
+        if config.idbg == 1:
+            print('Diagnostic step: Thermodynamic state ...\n')
+
+        pii, piith = self._pii, self._piith
+
+        # density
+        np.subtract(zht[...,1:],zht[...,:-1],out=self.dz)
+        np.multiply(snew,config.dth,out=self.rho)
+        np.divide(self.rho,self.dz,out=self.rho)
+
+        # temperature and pressure (mean of the staggered levels)
+        np.divide(exn,self.cp_exn,out=pii)
+        np.multiply(pii,th0,out=piith)
+        np.add(piith[...,1:],piith[...,:-1],out=self.t)
+        np.multiply(self.t,0.5,out=self.t)
+        np.add(prs[...,:-1],prs[...,1:],out=self.p)
+        np.multiply(self.p,0.5,out=self.p)
+
+        # L / (cp_d * exn/cp)
+        np.add(pii[...,:-1],pii[...,1:],out=self.gam)
+        np.multiply(self.gam,1004.*0.5,out=self.gam)
+        np.divide(2.5E06,self.gam,out=self.gam)
+
+        # smallest layer thickness (as reciprocal of 1/dz, as used by the
+        # sedimentation of the two-moment scheme)
+        self.dzmin = np.min(1.0/(1/self.dz))
+
+        # height of the model levels
+        np.add(zht[...,:-1],zht[...,1:],out=self.zml)
+        np.multiply(self.zml,0.5,out=self.zml)
+
+        if u is not None:
+            # slope of the model levels
+            # dz_dx[i] = (zht[i+1,k+1]+zht[i+1,k]-zht[i-1,k+1]-zht[i-1,k])/(4dx)
+            dz_dx = self.dz_dx[...,1:-1,:]
+            np.add(zht[...,2:,1:],zht[...,2:,:-1],out=dz_dx)
+            np.subtract(dz_dx,zht[...,:-2,1:],out=dz_dx)
+            np.subtract(dz_dx,zht[...,:-2,:-1],out=dz_dx)
+            np.divide(dz_dx,4.*config.dx,out=dz_dx)
+
+            # vertical velocity (zero at the lateral boundaries)
+            # w[i] = 0.5*(u[i+1]+u[i])*dz_dx[i]
+            #        + 0.5*(dthetadt[k]+dthetadt[k+1])*snew/rho
+            w = self.w[...,1:-1,:]
+            np.add(u[...,2:-1,:],u[...,1:-2,:],out=w)
+            np.multiply(w,0.5,out=w)
+            np.multiply(w,dz_dx,out=w)
+            if config.idthdt == 1:
+                tmp = 0.5*(dthetadt[...,1:-1,:-1]+dthetadt[...,1:-1,1:])
+                tmp *= snew[...,1:-1,:]
+                tmp /= self.rho[...,1:-1,:]
+                w += tmp
+            self.w[...,0,:] = 0.
+            self.w[...,-1,:] = 0.
+
+        return self
+
+    def sub(self,box):
+        """
+        Thermodynamic state of the part box = (..., columns, levels) of the
+        domain. The fields are views into the fields of the full state;
+        dzmin refers to the full domain.
+
+        Input:  sub(box)
+        Output: thermo
+        """
+        thermo = copy.copy(self)
+        for name in ('rho','t','p','gam','dz','zml','dz_dx','w'):
+            setattr(thermo,name,getattr(self,name)[box])
+        return thermo
+
+    def columns(self):
+        """
+        Thermodynamic state with the columns of all ensemble members along
+        one axis, i.e. fields (ncol,nz), for column-wise schemes.
+
+        Input:  columns()
+        Output: thermo
+        """
+        thermo = copy.copy(self)
+        for name in ('rho','t','p','gam','dz','zml','dz_dx','w'):
+            phi = getattr(self,name)
+            setattr(thermo,name,phi.reshape(-1,phi.shape[-1]))
+        return thermo
+
 # END OF DIAGNOSTICS.PY
@@ -1,67 +1,84 @@
 import numpy as np
 
-from namelist import idbg,nb,nx,nx1,imoist_diff,imoist,imicrophys,irelax    # import global variables
 from boundary import periodic
+from stencil import stencil, work
 
 
-def horizontal_diffusion(tau,unew,snew,
-    qvnew=None,qcnew=None,qrnew=None,ncnew=None,nrnew=None):
+class DiffusionOperator:
     """
-    Horizontal diffusion for dry model.
+    Horizontal diffusion and gravity wave absorber with the height
+    dependent coefficient tau(k). The 1-2-1 filter is applied in place,
+    and only on the levels where tau > 0 (e.g. the absorber levels
+    nz-nab...nz-1 for diff = 0).
 
-    Input:  horizontal_diffusion(tau,unew,unew,snew,snew)
-    Output: unew,snew
+    Usage:  diffop = DiffusionOperator(tau)
+            diffop.apply(phi,i0,im1,ip1)
     """
-    ind = tau>0
 
-    if idbg == 1 and np.size(ind) > 0:
+    def __init__(self,tau):
+        self.tau = tau
+
+        # contiguous range of levels enclosing all levels with tau > 0
+        k = np.flatnonzero(tau > 0)
+        self.active = k.size > 0
+        if self.active:
+            self.levels = slice(k[0],k[-1]+1)
+        else:
+            self.levels = slice(0,0)
+        self.tau_sel = tau[self.levels]
+
+        # mask only needed if tau vanishes within that range
+        self.sel = None
+        if not np.all(self.tau_sel > 0):
+            self.sel = self.tau_sel > 0
+
+    def apply(self,phi,i,im,ip):
+        """
+        Filter the interior points i of phi (in place):
+        phi[i] = phi[i] + tau*(phi[i-1] - 2*phi[i] + phi[i+1])/4
+
+        Input:  apply(phi,i,im,ip)
+        Output: phi
+        """
+        if not self.active:
+            return phi
+
+        k = self.levels
+        flt = work(phi[...,i,k].shape,phi.dtype,4)
+        np.multiply(phi[...,i,k],2.,out=flt)
+        np.subtract(phi[...,im,k],flt,out=flt)
+        np.add(flt,phi[...,ip,k],out=flt)
+        np.multiply(flt,self.tau_sel,out=flt)
+        np.divide(flt,4.,out=flt)
+        if self.sel is None:
+            np.add(phi[...,i,k],flt,out=phi[...,i,k])
+        else:
+            np.add(phi[...,i,k],flt,out=phi[...,i,k],where=self.sel)
+
+        return phi
+
+
+def horizontal_diffusion(config,diffop,unew,snew,qnew=None):
+    """
+    Horizontal diffusion for dry model and the tracer stack.
+
+    Input:  horizontal_diffusion(config,diffop,unew,snew,qnew)
+    Output: unew,snew(,qnew)
+    """
+    nb, nx, nx1 = config.nb, config.nx, config.nx1
+    imoist, imoist_diff, irelax = config.imoist, config.imoist_diff, \
+        config.irelax
+    st = stencil(config)
+
+    if config.idbg == 1 and diffop.active:
         print('Apply diffusion and gravity wave absorber ...\n')
 
-    taumat = np.ones((unew.shape))*tau
+    diffop.apply(unew,st.iu0,st.ium1,st.iup1)
+    diffop.apply(snew,st.i0,st.im1,st.ip1)
 
-    if np.all(tau <= 0):
-        return
-    else:
-        sel = taumat > 0
-
-        i = np.arange(nb,nx1+nb)
-        unew[i,:] = (unew[i,:] + taumat[i,:]*(
-            unew[i-1,:] - 2.*unew[i,:] +
-            unew[i+1,:])/4.)*sel[i,:] + \
-            unew[i,:]*~sel[i,:]
-
-        i = np.arange(nb,nx+nb)
-        snew[i,:] = (snew[i,:] + taumat[i,:]*(
-            snew[i-1,:] - 2.*snew[i,:] +
-            snew[i+1,:])/4.)*sel[i,:] + \
-            snew[i,:]*~sel[i,:]
- 
-        if imoist==1 and imoist_diff ==1:
-            qvnew[i,:] = (qvnew[i,:] + taumat[i,:]*(
-                qvnew[i-1,:] - 2.*qvnew[i,:] +
-                qvnew[i+1,:])/4.)*sel[i,:] + \
-                qvnew[i,:]*~sel[i,:]
-
-            qcnew[i,:] = (qcnew[i,:] + taumat[i,:]*(
-                qcnew[i-1,:] - 2.*qcnew[i,:] +
-                qcnew[i+1,:])/4.)*sel[i,:] + \
-                qcnew[i,:]*~sel[i,:]
-
-            qrnew[i,:] = (qrnew[i,:] + taumat[i,:]*(
-                qrnew[i-1,:] - 2.*qrnew[i,:] +
-                qrnew[i+1,:])/4.)*sel[i,:] + \
-                qrnew[i,:]*~sel[i,:]
-
-            if imicrophys==2:
-                nrnew[i,:] = (nrnew[i,:] + taumat[i,:]*(
-                    nrnew[i-1,:] - 2.*nrnew[i,:] +
-                    nrnew[i+1,:])/4.)*sel[i,:] + \
-                    nrnew[i,:]*~sel[i,:]
-
-                ncnew[i,:] = (ncnew[i,:] + taumat[i,:]*(
-                    ncnew[i-1,:] - 2.*ncnew[i,:] +
-                    ncnew[i+1,:])/4.)*sel[i,:] + \
-                    ncnew[i,:]*~sel[i,:]
+    if imoist==1 and imoist_diff ==1:
+        # all tracers in one operation
+        diffop.apply(qnew,st.i0,st.im1,st.ip1)
 
     # exchange periodic boundaries
     if irelax == 0:
@@ -69,19 +86,11 @@ def horizontal_diffusion(tau,unew,snew,
         snew = periodic(snew,nx,nb)
 
         if imoist==1 and imoist_diff ==1:
-            qvnew = periodic(qvnew,nx,nb)
-            qcnew = periodic(qcnew,nx,nb)
-            qrnew = periodic(qrnew,nx,nb)
-
-            if imicrophys==2:
-                ncnew = periodic(ncnew,nx,nb)
-                nrnew = periodic(nrnew,nx,nb)
+            qnew = periodic(qnew,nx,nb)
 
     if imoist==0:
         return unew, snew
-    elif imicrophys==0 or imicrophys==1:
-        return unew, snew, qvnew, qcnew, qrnew
-    elif imicrophys==2:
-        return unew, snew, qvnew, qcnew, qrnew, ncnew, nrnew
+    else:
+        return unew, snew, qnew
 
 # END OF DIFFUSION.PY
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Compact storage of the output fields: error-bounded linear quantization
+to integers and compressed .npz files.
+
+A quantized field phi is stored as integers q with the attributes scale
+and offset, phi = q*scale + offset. The scale is twice the error bound,
+such that |phi - (q*scale + offset)| <= bound (up to rounding).
+"""
+
+import zipfile
+import numpy as np
+
+# zip compression of the .npz files
+compressions = {'none': zipfile.ZIP_STORED, 'zlib': zipfile.ZIP_DEFLATED,
+                'lzma': zipfile.ZIP_LZMA}
+
+
+def quantize(phi, bound):
+    """
+    Quantization of phi with the absolute error bound, to int16, or to
+    int32 if the range of phi exceeds int16.
+
+    Input:  quantize(phi, bound)
+    Output: q, scale, offset
+    """
+    if bound <= 0:
+        raise ValueError('quantize: the error bound must be positive')
+    if not np.all(np.isfinite(phi)):
+        raise ValueError('quantize: the field is not finite')
+
+    scale = 2. * bound
+    lo, hi = np.min(phi), np.max(phi)
+    offset = 0.5 * (lo + hi)
+    qmax = np.ceil(0.5 * (hi - lo) / scale)
+    dtype = np.int16 if qmax <= np.iinfo(np.int16).max else np.int32
+    if qmax > np.iinfo(np.int32).max:
+        raise ValueError('quantize: the error bound is too small')
+
+    q = np.rint((phi - offset) / scale).astype(dtype)
+    return q, scale, offset
+
+
+def dequantize(q, scale, offset):
+    """
+    Field of the quantized values q.
+
+    Input:  dequantize(q, scale, offset)
+    Output: phi
+    """
+    return q * scale + offset
+
+
+def save_npz(fname, arrays, compress='none'):
+    """
+    Write the arrays (dict name: array) to fname.npz, as np.savez, with the
+    given compression ('none', 'zlib' or 'lzma'). The file is read with
+    np.load.
+
+    Input:  save_npz(fname, arrays, compress)
+    Output: none
+    """
+    if compress not in compressions:
+        raise ValueError('save_npz: unknown compression %s' % compress)
+    if not fname.endswith('.npz'):
+        fname = fname + '.npz'
+
+    with zipfile.ZipFile(fname, 'w', compression=compressions[compress]) \
+            as zf:
+        for name, phi in arrays.items():
+            with zf.open(name + '.npy', 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asanyarray(phi),
+                                          allow_pickle=False)
+
+# END OF ENCODING.PY
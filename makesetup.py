@@ -1,16 +1,21 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-from namelist import *
 from meteo_utilities import rrmixv1
 import sys
 
-def maketopo(topo,nxb):
+def maketopo(topo,nxb,config):
     """
-    Topography definition
+    Topography definition, with the options of config (the options of an
+    ensemble member, see model.run)
 
-    Input:  maketopo(topo,nxb)
+    Input:  maketopo(topo,nxb,config)
     Output: topo
     """
+    mtn_topo, topomx, topowd = config.mtn_topo, config.topomx, config.topowd
+    leeHill_rel, w_ratio, h_ratio = config.leeHill_rel, config.w_ratio, \
+        config.h_ratio
+    dx, idbg = config.dx, config.idbg
+
     if idbg == 1:
         print('Topography ...\n')
 
@@ -65,16 +70,29 @@ def maketopo(topo,nxb):
     return topo
 
 
-def makeprofile(sold,snow,uold,unow,mtg,mtgnew,qvold=0,qvnow=0,
+def makeprofile(sold,snow,uold,unow,mtg,mtgnew,config,qvold=0,qvnow=0,
                 qcold=0,qcnow=0,qrold=0,qrnow=0,ncold=0,ncnow=0,nrold=0,nrnow=0):
     """
     Make upstream profiles and initial conditions for
-    isentropic density (sigma) and velocity (u)
+    isentropic density (sigma) and velocity (u), with the options of
+    config (the options of an ensemble member, see model.run)
 
-    Input:      makeprofile(sold,snow,uold,unow,mtg,mtgnew)
+    Input:      makeprofile(sold,snow,uold,unow,mtg,mtgnew,config)
     Output:     th0, exn0, prs0, z0, mtg0, s0, u0, sold, ...
                 snow, uold, unow, mtg, mtgnew
     """
+    u00, u00_sh, ishear = config.u00, config.u00_sh, config.ishear
+    k_shl, k_sht, surf_friction = config.k_shl, config.k_sht, \
+        config.surf_friction
+    moist_setup, imoist_pert = config.moist_setup, config.imoist_pert
+    h_moistLayer_up, h_moistLayer_low = config.h_moistLayer_up, \
+        config.h_moistLayer_low
+    idbg, imoist, imicrophys = config.idbg, config.imoist, config.imicrophys
+    nxb, nz, nz1 = config.nxb, config.nz, config.nz1
+    bv00, th00, exn00, dth, z00 = config.bv00, config.th00, config.exn00, \
+        config.dth, config.z00
+    g, cp, cpdr, pref = config.g, config.cp, config.cpdr, config.pref
+
     #global dth
     if idbg == 1:
         print('Create initial profile ...\n')
@@ -208,41 +226,38 @@ def makeprofile(sold,snow,uold,unow,mtg,mtgnew,qvold=0,qvnow=0,
             nr0 = np.zeros(nz)
 
     # Initial conditions for isentropic density (sigma), velocity u, and moisture qv
+    # (written into the preallocated fields of the caller)
     # ---------------------------------------------------------------------
 
-    sold =   s0*np.ones_like(sold,dtype = np.float)
-    snow =   s0*np.ones_like(sold,dtype = np.float)
-    mtg =    mtg0*np.ones_like(sold,dtype = np.float)
-    mtgnew = mtg0*np.ones_like(sold,dtype = np.float)
-    uold =   u0*np.ones_like(uold,dtype = np.float)
-    unow =   u0*np.ones_like(uold,dtype = np.float)
+    sold[:] =   s0
+    snow[:] =   s0
+    mtg[:] =    mtg0
+    mtgnew[:] = mtg0
+    uold[:] =   u0
+    unow[:] =   u0
 
     if imoist==1:
         #if imicrophys!=0:
-        if 'imoist_pert' in globals():
-            if imoist_pert==1:    
-                qv_pert = np.sin(0.04*np.linspace(0,nxb-1,nxb)*np.pi/2)**2
-                # two dim A multiplied with one dim b: A * b[:,None]
-                qvold = qv0*np.ones_like(qvold,dtype = np.float)*qv_pert[:,None]
-                qvnow = qv0*np.ones_like(qvold,dtype = np.float)*qv_pert[:,None]
-            else:
-                qvold = qv0*np.ones_like(qvold,dtype = np.float)
-                qvnow = qv0*np.ones_like(qvold,dtype = np.float)
+        if imoist_pert==1:
+            qv_pert = np.sin(0.04*np.linspace(0,nxb-1,nxb)*np.pi/2)**2
+            # two dim A multiplied with one dim b: A * b[:,None]
+            qvold[:] = qv0*qv_pert[:,None]
+            qvnow[:] = qv0*qv_pert[:,None]
         else:
-            qvold = qv0*np.ones_like(qvold,dtype = np.float)
-            qvnow = qv0*np.ones_like(qvold,dtype = np.float) 
-        
-        qcold = qc0*np.ones_like(qcold,dtype = np.float)
-        qcnow = qc0*np.ones_like(qcold,dtype = np.float)
-        qrold = qr0*np.ones_like(qrold,dtype = np.float)
-        qrnow = qr0*np.ones_like(qrold,dtype = np.float)
+            qvold[:] = qv0
+            qvnow[:] = qv0
+
+        qcold[:] = qc0
+        qcnow[:] = qc0
+        qrold[:] = qr0
+        qrnow[:] = qr0
 
         # droplet density for 2-moment scheme
         if imicrophys==2:
-            ncold = nc0*np.ones_like(ncold,dtype = np.float)
-            ncnow = nc0*np.ones_like(ncold,dtype = np.float)
-            nrold = nr0*np.ones_like(nrold,dtype = np.float)
-            nrnow = nr0*np.ones_like(nrold,dtype = np.float)
+            ncold[:] = nc0
+            ncnow[:] = nc0
+            nrold[:] = nr0
+            nrnow[:] = nr0
 
     if imoist == 0:
         return th0,exn0,prs0,z0,mtg0,s0,u0,sold,snow,uold,unow,mtg,mtgnew
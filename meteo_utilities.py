@@ -63,4 +63,22 @@ def eswat1(T):
     eswat  = 1013.246 * 10**ES
     return eswat
 
+def eswat2(T):
+    """
+    Saturation vapor pressure over water, Magnus formulation
+    (as used in the two-moment scheme)
+
+    Input:      T     ... temperature [K]
+    Output:     eswat in [Pa]
+    """
+
+    #Define local constants
+    T_3 = 273.2         # triple point water
+    e_3 = 6.1078*100    # saturation vapor pressure at triple point
+    A_w = 17.2693882    # constant f. saturation vapor pressure (water)
+    B_w = 35.86         # constant f. saturation vapor pressure (water)
+
+    eswat = e_3*np.exp(A_w*(T-T_3)/(T-B_w))
+    return eswat
+
 # END OF METEO_UTILITIES.PY
\ No newline at end of file
@@ -1,10 +1,83 @@
 import numpy as np
-from namelist import nz,nxb,dt,cp,dth,vt_mult,autoconv_th,autoconv_mult,iern,r,r_v,sediment_on, \
-                     dx,idthdt
-from meteo_utilities import eswat1
+from meteo_utilities import eswat2
+from thermo_tables import eswat1_function
 import copy
+import functools
 
-def kessler(t,pres,snew,qv,qc,qr,exn,z,rainnc,rainncv):
+# CCN activation look-up table (for r2 = 0.03 mum, lsigs = 0.4):
+# ltab_nuc[i,j] is the number of activated CCN for the updraft velocity
+# at cloud base wcb_ind[i] and the number of CN ncn_ind[j]
+wcb_ind =  np.array([0,   0.5,   1.0,   2.5,   5.0])
+ncn_ind =  np.array([0,    50,    100,    200,    400,    800,    1600,    3200,    6400],dtype=np.float64)*10**6 #fix for windows
+
+ltab_nuc = np.array([[0.,     0.,      0.,      0.,      0.,      0.,       0.,       0.,       0.],
+    [0.,     37.2,    67.1,   119.5,   206.7,   340.5,    549.4,    549.4,    549.4],
+    [0.,     39.0,    77.9,   141.2,   251.8,   436.7,    708.7,   1117.7,   1117.7],
+    [0.,     42.3,    84.7,   169.3,   310.3,   559.5,    981.7,   1611.6,   2455.6],
+    [0.,     44.0,    88.1,   176.2,   352.3,   647.8,   1173.0,   2049.7,   3315.6]])
+ltab_nuc = ltab_nuc*10**6
+
+
+def active_region(q,qthresh):
+    """
+    Bounding box of the points where any of the tracers q(ntracer,...,nxb,nz)
+    (of any ensemble member) exceeds qthresh, for running the microphysics
+    on a part of the domain only. The box covers the columns i0...i1-1 and
+    the levels 0...k1-1: it starts at the surface, which the rain falls to,
+    and it includes one inactive level above the highest active point.
+
+    Input:  active_region(q,qthresh)
+    Output: (..., slice(i0,i1), slice(0,k1)), or None if no point is active
+    """
+    active = np.any((q > qthresh).reshape((-1,)+q.shape[-2:]),axis=0)
+    cols, = np.nonzero(np.any(active,axis=1))
+    if cols.size == 0:
+        return None
+    levs, = np.nonzero(np.any(active[cols[0]:cols[-1]+1],axis=0))
+    nz = q.shape[-1]
+
+    return Ellipsis, slice(cols[0],cols[-1]+1), slice(0,min(levs[-1]+2,nz))
+
+
+def cp_kessler(config):
+    """
+    cp used by the Kessler scheme (also for exn/cp in its thermodynamic
+    state)
+
+    Input:  cp_kessler(config)
+    Output: cp
+    """
+    return 7*config.r/2
+
+
+def interp_table2d(x,y,xtab,ytab,tab):
+    """
+    Interpolation in the look-up table tab[j,i] given at the nodes
+    ytab[j], xtab[i] for all points (x,y) at once, with the results of the
+    original nucleation scheme: the fractional distance of a point from
+    the lower node of its interval is used as the weight of that lower
+    node, and points at or beyond the last node of a dimension fall back to
+    its first interval (and are extrapolated from it).
+
+    Input:  interp_table2d(x,y,xtab,ytab,tab)
+    Output: values at the points (x,y)
+    """
+    # lower table node of the interval containing each point
+    i = np.searchsorted(xtab,x,side='right')-1
+    j = np.searchsorted(ytab,y,side='right')-1
+    i[i >= len(xtab)-1] = 0
+    j[j >= len(ytab)-1] = 0
+
+    indx0 = (x-xtab[i])/(xtab[i+1]-xtab[i])
+    indx1 = 1-indx0
+    indy0 = (y-ytab[j])/(ytab[j+1]-ytab[j])
+    indy1 = 1-indy0
+
+    return (indx0*tab[j,i] + indx1*tab[j,i+1])*indy0 + \
+           (indx0*tab[j+1,i] + indx1*tab[j+1,i+1])*indy1
+
+
+def kessler(config,thermo,qv,qc,qr,rainnc,rainncv):
     """
     ***********************************************
     Kessler (1969) microphysics scheme
@@ -12,12 +85,25 @@ def kessler(t,pres,snew,qv,qc,qr,exn,z,rainnc,rainncv):
     vectorisation, minor bugfixes, Lukas Papritz (2012)
     small bugfix, Roman Brogli (2018)
     ***********************************************
+
+    Density, temperature, pressure and layer thickness are read from the
+    thermodynamic state (diagnostics.ThermoState with
+    cp_exn = cp_kessler(config)). The fields can have a leading ensemble
+    axis, qv(nens,nxb,nz); the columns of all members are then treated as
+    one set of columns.
+
+    Input:  kessler(config,thermo,qv,qc,qr,rainnc,rainncv)
+    Output: lheat,qv,qc,qr,rainnc,rainncv
     """
-    dt_in = 2*dt            # saturation adjustment for leapfrog (2 * dt)
+    r, r_v, iern = config.r, config.r_v, config.iern
+    vt_mult, sediment_on = config.vt_mult, config.sediment_on
+    eswat1 = eswat1_function(config.ithermo_tab)
+
+    dt_in = 2*config.dt     # saturation adjustment for leapfrog (2 * dt)
 
     # define constants
-    c1 = 0.001 * autoconv_mult
-    c2 = autoconv_th # originally 0.001
+    c1 = 0.001 * config.autoconv_mult
+    c2 = config.autoconv_th # originally 0.001
     c3 = 2.2
     c4 = 0.875
     #svp1 = 0.6112
@@ -26,23 +112,33 @@ def kessler(t,pres,snew,qv,qc,qr,exn,z,rainnc,rainncv):
     svpt0 = 273.15
     ep2 = r/r_v
     xlv = 2.5E06
-    cp = 7*r/2
+    cp = cp_kessler(config)
     max_cr_sedimentation = 0.75
     rhowater = 1000.
 
+    # columns of all ensemble members along one axis
+    shape = qv.shape
+    if len(shape) > 2:
+        thermo = thermo.columns()
+        qv = qv.reshape(-1,shape[-1])
+        qc = qc.reshape(-1,shape[-1])
+        qr = qr.reshape(-1,shape[-1])
+        rainnc = rainnc.reshape(-1)
+        rainncv = rainncv.reshape(-1)
+
     # transpose input fields
     rainnc_tr = rainnc.T
     rainncv_tr = rainncv.T
-    t_tr = t.T
 
     # reset rain rate to zero
     rainncv_tr[:] = 0.
+
+    # grid size (the scheme can run on a part of the domain)
+    nxb,nz = qv.shape
     
-    # compute density
+    # density
     # ------------------------
-    k=np.arange(0,nz)
-    rho = np.zeros((nxb,nz))
-    rho[:,k] = snew[:,k]*dth/(z[:,k+1]-z[:,k])
+    rho = thermo.rho
 
     f5 = svp2*(svpt0 - svp3)*xlv/cp
 
@@ -60,66 +156,28 @@ def kessler(t,pres,snew,qv,qc,qr,exn,z,rainnc,rainncv):
     vt = (qrr**0.1364)*vt_fact
 
     # 1/dz
-    rdzw = 1./(z[ii,kk+1]-z[ii,kk])
+    rdzw = 1./thermo.dz
 
     # determine courant number
     crmax = np.maximum(dt_in / 2 * vt * rdzw,np.zeros((nxb,nz)))
 
-    # determine maximum nfall for all grid points
-    nfall = np.max((np.ones((nxb,nz)),np.ceil(0.5+crmax/max_cr_sedimentation)))
-
-    # splitting so Courant number for sedimentation is stable
-    dtfall = dt_in/nfall
-    time_sediment = dt_in
+    # number of sedimentation sub-steps needed by each column
+    nfall = np.maximum(1,np.ceil(0.5+crmax/max_cr_sedimentation).max(axis=1))
 
     # Terminal velocity calculation and advection
-    # Do a time split loop on this for stability
+    # Columns needing the same number of sub-steps are sedimented together,
+    # so dry and light-rain columns do a single pass
     if (sediment_on==1):
-        rdzwdrho = rdzw/rho
-        while (nfall > 0): 
-
-            time_sediment = time_sediment - dtfall
-            factor = dtfall*rdzwdrho
-
-            ppt = rho[:,0]*prod[:,0]*vt[:,0]*dtfall/rhowater
-
-            rainncv_tr =  ppt*1000 /dtfall *3600  # precip (mm/h)
-            rainnc_tr = rainnc_tr + ppt*1000   # accumulated precip (mm)
-
-            #Time split loop, fallout with flux upstream
-            zw = prod*vt*rho
-
-            #the zw matrix is very sparse, only calculate the nonzero elements
-            if np.any(np.nonzero(zw)):
-                k_max = np.max(np.nonzero(zw)[-1])
-                if (k_max == nz-1):
-                    k=np.arange(0,nz-1)
-                    prod[:,k]  = prod[:,k] - factor[:,k]*(zw[:,k]- zw[:,k+1])
-                    prod[:,nz-1] = prod[:,nz-1] - factor[:,nz-1]*zw[:,nz-1]/rho[:,nz-1]
-                else:
-                    k = np.arange(0,k_max+1)
-                    prod[:,k]  = prod[:,k] - factor[:,k]*(zw[:,k]- zw[:,k+1])
-
-            # compute new sedimentation velocity, and check/recompute new 
-            # sedimentation timestep if this isnt the last split step
-            if (nfall > 1): # this wasnt the last split sedminentation timestep
-                nfall = nfall - 1
-                crmax=0
-                qrr = np.maximum(np.zeros((nxb,nz)),0.001 * prod * rho)
-                vt = (qrr**0.1364)*vt_fact
-
-                crmax = np.maximum(crmax * np.ones((nxb,nz)), time_sediment * vt * rdzw)
-                nfall_new = np.max(np.maximum(np.ones((nxb,nz)),
-                    np.ceil(0.5+crmax/max_cr_sedimentation)))
-
-                if (nfall_new != nfall):
-                  nfall = nfall_new
-                  dtfall = time_sediment/nfall
-
-            else: # this was the last timestep (nfall==1)
-
-                prodqc = prod
-                nfall = 0
+        prodqc = prod
+        rainnc_tr = rainnc_tr.copy()
+        rainncv_tr = np.zeros(nxb)
+        for n in np.unique(nfall):
+            col = np.flatnonzero(nfall == n)
+            prodqc[col],ppt_acc,rainncv_tr[col] = \
+                kessler_sedimentation(prod[col],rho[col],vt[col],
+                                      vt_fact[col],rdzw[col],n,dt_in,
+                                      max_cr_sedimentation,rhowater)
+            rainnc_tr[col] = rainnc_tr[col] + ppt_acc
 
     else: #if (sediment_on==0)
         prodqc = np.zeros((nxb,nz))
@@ -143,10 +201,9 @@ def kessler(t,pres,snew,qv,qc,qr,exn,z,rainnc,rainncv):
     qr = np.maximum(qr[ii,kk]+qrprod,np.zeros((nxb,nz)))
 
     #atmospheric conditions
-    pii = exn/cp
-    temp = 0.5*(pii[ii,kk+1]*np.tile(t_tr[k+1],(nxb,1))+pii[ii,kk]*np.tile(t_tr[k],(nxb,1)))
-    pressure = 0.5*(pres[ii,kk]+pres[ii,kk+1])#1E05* (0.5*(pii[ii,kk+1]+pii[ii,kk])**(1004./287.))
-    gam = 2.5E06/(1004*0.5*(pii[ii,kk]+pii[ii,kk+1])) # L / (cp_d * exn/cp)
+    temp = thermo.t
+    pressure = thermo.p
+    gam = thermo.gam # L / (cp_d * exn/cp)
     #es = 1000*svp1*exp(svp2*(temp-svpt0)/(temp-svp3))
     es = eswat1(temp)*100
     qvs = ep2*es/(pressure-es)
@@ -187,16 +244,379 @@ def kessler(t,pres,snew,qv,qc,qr,exn,z,rainnc,rainncv):
     #qr[ii,kk] = qr[ii,kk] + qc[ii,kk] 
     #qc[ii,kk] = 0
 
+    if len(shape) > 2:
+        lheat = lheat.reshape(shape)
+        qv = qv.reshape(shape)
+        qc = qc.reshape(shape)
+        qr = qr.reshape(shape)
+        rainnc = rainnc.reshape(shape[:-1])
+        rainncv = rainncv.reshape(shape[:-1])
+
     return lheat,qv,qc,qr,rainnc,rainncv
 
 
-def seifert(u,t,pres,snew,qv,qc,qr,exn,zhtold,zhtnow,rainnc,rainncv,nc,nr,dthetadt=None):
+def kessler_sedimentation(prod,rho,vt,vt_fact,rdzw,nfall,dt_in,
+                          max_cr_sedimentation,rhowater):
+    """
+    Time split sedimentation of rain in the Kessler scheme for a batch of
+    columns, starting with nfall sub-steps. The number of sub-steps is
+    recomputed after every sub-step from the remaining time.
+
+    Input:  kessler_sedimentation(prod,rho,vt,vt_fact,rdzw,nfall,dt_in,
+                                  max_cr_sedimentation,rhowater)
+    Output: prod, accumulated precip (mm), precip rate of last sub-step (mm/h)
+    """
+    ncol,nz = prod.shape
+    rainnc = np.zeros(ncol)
+    rainncv = np.zeros(ncol)
+
+    # splitting so Courant number for sedimentation is stable
+    dtfall = dt_in/nfall
+    time_sediment = dt_in
+
+    # Do a time split loop on this for stability
+    rdzwdrho = rdzw/rho
+    while (nfall > 0):
+
+        time_sediment = time_sediment - dtfall
+        factor = dtfall*rdzwdrho
+
+        ppt = rho[:,0]*prod[:,0]*vt[:,0]*dtfall/rhowater
+
+        rainncv =  ppt*1000 /dtfall *3600  # precip (mm/h)
+        rainnc = rainnc + ppt*1000   # accumulated precip (mm)
+
+        #Time split loop, fallout with flux upstream
+        zw = prod*vt*rho
+
+        #the zw matrix is very sparse, only calculate the nonzero elements
+        if np.any(np.nonzero(zw)):
+            k_max = np.max(np.nonzero(zw)[-1])
+            if (k_max == nz-1):
+                k=np.arange(0,nz-1)
+                prod[:,k]  = prod[:,k] - factor[:,k]*(zw[:,k]- zw[:,k+1])
+                prod[:,nz-1] = prod[:,nz-1] - factor[:,nz-1]*zw[:,nz-1]/rho[:,nz-1]
+            else:
+                k = np.arange(0,k_max+1)
+                prod[:,k]  = prod[:,k] - factor[:,k]*(zw[:,k]- zw[:,k+1])
+
+        # compute new sedimentation velocity, and check/recompute new
+        # sedimentation timestep if this isnt the last split step
+        if (nfall > 1): # this wasnt the last split sedminentation timestep
+            nfall = nfall - 1
+            qrr = np.maximum(0.,0.001 * prod * rho)
+            vt = (qrr**0.1364)*vt_fact
+
+            crmax = np.maximum(0., time_sediment * vt * rdzw)
+            nfall_new = np.max(np.maximum(1.,
+                np.ceil(0.5+crmax/max_cr_sedimentation)))
+
+            if (nfall_new != nfall):
+              nfall = nfall_new
+              dtfall = time_sediment/nfall
+
+        else: # this was the last timestep (nfall==1)
+            nfall = 0
+
+    return prod,rainnc,rainncv
+
+def sedimentation_flux(phi,v,adz,dt_sedi):
+    """
+    Sedimentation fluxes through the lower interface of each level for
+    a field or a stack of fields phi(...,nxb,nz) falling with the
+    velocities v(...,nxb,nz) (negative downward). The flux is the amount of
+    phi between the interface and its departure height within dt_sedi,
+    which can lie several levels above for Courant numbers > 1. The flux
+    limiter flux[k] = max(s[k], flux[k+1] - phi[k]/(adz[k]*dt_sedi))
+    avoids negative values; the flux through the model top is zero.
+
+    Input:  sedimentation_flux(phi,v,adz,dt_sedi)
+    Output: flux
+    """
+    nxb,nz = adz.shape
+
+    # fall velocity and Courant number at the interfaces k = 0...nz-2
+    # (assuming v always negative)
+    v_v = 0.5*(v[...,1:]+v[...,:-1])
+    c_v = -v_v*adz[:,:-1]*dt_sedi
+
+    # upstream flux
+    s_v = np.zeros(phi.shape)
+    s_v[...,:-1] = v_v*phi[...,:-1]
+
+    if np.any(c_v > 1):
+        # height of the interfaces above ground and amount of phi below
+        # each interface
+        dz = 1./adz
+        zi = np.zeros((nxb,nz+1))
+        zi[:,1:] = np.cumsum(dz,axis=1)
+        mi = np.zeros(phi.shape[:-1]+(nz+1,))
+        mi[...,1:] = np.cumsum(phi*dz,axis=-1)
+
+        # departure height of the points with Courant numbers > 1
+        ind = np.nonzero(c_v > 1)
+        col,k = ind[-2],ind[-1]
+        zd = zi[col,k] - v_v[ind]*dt_sedi
+
+        # departure level (at most the top level): search all columns at
+        # once in the interface heights, offset by one column height each
+        ztop = 2*np.max(zi[:,-1])
+        kd = np.searchsorted((zi + ztop*np.arange(nxb)[:,np.newaxis]).ravel(),
+                             zd + ztop*col,side='right') - 1 - (nz+1)*col
+        kd = np.minimum(kd,nz-1)
+
+        # full levels k...kd-1 and part of the departure level
+        lead = ind[:-2]
+        mass = mi[lead+(col,kd)] - mi[lead+(col,k)] + phi[lead+(col,kd)]* \
+            np.minimum(zd-zi[col,kd],dz[col,kd])
+        s_v[ind] = -mass/dt_sedi
+
+    # Flux-limiter to avoid negative values: with the amount per unit time
+    # a[k] = phi[k]/(adz[k]*dt_sedi) and its sum A[k] over the levels below
+    # k, the recurrence unrolls to flux[k] = max_{j>=k}(s[j]-A[j]) + A[k]
+    a = phi/(adz*dt_sedi)
+    a_sum = np.zeros(phi.shape)
+    np.cumsum(a[...,:-1],axis=-1,out=a_sum[...,1:])
+    s_a = s_v - a_sum
+    s_max = np.maximum.accumulate(s_a[...,::-1],axis=-1)[...,::-1]
+    # where the limiter is inactive the flux is s[k]
+    flux = np.where(s_max > s_a,s_max + a_sum,s_v)
+
+    # uppper boundary condition
+    flux[...,nz-1] = 0.0
+
+    return flux
+
+
+# constants of the two-moment scheme
+# ----------------------------------
+
+rho0 = 1.225
+rho_w = 1000           # density of liquid water 
+L_wd = 2.4*10**6       # heat of vaporisation
+K_T = 2.500*10**(-2)   # heat conductivity
+c_r = 1./2
+
+# characteristics of cloud droplet distribution (cloud_nue1mue1)
+nu = 1                 # parameters describing assumed distribution 
+x_max = 2.6*10**(-10)  # maximal droplet mass 
+x_min = 4.20*10**(-15) # minimal droplet mass
+
+# characteristics of rain droplet distribution (rainULI)
+rain_x_min = 2.6*10**(-10)    # minimale Teilchenmasse
+rain_x_max = 3.*10**(-6)      # maximale Teilchenmasse
+a_geo = 1.24*10**(-1)         # Koeff. Geometrie
+b_geo = 0.333333              # Koeff. Geometrie
+a_ven = 0.780000              # Koeff. Ventilation (PK)
+b_ven = 0.308000              # Koeff. Ventilation (PK)
+rain_nu = 0                   # Breiteparameter der Verteilung
+
+# parameters for autoconversion
+k_c = 9.44*10**9   # Long-Kernel
+k_1 = 600          # Parameter fuer Phi-Fkt. (autoconversion)
+k_2 = 0.68         # Parameter fuer Phi-Fkt. (autoconversion)
+k_au = k_c/(20.*x_max)*(nu+2)*(nu+4)/(nu+1)**2   # autoconversion constant
+
+# parameters for accretion
+k_3 = 5*10**(-4)      # Parameter fuer Phi-Fkt. (accretion)
+k_r = 5.78           # Parameter Kernel (accretion)
+
+# parameter for rain selfcollection and break-up
+k_sc = k_c*(nu+2)/(nu+1)                         # selfcollection constant
+k_rr = 4.33
+k_br = 1000
+D_br = 1.1*10**(-3)
+
+# parameters for rain evaporation and sedimentation
+rain_cmu0 = 6
+rain_cmu1 = 30
+rain_cmu2 = 10.**3
+rain_cmu3 = 1.1*10.**(-3)
+rain_cmu4 = 1
+rain_cmu5 = 2
+N_sc = 0.710           # Schmidt-Zahl (PK)
+n_f = 0.333            # Exponent von N_sc im Vent-koeff.
+m_f = 0.5              # Exponent von N_re im Vent-koeff.
+nu_l = 1.460*10.**(-5) # Kinem. Visc. von Luft
+aa = 9.65
+bb = 10.3
+cc = 600
+alf = 9.65
+bet = 10.3
+gamma = 600
+
+# number of nodes and bound of the interpolation error of the rain tables
+# (see test_microphysics.py)
+rain_tab_n = 8000
+rain_tab_rel_err = 1e-6
+
+
+# look-up tables of the rain size distribution
+# --------------------------------------------
+# The shape parameter mue, the fall velocity and the evaporation
+# coefficients of rain depend on the mean mass x_r only (the density
+# enters as a separate factor), so they are tabulated once as functions
+# of x_r. With irain_tab = 0 the analytic formulas are evaluated instead.
+
+def rain_mue(D_m):
+    """
+    Shape parameter mue of the rain size distribution without cloud water
+    as function of the mean diameter D_m (mue(D_m) has a kink at
+    D_m = rain_cmu3).
+
+    Input:  rain_mue(D_m)
+    Output: mue
+    """
+    mue = np.empty(D_m.shape)
+    ind = (D_m <= rain_cmu3)
+    mue[ind] = rain_cmu0*np.tanh((4.*rain_cmu2*(D_m[ind]-rain_cmu3))**rain_cmu5)+rain_cmu4
+    mue[~ind] = rain_cmu1*np.tanh((rain_cmu2*(D_m[~ind]-rain_cmu3))**rain_cmu5)+rain_cmu4
+    return mue
+
+
+def rain_vq(x_r,cloud):
+    """
+    Mass weighted fall velocity of rain at reference density, with
+    (cloud = True) or without cloud water.
+
+    Input:  rain_vq(x_r,cloud)
+    Output: v_q
+    """
+    D_m = (6./(rho_w*np.pi)*x_r)**(1./3.)
+    if cloud:
+        mue = np.full(x_r.shape,(rain_nu+1)/b_geo-1)
+    else:
+        mue = rain_mue(D_m)
+    D_r = (D_m**3./((mue+3.)*(mue+2.)*(mue+1.)))**(1./3.)
+    return alf-bet/(1.+gamma*D_r)**(mue+4.)
+
+
+def rain_evap(x_r):
+    """
+    Coefficients of the evaporation of rain: (mue+1)/lambda, the
+    ventilation factor without its density dependence and the factor
+    gamma_eva of the number evaporation.
+
+    Input:  rain_evap(x_r)
+    Output: mue1_lam, vent, gamma_eva
+    """
+    D_m = a_geo*x_r**b_geo
+    mue = rain_mue(D_m)
+
+    lam = (np.pi/6.*rho_w*(mue+3)*(mue+2)*(mue+1)/x_r)**(1./3.)
+
+    gfak = 1.357940435+mue*(0.3033273220+mue*(-0.1299313363*10**(-1) + \
+        mue*(0.4002257774*10**(-3) -mue*0.4856703981*10**(-5))))
+
+    vent = gfak/np.sqrt(lam)* \
+        (1.-1./2.*(bb/aa)*(lam/(cc+lam))**(mue+5./2.) \
+        -1./8.*(bb/aa)**2.*(lam/(2.*cc+lam))**(mue+5./2.) \
+        -1./16.*(bb/aa)**3.*(lam/(3.*cc+lam))**(mue+5./2.) \
+        -5./127.*(bb/aa)**4.*(lam/(4.*cc+lam))**(mue+5./2.))
+
+    gamma_eva = np.ones(x_r.shape)
+    gamma_eva[gfak > 0] = gfak[gfak>0]*(1.1*10**(-3)/D_m[gfak>0])*np.exp(-0.2*mue[gfak>0])
+
+    return (mue+1)/lam, vent, gamma_eva
+
+
+class RainTable:
+    """
+    Table of a function f(x_r) on nodes equidistant in log(x_r) between
+    rain_x_min and rain_x_max, with an additional node at the kink x_kink
+    of f. Values are linearly interpolated in log(x_r).
+
+    Usage:  tab = RainTable(f,x_kink)
+            fx = tab(x_r)
+            fx = tab.lookup(*tab.locate(x_r))
+    """
+
+    def __init__(self,f,x_kink,n=rain_tab_n):
+        lx_min, lx_kink, lx_max = np.log([rain_x_min,x_kink,rain_x_max])
+
+        # n1 nodes up to the kink and n-n1 nodes above, equidistant in log(x_r)
+        n1 = max(int(np.ceil(n*(lx_kink-lx_min)/(lx_max-lx_min))),2)
+        self.f = f
+        self.n1 = n1
+        self.lx_min, self.lx_kink = lx_min, lx_kink
+        self.dlx1 = (lx_kink-lx_min)/(n1-1)
+        self.dlx2 = (lx_max-lx_kink)/(n-n1)
+        self.lx = np.append(np.linspace(lx_min,lx_kink,n1),
+                            np.linspace(lx_kink,lx_max,n-n1+1)[1:])
+
+        # values at the nodes and differences to the next node
+        self.val = f(np.exp(self.lx))
+        self.dval = np.append(np.diff(self.val),0.)
+
+    def locate(self,x_r):
+        """
+        Table interval i and position w within the interval of x_r (tables
+        with the same kink share their nodes and can reuse i, w).
+        """
+        lx = np.log(x_r)
+
+        # position in units of the node distance
+        pos = np.where(lx <= self.lx_kink,(lx-self.lx_min)/self.dlx1,
+                       (self.n1-1) + (lx-self.lx_kink)/self.dlx2)
+        np.clip(pos,0,len(self.lx)-1,out=pos)
+        i = pos.astype(np.intp)
+
+        return i, pos-i
+
+    def lookup(self,i,w):
+        return self.val[i] + w*self.dval[i]
+
+    def __call__(self,x_r):
+        return self.lookup(*self.locate(x_r))
+
+    def max_rel_err(self):
+        """
+        Maximum interpolation error relative to the largest value of the
+        table (v_q changes sign), attained between the nodes.
+        """
+        x_r = np.exp(0.5*(self.lx[1:]+self.lx[:-1]))
+        exact = self.f(x_r)
+        return np.max(np.abs(self(x_r)-exact))/np.max(np.abs(self.val))
+
+
+# mean masses at the kink of mue(D_m) for D_m of the sedimentation and of
+# the evaporation
+x_kink_sedi = np.pi/6.*rho_w*rain_cmu3**3
+x_kink_evap = (rain_cmu3/a_geo)**(1./b_geo)
+
+
+@functools.lru_cache(maxsize=None)
+def rain_tables():
+    """
+    Look-up tables of the rain size distribution, built at the first call
+    (only the two-moment scheme with irain_tab = 1 uses them).
+
+    Input:  rain_tables()
+    Output: {name: RainTable} of vq_cloud, vq_rain, mue1_lam, vent, gamma_eva
+    """
+    return {'vq_cloud': RainTable(lambda x_r: rain_vq(x_r,True),x_kink_sedi),
+            'vq_rain': RainTable(lambda x_r: rain_vq(x_r,False),x_kink_sedi),
+            'mue1_lam': RainTable(lambda x_r: rain_evap(x_r)[0],x_kink_evap),
+            'vent': RainTable(lambda x_r: rain_evap(x_r)[1],x_kink_evap),
+            'gamma_eva': RainTable(lambda x_r: rain_evap(x_r)[2],x_kink_evap)}
+
+
+def seifert(config,thermo,qv,qc,qr,rainnc,rainncv,nc,nr):
     """
     ***********************************************
     Two-moment microphysical scheme (Seifert, 2001/2006)
     adapted from COSMO, Annette Miltenberger and Lukas Papritz (2012)
     ***********************************************
+
+    Density, temperature, pressure, height and vertical velocity are read
+    from the thermodynamic state (diagnostics.ThermoState).
+
+    Input:  seifert(config,thermo,qv,qc,qr,rainnc,rainncv,nc,nr)
+    Output: lheat,qv,qc,qr,rainnc,rainncv,nc,nr
     """
+    dt, cp, r, r_v = config.dt, config.cp, config.r, config.r_v
+    iern, irain_tab = config.iern, config.irain_tab
+    eswat1 = eswat1_function(config.ithermo_tab)
 
     # define constants
     #svp1 = 0.6112
@@ -213,82 +633,22 @@ def seifert(u,t,pres,snew,qv,qc,qr,exn,zhtold,zhtnow,rainnc,rainncv,nc,nr,dtheta
     #nr_ini = nr
     #nc_ini = nc
 
-    # constants
-    # ----------
-
-    rho0 = 1.225
-    rho_w = 1000           # density of liquid water 
-    L_wd = 2.4*10**6       # heat of vaporisation
-    K_T = 2.500*10**(-2)   # heat conductivity
-    c_r = 1./2
-
-    # characteristics of cloud droplet distribution (cloud_nue1mue1)
-    nu = 1                 # parameters describing assumed distribution 
-    x_max = 2.6*10**(-10)  # maximal droplet mass 
-    x_min = 4.20*10**(-15) # minimal droplet mass
-
-    # characteristics of rain droplet distribution (rainULI)
-    rain_x_min = 2.6*10**(-10)    # minimale Teilchenmasse
-    rain_x_max = 3.*10**(-6)      # maximale Teilchenmasse
-    a_geo = 1.24*10**(-1)         # Koeff. Geometrie
-    b_geo = 0.333333              # Koeff. Geometrie
-    a_ven = 0.780000              # Koeff. Ventilation (PK)
-    b_ven = 0.308000              # Koeff. Ventilation (PK)
-    rain_nu = 0                   # Breiteparameter der Verteilung
-
-    # parameters for autoconversion
-    k_c = 9.44*10**9   # Long-Kernel
-    k_1 = 600          # Parameter fuer Phi-Fkt. (autoconversion)
-    k_2 = 0.68         # Parameter fuer Phi-Fkt. (autoconversion)
-    k_au = k_c/(20.*x_max)*(nu+2)*(nu+4)/(nu+1)**2   # autoconversion constant
-
-    # parameters for accretion
-    k_3 = 5*10**(-4)      # Parameter fuer Phi-Fkt. (accretion)
-    k_r = 5.78           # Parameter Kernel (accretion)
-
-    # parameter for rain selfcollection and break-up
-    k_sc = k_c*(nu+2)/(nu+1)                         # selfcollection constant
-    k_rr = 4.33
-    k_br = 1000
-    D_br = 1.1*10**(-3)
-
-    # parameters for rain evaporation and sedimentation
-    rain_cmu0 = 6
-    rain_cmu1 = 30
-    rain_cmu2 = 10.**3
-    rain_cmu3 = 1.1*10.**(-3)
-    rain_cmu4 = 1
-    rain_cmu5 = 2
-    N_sc = 0.710           # Schmidt-Zahl (PK)
-    n_f = 0.333            # Exponent von N_sc im Vent-koeff.
-    m_f = 0.5              # Exponent von N_re im Vent-koeff.
-    nu_l = 1.460*10.**(-5) # Kinem. Visc. von Luft
-    aa = 9.65
-    bb = 10.3
-    cc = 600
-    alf = 9.65
-    bet = 10.3
-    gamma = 600
-
     # transpose input fields
     rainnc_tr = rainnc.T
     rainncv_tr = rainncv.T
-    t_tr = t.T
 
     # reset rain rate to zero
     rainncv_tr=0.
 
-    # compute density
+    # grid size (the scheme can run on a part of the domain)
+    nxb,nz = qv.shape
+
+    # density, temperature, pressure and L/(cp_d*exn/cp)
     # ------------------------
-    i=np.arange(0,nxb)
-    k=np.arange(0,nz)
-    ii,kk=np.ix_(i,k)
-    pii = exn/cp
-    rho = np.zeros((nxb,nz))
-    rho[:,k] = snew[:,k]*dth/(zhtnow[:,k+1]-zhtnow[:,k])
-    t = 0.5*(pii[ii,kk+1]*np.tile(t_tr[k+1],(nxb,1))+pii[ii,kk]*np.tile(t_tr[k],(nxb,1)))
-    p = 0.5*(pres[ii,kk]+pres[ii,kk+1])#1E05* (0.5*(pii[ii,kk+1]+pii[ii,kk])**(1004./287.))
-    gam = 2.5E06/(1004.*0.5*(pii[ii,kk]+pii[ii,kk+1])) # L / (cp_d * exn/cp)
+    rho = thermo.rho
+    t = thermo.t
+    p = thermo.p
+    gam = thermo.gam
 
     rrho_c = (rho0/rho)
     rrho_04 = (rho0/rho)**0.5
@@ -296,18 +656,7 @@ def seifert(u,t,pres,snew,qv,qc,qr,exn,zhtold,zhtnow,rainnc,rainncv,nc,nr,dtheta
     f5 = svp2*(svpt0 - svp3)*xlv/cp
 
     # vertical wind 
-    i=np.arange(1,(nxb-1))
-    k=np.arange(0,nz)
-    ii,kk=np.ix_(i,k)
-    dz_dx = np.zeros((nxb,nz))
-    dz_dx[ii,kk] = (zhtnow[ii+1,kk+1]+zhtnow[ii+1,kk] - zhtnow[ii-1,kk+1]-zhtnow[ii-1,kk]) / (4.*dx)
-    w = np.zeros((nxb,nz))
-    #w[ii,kk] = 0.5*(zhtnow[ii,kk]+zhtnow[ii,kk+1] - zhtold[ii,kk]-zhtold[ii,kk+1]) / dt + 0.5*(u[ii+1,kk)]+u[ii,kk])*dz_dx[ii,kk] 
-    w[ii,kk] = 0.5 * (u[ii+1,kk]+u[ii,kk]) * dz_dx[ii,kk] 
-    if(idthdt==1):
-        w[ii,kk] = w[ii,kk] + 0.5 * (dthetadt[ii,kk]+dthetadt[ii,kk+1]) * snew[ii,kk] / rho[ii,kk]
-    w[0,k] = 0.
-    w[nxb-1,k] = 0.
+    w = thermo.w
 
     # nucleation
     #-----------
@@ -321,13 +670,7 @@ def seifert(u,t,pres,snew,qv,qc,qr,exn,zhtold,zhtnow,rainnc,rainncv,nc,nr,dtheta
     wcb_min = 0.1
     scb_min = 0.0
 
-    T_3 = 273.2 #triple point water
-    e_3 = 6.1078*100 # saturation vapor pressure at triple point
-    A_w = 17.2693882 # constant f. saturation vapor pressure (water)
-    B_w = 35.86 # constant f. saturation vapor pressure (water)
-    e_ws_vec  = lambda ta: e_3*np.exp(A_w*(ta-T_3)/(ta-B_w))
-
-    ssw = r_v*rho*qv*t/e_ws_vec(t)-1.0
+    ssw = r_v*rho*qv*t/eswat2(t)-1.0
 
     qr = qr*rho
     qv = qv*rho
@@ -349,61 +692,19 @@ def seifert(u,t,pres,snew,qv,qc,qr,exn,zhtold,zhtnow,rainnc,rainncv,nc,nr,dtheta
     N_cn0 = 5000*10**6
     etas  = 0.8          # soluble fraction
 
-    #Look-up tables (for r2 = 0.03 mum, lsigs = 0.4)
-    wcb_ind =  np.array([0,   0.5,   1.0,   2.5,   5.0])
-    ncn_ind =  np.array([0,    50,    100,    200,    400,    800,    1600,    3200,    6400],dtype=np.float64)*10**6 #fix for windows
-
-    ltab_nuc = np.array([[0.,     0.,      0.,      0.,      0.,      0.,       0.,       0.,       0.],
-        [0.,     37.2,    67.1,   119.5,   206.7,   340.5,    549.4,    549.4,    549.4],
-        [0.,     39.0,    77.9,   141.2,   251.8,   436.7,    708.7,   1117.7,   1117.7],
-        [0.,     42.3,    84.7,   169.3,   310.3,   559.5,    981.7,   1611.6,   2455.6],
-        [0.,     44.0,    88.1,   176.2,   352.3,   647.8,   1173.0,   2049.7,   3315.6]])
-    ltab_nuc = ltab_nuc*10**6
-
     # hard upper limit for number conc that eliminates also unrealistic high value
     # that would come from the dynamical core
     nc[w_cb>0] = np.minimum(nc[w_cb>0],N_cn0)
 
     # N_cn depends on height (to avoid strong in-cloud nucleation)
-    zml_k = 0.5*(zhtnow[:,0:nz]+zhtnow[:,1:nz+1])
+    zml_k = thermo.zml
     n_cn = N_cn0*np.minimum(np.exp((z0_nccn-zml_k)/z1e_nccn), 1.0)  # exponential decrease with height
     n_cn = np.float64(n_cn) #fix for windows
 
+    # number of activated CCN at all updraft points
     nccn = np.zeros((nxb,nz))
-    lp = np.array(np.where(w_cb > 0))
-    for j1,j2 in lp.T:
-        maty, = np.where(wcb_ind>w_cb[j1,j2]) #ugly workaround: When idthdt ==1
-        matx, = np.where(ncn_ind>n_cn[j1,j2])
-
-        if (not np.any(matx)):
-            matx=1
-        if (not np.any(maty)):
-            maty=1
-
-        locy = np.min(maty)-1
-        locx = np.min(matx)-1
-        if (locx<8) and (locy<4):
-            indx0 = (n_cn[j1,j2]-ncn_ind[locx])/(ncn_ind[locx+1]-ncn_ind[locx])
-						#print indx0.type
-            indx1 = 1-indx0
-            indy0 = (w_cb[j1,j2]-wcb_ind[locy])/(wcb_ind[locy+1]-wcb_ind[locy])
-            indy1 = 1-indy0
-            nccn[j1,j2] = (indx0*ltab_nuc[locy,locx]+indx1*ltab_nuc[locy,locx+1])*indy0+\
-                (indx0*ltab_nuc[locy+1,locx]+indx1*ltab_nuc[locy+1,locx+1])*indy1
-        elif (locx<8) and (locy>=4):
-            indx0 = (n_cn[j1,j2]-ncn_ind[locx])/(ncn_ind[locx+1]-ncn_ind[locx])
-            indx1 = 1-indx0
-            locy = np.min([locy,4])
-            nccn[j1,j2] = indx0*ltab_nuc[locy,locx]+indx1*ltab_nuc[locy,locx+1]
-        elif (locy<4) and (locx>=8):
-            indy0 = (w_cb[j1,j2]-wcb_ind[locy])/(wcb_ind[locy+1]-wcb_ind[locy])
-            indy1 = 1-indy0
-            locx = np.min([locx,8])
-            nccn[j1,j2] = ltab_nuc[locy,locx]*indy0+ltab_nuc[locy+1,locy]*indy1
-        else:
-            locy = 4
-            locx = 8
-            nccn[j1,j2] = ltab_nuc[locy,locx]
+    ind = (w_cb > 0)
+    nccn[ind] = interp_table2d(n_cn[ind],w_cb[ind],ncn_ind,wcb_ind,ltab_nuc)
 
     # If n_cn is outside the range of the lookup table values, resulting
     # NCCN are clipped to the margin values. For the case of these margin values
@@ -422,142 +723,178 @@ def seifert(u,t,pres,snew,qv,qc,qr,exn,zhtold,zhtnow,rainnc,rainncv,nc,nr,dtheta
 
     #nucn_max=np.maximum(nuc_n,nucn_max)
 
-    # autoconversion, accretion, selfcollection, break-up
+    # autoconversion, accretion, selfcollection, break-up, evaporation
     #----------------------------------------------------
-    # autoconversion
-
-    if np.any(qc > 0):
-        #print('autoconversion')
-        au = np.zeros((nxb,nz))
-        sc = np.zeros((nxb,nz))
-
-        ind = (qc>0)
-        x_c = np.minimum(np.maximum(qc[ind]/nc[ind],x_min),x_max)
-        au[ind] = k_au*qc[ind]**2.*x_c**2.*dt*rrho_c[ind]
-
-        if np.any(qc > 10**(-6)):
-            ind1 = (qc>10**-6)
-            tau = np.minimum(np.maximum(1-(qc[ind1]/(qc[ind1]+qr[ind1])),10**(-25)),0.9)
-            phi = k_1*tau**k_2*(1-tau**k_2)**3
-            au[ind1] = au[ind1]*(1+phi/(1-tau)**2)
-
-        au[ind] = np.maximum(np.minimum(qc[ind],au[ind]),0)
-        sc[ind] = k_sc*qc[ind]**2.*dt*rrho_c[ind]   # selfcollection cloud droplets
-
-        nr_au = au[ind]/x_max
-        nc_au = np.minimum(nc[ind],sc[ind])
-
-        qc = qc-au
-        qr = qr+au
-        nr[ind] = nr[ind]+nr_au
-        nc[ind] = nc[ind]-nc_au
-
-    # accretion
-    ac = np.zeros((nxb,nz))
-    if np.any((qc > 0) & (qr >0)):
-        #print('accretion')
-        ind = (qc>0) & (qr>0)
-        tau = np.minimum(np.maximum(1-qc[ind]/(qc[ind]+qr[ind]),10**(-25)),1)
-        phi = (tau/(tau+k_3))**4
-        ac[ind] = k_r*qc[ind]*qr[ind]*phi*rrho_04[ind]*dt
-        ac = np.minimum(qc,ac)
-
-        x_c = np.minimum(np.maximum(qc/nc,x_min),x_max)
-        nc_ac = np.minimum(nc,ac/x_c)
-
-        qr = qr+ac
-        qc = qc-ac
-        nc = nc-nc_ac
-
-    # self-collection rain / breakup
-    if np.any(qr > 0):
-        #print('selfcollection')
-        ind = (qr>0)
-        x_r = np.minimum(np.maximum(qr[ind]/nr[ind],rain_x_min),rain_x_max)
-        D_r = a_geo*x_r**b_geo
-
-        # selfcollection
-        sc = k_rr*nr[ind]*qr[ind]*rrho_04[ind]*dt
-
-        # breakup
-        br = sc*0
-        if np.any(D_r > 0.3*10**(-3)):
+    # All these process rates vanish where there is neither cloud water
+    # nor rain. The fields at the points with qc > 0 or qr > 0 are packed
+    # into 1-D vectors, all processes are evaluated on these vectors and
+    # the results are scattered back once.
+    act = np.nonzero((qc > 0) | (qr > 0))
+    npt = act[0].size
+
+    if npt > 0:
+        qc_a = qc[act]
+        qr_a = qr[act]
+        nc_a = nc[act]
+        nr_a = nr[act]
+        rrho_c_a = rrho_c[act]
+        rrho_04_a = rrho_04[act]
+
+        # autoconversion
+        ind = (qc_a > 0)
+        if np.any(ind):
+            #print('autoconversion')
+            au = np.zeros(npt)
+            sc = np.zeros(npt)
+
+            x_c = np.minimum(np.maximum(qc_a[ind]/nc_a[ind],x_min),x_max)
+            au[ind] = k_au*qc_a[ind]**2.*x_c**2.*dt*rrho_c_a[ind]
+
+            ind1 = (qc_a > 10**-6)
+            if np.any(ind1):
+                tau = np.minimum(np.maximum(1-(qc_a[ind1]/(qc_a[ind1]+qr_a[ind1])),10**(-25)),0.9)
+                phi = k_1*tau**k_2*(1-tau**k_2)**3
+                au[ind1] = au[ind1]*(1+phi/(1-tau)**2)
+
+            au[ind] = np.maximum(np.minimum(qc_a[ind],au[ind]),0)
+            sc[ind] = k_sc*qc_a[ind]**2.*dt*rrho_c_a[ind]   # selfcollection cloud droplets
+
+            nr_au = au[ind]/x_max
+            nc_au = np.minimum(nc_a[ind],sc[ind])
+
+            qc_a = qc_a-au
+            qr_a = qr_a+au
+            nr_a[ind] = nr_a[ind]+nr_au
+            nc_a[ind] = nc_a[ind]-nc_au
+
+        # accretion
+        ind = (qc_a > 0) & (qr_a > 0)
+        if np.any(ind):
+            #print('accretion')
+            ac = np.zeros(npt)
+            tau = np.minimum(np.maximum(1-qc_a[ind]/(qc_a[ind]+qr_a[ind]),10**(-25)),1)
+            phi = (tau/(tau+k_3))**4
+            ac[ind] = k_r*qc_a[ind]*qr_a[ind]*phi*rrho_04_a[ind]*dt
+            ac = np.minimum(qc_a,ac)
+
+            x_c = np.minimum(np.maximum(qc_a/nc_a,x_min),x_max)
+            nc_ac = np.minimum(nc_a,ac/x_c)
+
+            qr_a = qr_a+ac
+            qc_a = qc_a-ac
+            nc_a = nc_a-nc_ac
+
+        # self-collection rain / breakup
+        ind = (qr_a > 0)
+        if np.any(ind):
+            #print('selfcollection')
+            x_r = np.minimum(np.maximum(qr_a[ind]/nr_a[ind],rain_x_min),rain_x_max)
+            D_r = a_geo*x_r**b_geo
+
+            # selfcollection
+            sc = k_rr*nr_a[ind]*qr_a[ind]*rrho_04_a[ind]*dt
+
+            # breakup
+            br = sc*0
             ind1 = (D_r>0.3*10**(-3))
-            phi1 = k_br*(D_r[ind1]-D_br)+1
-            br[ind1] = phi1*sc[ind1]
+            if np.any(ind1):
+                phi1 = k_br*(D_r[ind1]-D_br)+1
+                br[ind1] = phi1*sc[ind1]
 
-        nr_sc = np.minimum(nr[ind],sc-br)
+            nr_sc = np.minimum(nr_a[ind],sc-br)
 
-        nr[ind] = nr[ind]-nr_sc
+            nr_a[ind] = nr_a[ind]-nr_sc
 
-    nr[nr<0] = 0.
-    nc[nc<0] = 0.
-    qc[qc<0] = 0.
-    qr[qr<0] = 0.
+        nr_a[nr_a<0] = 0.
+        nc_a[nc_a<0] = 0.
+        qc_a[qc_a<0] = 0.
+        qr_a[qr_a<0] = 0.
 
-    qc[np.isnan(qc)] = 0.
-    qr[np.isnan(qr)] = 0.
-    nc[np.isnan(nc)] = 0.
-    nr[np.isnan(nr)] = 0.
+        qc_a[np.isnan(qc_a)] = 0.
+        qr_a[np.isnan(qr_a)] = 0.
+        nc_a[np.isnan(nc_a)] = 0.
+        nr_a[np.isnan(nr_a)] = 0.
 
-    if (iern == 1):
+        if (iern == 1):
+
+            # evaporation of rain droplets
+            # -----------------------------
+            qv_a = qv[act]
+            t_a = t[act]
+            p_a = p[act]
 
-        # evaporation of rain droplets
-        # -----------------------------
-        e_d = qv*r_v*t
-        e_sw = e_ws_vec(t)
-        s_sw = e_d/e_sw - 1
+            e_d = qv_a*r_v*t_a
+            e_sw = eswat2(t_a)
+            s_sw = e_d/e_sw - 1
 
-        if np.any((s_sw < 0) & (qr > 0) & (qc < 10**(-9))): 
             # condition for the occurence of evaporation
-            ind = (s_sw < 0) & (qr > 0) & (qc < 10**(-9))
+            ind = (s_sw < 0) & (qr_a > 0) & (qc_a < 10**(-9))
+            if np.any(ind):
 
-            eva_q = np.zeros((nxb,nz))
-            eva_n = np.zeros((nxb,nz))
+                eva_q = np.zeros(npt)
+                eva_n = np.zeros(npt)
 
-            d_vtp = 8.7602*10**(-5)*t[ind]**(1.81)/p[ind]
-            g_d = 4.0*np.pi/(L_wd**2./(K_T*r_v*t[ind]**2)+r_v*t[ind]/(d_vtp*e_sw[ind]))
+                d_vtp = 8.7602*10**(-5)*t_a[ind]**(1.81)/p_a[ind]
+                g_d = 4.0*np.pi/(L_wd**2./(K_T*r_v*t_a[ind]**2)+r_v*t_a[ind]/(d_vtp*e_sw[ind]))
 
-            x_r = qr[ind]/(nr[ind]+10**(-20))
-            x_r = np.minimum(np.maximum(x_r,rain_x_min),rain_x_max)
+                x_r = qr_a[ind]/(nr_a[ind]+10**(-20))
+                x_r = np.minimum(np.maximum(x_r,rain_x_min),rain_x_max)
 
-            D_m = a_geo*x_r**b_geo
+                if irain_tab == 1:
+                    # coefficients from the look-up tables
+                    tabs = rain_tables()
+                    i,wt = tabs['mue1_lam'].locate(x_r)
+                    mue1_lam = tabs['mue1_lam'].lookup(i,wt)
+                    vent = tabs['vent'].lookup(i,wt)
+                    gamma_eva = tabs['gamma_eva'].lookup(i,wt)
 
-            mue = np.empty(x_r.shape)
-            mue[D_m <= rain_cmu3] = rain_cmu0*np.tanh((4.*rain_cmu2* \
-                (D_m[D_m <= rain_cmu3]-rain_cmu3))**rain_cmu5)+rain_cmu4
-            mue[D_m > rain_cmu3] = rain_cmu1*np.tanh((rain_cmu2* \
-               (D_m[D_m > rain_cmu3]-rain_cmu3))**rain_cmu5)+rain_cmu4
+                    f_q = a_ven+b_ven*N_sc**n_f*(aa/nu_l*rrho_04_a[ind])**m_f*vent
+
+                    eva_q[ind] = -g_d*c_r*nr_a[ind]*mue1_lam*f_q*s_sw[ind]*dt
+                    eva_n[ind] = gamma_eva*eva_q[ind]/x_r
+                else:
+                    D_m = a_geo*x_r**b_geo
 
-            mue = mue.T
+                    mue = np.empty(x_r.shape)
+                    mue[D_m <= rain_cmu3] = rain_cmu0*np.tanh((4.*rain_cmu2* \
+                        (D_m[D_m <= rain_cmu3]-rain_cmu3))**rain_cmu5)+rain_cmu4
+                    mue[D_m > rain_cmu3] = rain_cmu1*np.tanh((rain_cmu2* \
+                       (D_m[D_m > rain_cmu3]-rain_cmu3))**rain_cmu5)+rain_cmu4
 
-            lam = (np.pi/6.*rho_w*(mue+3)*(mue+2)*(mue+1)/x_r)**(1./3.)
+                    lam = (np.pi/6.*rho_w*(mue+3)*(mue+2)*(mue+1)/x_r)**(1./3.)
 
-            gfak = 1.357940435+mue*(0.3033273220+mue*(-0.1299313363*10**(-1) + \
-                mue*(0.4002257774*10**(-3) -mue*0.4856703981*10**(-5))))
+                    gfak = 1.357940435+mue*(0.3033273220+mue*(-0.1299313363*10**(-1) + \
+                        mue*(0.4002257774*10**(-3) -mue*0.4856703981*10**(-5))))
 
-            f_q = a_ven+b_ven*N_sc**n_f*(aa/nu_l*rrho_04[ind])**m_f*gfak/np.sqrt(lam)* \
-                (1.-1./2.*(bb/aa)*(lam/(cc+lam))**(mue+5./2.) \
-                -1./8.*(bb/aa)**2.*(lam/(2.*cc+lam))**(mue+5./2.) \
-                -1./16.*(bb/aa)**3.*(lam/(3.*cc+lam))**(mue+5./2.) \
-                -5./127.*(bb/aa)**4.*(lam/(4.*cc+lam))**(mue+5./2.))
+                    f_q = a_ven+b_ven*N_sc**n_f*(aa/nu_l*rrho_04_a[ind])**m_f*gfak/np.sqrt(lam)* \
+                        (1.-1./2.*(bb/aa)*(lam/(cc+lam))**(mue+5./2.) \
+                        -1./8.*(bb/aa)**2.*(lam/(2.*cc+lam))**(mue+5./2.) \
+                        -1./16.*(bb/aa)**3.*(lam/(3.*cc+lam))**(mue+5./2.) \
+                        -5./127.*(bb/aa)**4.*(lam/(4.*cc+lam))**(mue+5./2.))
 
-            gamma_eva = np.empty(x_r.shape)
-            gamma_eva[gfak > 0] = gfak[gfak>0]*(1.1*10**(-3)/D_m)*np.exp(-0.2*mue)
-            gamma_eva[gfak <= 0] = 1
-            gamma_eva = gamma_eva.T
+                    gamma_eva = np.empty(x_r.shape)
+                    gamma_eva[gfak > 0] = gfak[gfak>0]*(1.1*10**(-3)/D_m)*np.exp(-0.2*mue)
+                    gamma_eva[gfak <= 0] = 1
 
-            eva_q[ind] = -g_d*c_r*nr[ind]*(mue+1)/lam*f_q*s_sw[ind]*dt
-            eva_n[ind] = gamma_eva*eva_q[ind]/x_r
+                    eva_q[ind] = -g_d*c_r*nr_a[ind]*(mue+1)/lam*f_q*s_sw[ind]*dt
+                    eva_n[ind] = gamma_eva*eva_q[ind]/x_r
 
-            eva_q = np.maximum(eva_q,0)
-            eva_n = np.maximum(eva_n,0)
-            eva_q = np.minimum(eva_q,qr)
-            eva_n = np.minimum(eva_n,nr)
+                eva_q = np.maximum(eva_q,0)
+                eva_n = np.maximum(eva_n,0)
+                eva_q = np.minimum(eva_q,qr_a)
+                eva_n = np.minimum(eva_n,nr_a)
 
-            qv = qv + eva_q
-            qr = qr - eva_q
-            nr = nr - eva_n
+                qv_a = qv_a + eva_q
+                qr_a = qr_a - eva_q
+                nr_a = nr_a - eva_n
+
+                qv[act] = qv_a
+
+        # scatter back
+        qc[act] = qc_a
+        qr[act] = qr_a
+        nc[act] = nc_a
+        nr[act] = nr_a
 
     # conversion of mixing ratios to mass densities
     # -------------------------------------------------------------------------
@@ -597,11 +934,11 @@ def seifert(u,t,pres,snew,qv,qc,qr,exn,zhtold,zhtnow,rainnc,rainncv,nc,nr,dtheta
 
     # sedimentation of rain droplets
     # ------------------------------
-    dzmin = 10**10
     # density correction for fall velocities
     rhocorr = (rho0/rho)**0.5
-    adz = 1/(zhtnow[:,1:nz+1]-zhtnow[:,0:nz]) # reciprocal vertical grid
-    dzmin = np.minimum(1.0/adz,dzmin)
+    adz = 1/thermo.dz # reciprocal vertical grid
+    # smallest layer thickness of the whole domain
+    dzmin = np.minimum(thermo.dzmin,10**10)
 
     qr = qr*rho
     nr = nr*rho
@@ -623,22 +960,34 @@ def seifert(u,t,pres,snew,qv,qc,qr,exn,zhtold,zhtnow,rainnc,rainncv,nc,nr,dtheta
             x_r = np.zeros((nxb,nz))
             x_r[ind] = qr[ind]/nr[ind]
             x_r[ind] = np.minimum(np.maximum(x_r[ind],rain_x_min),rain_x_max)
-            D_m = (6./(rho_w*np.pi)*x_r)**(1./3.)
-
-            mue = np.zeros((nxb,nz))
-            if np.any((qc >= 10**(-20)) & (qr>10**(-20))):
-                mue[(qc>=10**(-20)) & (qr>10**(-20))] = (rain_nu+1)/b_geo-1
-            if np.any((D_m[ind] <= rain_cmu3) & (qc[ind] <= 10**(-20))):
-                ind1 = (D_m <= rain_cmu3) & (qr>10**(-20)) & (qc <= 10**(-20))
-                mue[ind1] = rain_cmu0*np.tanh((4.*rain_cmu2*(D_m[ind1]-rain_cmu3))**2)+rain_cmu4
-            if np.any((D_m[ind] > rain_cmu3) & (qc[ind] <= 10**(-20))):
-                ind2 = (D_m > rain_cmu3) & (qr>10**(-20)) & (qc <= 10**(-20))
-                mue[ind2] = rain_cmu1*np.tanh((rain_cmu2*(D_m[ind2]-rain_cmu3))**2)+rain_cmu4
-
-            D_r = (D_m**3./((mue+3.)*(mue+2.)*(mue+1.)))**(1./3.)
-
-            v_n = alf-bet/(1.+gamma*D_r)**(mue+1.)
-            v_q = alf-bet/(1.+gamma*D_r)**(mue+4.)
+
+            if irain_tab == 1:
+                # fall velocities from the look-up tables (without rain:
+                # D_r = 0, i.e. alf-bet)
+                v_q = np.full((nxb,nz),alf-bet)
+                ind1 = ind & (qc > 10**(-20))
+                ind2 = ind & (qc <= 10**(-20))
+                tabs = rain_tables()
+                v_q[ind1] = tabs['vq_cloud'](x_r[ind1])
+                v_q[ind2] = tabs['vq_rain'](x_r[ind2])
+                v_n = v_q       # the number density falls with v_q as well
+            else:
+                D_m = (6./(rho_w*np.pi)*x_r)**(1./3.)
+
+                mue = np.zeros((nxb,nz))
+                if np.any((qc >= 10**(-20)) & (qr>10**(-20))):
+                    mue[(qc>=10**(-20)) & (qr>10**(-20))] = (rain_nu+1)/b_geo-1
+                if np.any((D_m[ind] <= rain_cmu3) & (qc[ind] <= 10**(-20))):
+                    ind1 = (D_m <= rain_cmu3) & (qr>10**(-20)) & (qc <= 10**(-20))
+                    mue[ind1] = rain_cmu0*np.tanh((4.*rain_cmu2*(D_m[ind1]-rain_cmu3))**2)+rain_cmu4
+                if np.any((D_m[ind] > rain_cmu3) & (qc[ind] <= 10**(-20))):
+                    ind2 = (D_m > rain_cmu3) & (qr>10**(-20)) & (qc <= 10**(-20))
+                    mue[ind2] = rain_cmu1*np.tanh((rain_cmu2*(D_m[ind2]-rain_cmu3))**2)+rain_cmu4
+
+                D_r = (D_m**3./((mue+3.)*(mue+2.)*(mue+1.)))**(1./3.)
+
+                v_n = alf-bet/(1.+gamma*D_r)**(mue+1.)
+                v_q = alf-bet/(1.+gamma*D_r)**(mue+4.)
             v_n = v_n*rhocorr
             v_q = v_q*rhocorr
             v_n = np.maximum(v_n,0.1)
@@ -652,49 +1001,10 @@ def seifert(u,t,pres,snew,qv,qc,qr,exn,zhtold,zhtnow,rainnc,rainncv,nc,nr,dtheta
         v_n_rain[:,0] = v_n_rain[:,1] 
         v_q_rain[:,0] = v_q_rain[:,1]
 
-        for k in range(nz-2,-1,-1):    
-
-            v_nv = 0.5*(v_n_rain[:,k+1]+v_n_rain[:,k])
-            v_qv = 0.5*(v_q_rain[:,k+1]+v_q_rain[:,k])
-            # assuming v_nv, v_qv always_negative
-            c_nv = -v_nv*adz[:,k]*dt_sedi
-            c_qv = -v_qv*adz[:,k]*dt_sedi
-
-            kk = k
-            s_nv = np.zeros((nxb))
-            s_nv[c_nv<=1] = v_nv[c_nv<=1]*nr[c_nv<=1,k]
-            if np.any(c_nv > 1):
-                cflag = np.zeros((nxb),dtype=bool)
-                while (np.any(c_nv > 1) and (kk<nz-1)):
-                    ind = (c_nv>1)
-                    cflag[ind] = True
-                    s_nv[ind] = s_nv[ind]+nr[ind,kk]/adz[ind,kk]
-                    c_nv[ind] = (c_nv[ind]-1)*adz[ind,kk+1]/adz[ind,kk]
-                    kk  = kk+1
-                s_nv[cflag] = s_nv[cflag]+nr[cflag,kk]/adz[cflag,kk]*np.minimum(c_nv[cflag],1.0)
-                s_nv[cflag] = -s_nv[cflag]/dt_sedi
-
-            kk = k
-            s_qv = np.zeros((nxb))
-            s_qv[c_qv<=1] = v_qv[c_qv<=1]*qr[c_qv<=1,k]
-            if np.any(c_qv > 1):
-                cflag = np.zeros((nxb),dtype=bool)
-                while (np.any(c_qv > 1) and (kk<nz-1)):
-                    ind = (c_qv>1)
-                    cflag[ind] = True
-                    s_qv[ind] = s_qv[ind]+qr[ind,kk]/adz[ind,kk]
-                    c_qv[ind] = (c_qv[ind]-1)*adz[ind,kk+1]/adz[ind,kk]
-                    kk  = kk + 1
-                s_qv[cflag] = s_qv[cflag] + qr[cflag,kk]/adz[cflag,kk]*np.minimum(c_qv[cflag],1.0)
-                s_qv[cflag] = -s_qv[cflag]/dt_sedi
-
-            # Flux-limiter to avoid negative values
-            n_flux[:,k] = np.maximum(s_nv,n_flux[:,k+1]-nr[:,k]/(adz[:,k]*dt_sedi))
-            q_flux[:,k] = np.maximum(s_qv,q_flux[:,k+1]-qr[:,k]/(adz[:,k]*dt_sedi))
-
-        # uppper boundary condition
-        n_flux[:,nz-1] = 0.0
-        q_flux[:,nz-1] = 0.0
+        # sedimentation fluxes of number and mass density
+        n_flux,q_flux = sedimentation_flux(np.array([nr,qr]),
+                                           np.array([v_n_rain,v_q_rain]),
+                                           adz,dt_sedi)
 
         k = np.arange(0,nz-1)
         nr[:,k] = nr[:,k]+(n_flux[:,k]-n_flux[:,k+1])*adz[:,k]*dt_sedi
@@ -0,0 +1,647 @@
+# -*- coding: utf-8 -*-
+"""
+The isentropic model as a function: run(config) integrates the model for a
+configuration (see config.py) and returns the output fields in memory.
+solver.py is a thin wrapper around it for the active namelist.
+
+Usage:  from config import Config
+        from model import run
+        result = run(Config.from_namelist('namelist_ex5'))
+        result.U[-1]            # velocity (z,x) at the last output step
+        result.write()          # .npz file as written by solver.py
+
+        # ensemble of members differing in the initial state, integrated
+        # together with a leading member axis (nens,nxb,nz)
+        result = run(config, members=[{'u00': 10.}, {'u00': 15.}])
+        result.member(1).write()
+
+        # checkpoint every 1000 steps; a rerun with irestart=1 continues
+        # from the last checkpoint (also with a later end time)
+        run(replace(config, icheckpoint=1000, irestart=1))
+"""
+
+import os
+import numpy as np              # Scientific computing with Python
+from time import time as tm     # Benchmarking tools
+from dataclasses import dataclass, replace
+from typing import List, Optional
+
+from config import Config, member_options
+import makesetup
+from modelstate import ModelState, precision_dtypes
+from boundary     import periodic, RelaxOperator
+from prognostics  import prog_isendens, prog_velocity, prog_tracers
+from diagnostics  import diag_montgomery, diag_pressure, diag_height, \
+                         ThermoState
+from diffusion    import horizontal_diffusion, DiffusionOperator
+from output       import Output, write_output
+from microphysics import kessler, seifert, cp_kessler, active_region
+from checkpoint   import write_checkpoint, read_checkpoint, restore
+
+
+@dataclass
+class Result:
+    """
+    Output fields of a model run (nout output steps, interior points only),
+    named as in solver.py. Fields of inactive options are None.
+
+    For an ensemble run the fields have a member axis after the time axis,
+    e.g. U(nout,nens,nz,nx), and members holds the configurations of the
+    members. With istream = 1 the fields are memory maps of the output
+    written to disk during the run (see stream.py).
+
+    T           ... output times [s] (nout)
+    Z           ... height of the model levels [m] (nout,nz,nx)
+    U, S        ... velocity [m/s] and isentropic density (nout,nz,nx)
+    QV, QC, QR  ... specific humidity, cloud and rain water (nout,nz,nx)
+    PREC        ... precipitation rate (nout,nx)
+    TOT_PREC    ... accumulated precipitation (nout,nx)
+    NR, NC      ... rain and cloud droplet number densities (nout,nz,nx)
+    DTHETADT    ... latent heating (nout,nz,nx)
+    elapsed     ... computation time of the time loop [s]
+    """
+
+    config: Config
+    T: np.ndarray
+    Z: np.ndarray
+    U: np.ndarray
+    S: np.ndarray
+    QV: Optional[np.ndarray] = None
+    QC: Optional[np.ndarray] = None
+    QR: Optional[np.ndarray] = None
+    PREC: Optional[np.ndarray] = None
+    TOT_PREC: Optional[np.ndarray] = None
+    NR: Optional[np.ndarray] = None
+    NC: Optional[np.ndarray] = None
+    DTHETADT: Optional[np.ndarray] = None
+    elapsed: float = 0.
+    members: Optional[List[Config]] = None
+
+    def member(self,m):
+        """
+        Result of the ensemble member m.
+        """
+        fields = {}
+        for name in ('Z','U','S','QV','QC','QR','PREC','TOT_PREC','NR','NC',
+                     'DTHETADT'):
+            phi = getattr(self,name)
+            fields[name] = None if phi is None else phi[:,m]
+        return Result(self.members[m],self.T,elapsed=self.elapsed,**fields)
+
+    def write(self):
+        """
+        Write the fields to the .npz file config.out_fname.
+        """
+        write_output(self.config,self.T,Z=self.Z,U=self.U,S=self.S,
+                     QV=self.QV,QC=self.QC,QR=self.QR,PREC=self.PREC,
+                     TOT_PREC=self.TOT_PREC,NR=self.NR,NC=self.NC,
+                     DTHETADT=self.DTHETADT)
+
+
+def run(config,members=None):
+    """
+    Integrate the model for the configuration config. With members (a list
+    of overrides of the options in config.member_options, e.g. u00, topomx
+    or the moisture layers) an ensemble is integrated, with all fields
+    having a leading member axis.
+
+    Input:  run(config,members)
+    Output: result
+    """
+    imoist, imicrophys, irelax, nrelax = \
+        config.imoist, config.imicrophys, config.irelax, config.nrelax
+    idthdt, idbg, iprtcfl, itime = \
+        config.idthdt, config.idbg, config.iprtcfl, config.itime
+    nts, dt, iiniout, nout, iout = \
+        config.nts, config.dt, config.iiniout, config.nout, config.iout
+    dx, nx, nb, nxb, nxb1, nz, nz1, nab = config.dx, config.nx, config.nb, \
+        config.nxb, config.nxb1, config.nz, config.nz1, config.nab
+    diff, diffabs, topotim = config.diff, config.diffabs, config.topotim
+    micro_thresh, precision, prs_double = \
+        config.micro_thresh, config.precision, config.prs_double
+    icheckpoint, irestart, istream, nout_queue = config.icheckpoint, \
+        config.irestart, config.istream, config.nout_queue
+    checkpoint_fname = config.out_fname + '_checkpoint'
+
+    # ensemble members (only the initial state differs)
+    if members is None:
+        ens = ()
+        member_configs = None
+    else:
+        for overrides in members:
+            other = set(overrides) - set(member_options)
+            if other:
+                raise ValueError('run: ensemble members can not differ in '
+                                 + ', '.join(sorted(other)))
+        if imoist == 1 and imicrophys == 2:
+            raise ValueError('run: no ensemble with the two moment scheme')
+        member_configs = [replace(config,**overrides) for overrides in members]
+        ens = (len(members),)
+
+    # increase number of output steps by 1 for initial profile
+    if iiniout == 1:
+        nout += 1
+
+    # floating point types of the dynamics, the tracers and the pressure /
+    # Montgomery integration
+    dtype_dyn, dtype_q, dtype_prs = precision_dtypes(precision,prs_double)
+
+    # Define physical fields
+    # -------------------------
+
+    # topography
+    topo = np.zeros(ens+(nxb,1))
+
+    # height in z-coordinates (old and new time level)
+    zhtold = np.zeros(ens+(nxb,nz1))
+    zhtnow = np.zeros_like(zhtold)
+
+    # tracers, advected, diffused and bounded as one stacked field q
+    tracers = []
+    if imoist == 1:
+        tracers += ['qv', 'qc', 'qr']
+        if imicrophys == 2:
+            tracers += ['nc', 'nr']
+    ntracer = len(tracers)
+
+    # prognostic fields with preallocated old, now and new time levels
+    prognostic_shapes = {'u': ens+(nxb1,nz), 's': ens+(nxb,nz)}
+    if ntracer > 0:
+        prognostic_shapes['q'] = (ntracer,)+ens+(nxb,nz)
+    state = ModelState(prognostic_shapes, stacks={'q': tracers},
+                       dtype={'u': dtype_dyn, 's': dtype_dyn, 'q': dtype_q})
+
+    # horizontal velocity
+    uold, unow, unew = state.levels('u')
+
+    # isentropic density
+    sold, snow, snew = state.levels('s')
+
+    # Montgomery potential
+    mtg    = np.zeros(ens+(nxb,nz),dtype=dtype_prs)
+    mtgnew = np.zeros_like(mtg)
+
+    # Exner function
+    exn  = np.zeros(ens+(nxb,nz1),dtype=dtype_prs)
+
+    # pressure
+    prs  = np.zeros(ens+(nxb,nz1),dtype=dtype_prs)
+
+    # precipitation and latent heating (None without moisture)
+    prec = tot_prec = dthetadt = None
+
+    if imoist == 1:
+        # precipitation
+        prec = np.zeros(ens+(nxb,))
+
+        # accumulated precipitation
+        tot_prec = np.zeros(ens+(nxb,))
+
+        # tracer stack
+        qold, qnow, qnew = state.levels('q')
+
+        # specific humidity
+        qvold, qvnow, qvnew = state.levels('qv')
+
+        # specific cloud water content
+        qcold, qcnow, qcnew = state.levels('qc')
+
+        # specific rain water content
+        qrold, qrnow, qrnew = state.levels('qr')
+
+        if imicrophys == 2:
+            # rain-droplet number density
+            nrold, nrnow, nrnew = state.levels('nr')
+
+            # cloud droplet number density
+            ncold, ncnow, ncnew = state.levels('nc')
+
+        if idthdt == 1:
+            # latent heating
+            dthetadt = np.zeros(ens+(nxb,nz1),dtype=dtype_dyn)
+
+    # Define fields at lateral boundaries
+    # 1 denotes the left boundary
+    # 2 denotes the right boundary
+    # ----------------------------------------------------------------------------
+    # topography
+    tbnd1 = 0.
+    tbnd2 = 0.
+
+    # isentropic density
+    sbnd1 = np.zeros(ens+(nz,),dtype=dtype_dyn)
+    sbnd2 = np.zeros(ens+(nz,),dtype=dtype_dyn)
+
+    # horizontal velocity
+    ubnd1 = np.zeros(ens+(nz,),dtype=dtype_dyn)
+    ubnd2 = np.zeros(ens+(nz,),dtype=dtype_dyn)
+
+    if imoist == 1:
+        # tracers (qv, qc, qr, and nc, nr for the 2-moment scheme)
+        qbnd1 = np.zeros((ntracer,)+ens+(nz,),dtype=dtype_q)
+        qbnd2 = np.zeros((ntracer,)+ens+(nz,),dtype=dtype_q)
+
+    if idthdt == 1:
+        # latent heating
+        dthetadtbnd1 = np.zeros(ens+(nz1,),dtype=dtype_dyn)
+        dthetadtbnd2 = np.zeros(ens+(nz1,),dtype=dtype_dyn)
+
+    # Set initial conditions
+    #-----------------------------------------------------------------------------
+    if idbg == 1:
+        print('Setting initial conditions ...\n')
+
+    def initial_state(e,member):
+        # initial fields and topography of the member e (... for all
+        # fields of a single run) with the options of the configuration
+        # member, set in place. Returns th0, exn0, prs0.
+        moist = {}
+        if imoist == 1:
+            # moist atmosphere (kessler scheme)
+            moist = dict(qvold=qvold[e],qvnow=qvnow[e],qcold=qcold[e],
+                         qcnow=qcnow[e],qrold=qrold[e],qrnow=qrnow[e])
+            if imicrophys == 2:
+                # moist atmosphere with 2-moment scheme
+                moist.update(ncold=ncold[e],ncnow=ncnow[e],nrold=nrold[e],
+                             nrnow=nrnow[e])
+        profile = makesetup.makeprofile(sold[e],snow[e],uold[e],unow[e],
+                                        mtg[e],mtgnew[e],member,**moist)
+
+        # Make topography
+        #----------------
+        makesetup.maketopo(topo[e],nxb,member)
+
+        return profile[:3]
+
+    if member_configs is None:
+        th0,exn0,prs0 = initial_state(Ellipsis,config)
+    else:
+        for m, member in enumerate(member_configs):
+            th0,exn0,prs0 = initial_state(m,member)
+
+    # Save boundary values for the lateral boundary relaxation
+    if irelax == 1:
+        if idbg == 1:
+            print('Saving initial lateral boundary values ...\n')
+
+        # relaxation operators of unstaggered and staggered fields
+        relax_s = RelaxOperator(nxb,nrelax)
+        relax_u = RelaxOperator(nxb1,nrelax)
+
+        sbnd1[:] = snow[...,0,:]
+        sbnd2[:] = snow[...,-1,:]
+
+        ubnd1[:] = unow[...,0,:]
+        ubnd2[:] = unow[...,-1,:]
+
+        if imoist==1:
+            qbnd1[:] = qnow[...,0,:]
+            qbnd2[:] = qnow[...,-1,:]
+
+        if idthdt == 1:
+            dthetadtbnd1[:] = dthetadt[...,0,:]
+            dthetadtbnd2[:] = dthetadt[...,-1,:]
+
+    # switch between boundary relaxation / periodic boundary conditions
+    #------------------------------------------------------------------
+    if irelax == 1:         # boundary relaxation
+        if idbg == 1:
+            print('Relax topography ...\n')
+
+        # save lateral boundary values of topography
+        tbnd1 = topo[...,0,:]
+        tbnd2 = topo[...,-1,:]
+
+        # relax topography
+        topo = relax_s.apply(topo,tbnd1,tbnd2)
+    else:
+        if idbg == 1:
+            print('Periodic topography ...\n')
+
+        # make topography periodic
+        topo = periodic(topo,nx,nb)
+
+
+    # calculate geometric height (staggered) of the initial profile
+    # (topofact = 0: the topography is not yet grown)
+    zhtnow = diag_height(config,prs0,exn0,th0,topo,0.,zhtnow)
+    zhtold[:] = zhtnow
+
+    # Height-dependent diffusion coefficient
+    # --------------------------------------
+    tau = diff*np.ones(nz)
+
+    # *** Exercise 3.1 height-dependent diffusion coefficient ***
+    # *** edit here ***
+    # In Exercise its wrong that k starts at 0 right?
+    # (59,59,1) wrong -> (60,59,0)
+    k = np.linspace(nz-nab, nz-1, nab, dtype= int)
+    tau[k] = diff + (diffabs-diff) * np.sin(np.pi/2 * (k-(nz-nab-1))/nab)**2
+
+    # *** Exercise 3.1 height-dependent diffusion coefficient ***
+
+    # diffusion and absorber operator, applied on the levels with tau > 0
+    diffop = DiffusionOperator(tau)
+
+    # thermodynamic state for the microphysics (the Kessler scheme uses its own cp)
+    if imoist == 1 and imicrophys == 1:
+        thermo = ThermoState(config,cp_kessler(config),*ens)
+    elif imoist == 1 and imicrophys == 2:
+        thermo = ThermoState(config)
+
+    # latent heating of the microphysics
+    if imoist == 1 and imicrophys > 0:
+        tmp = np.zeros(ens+(nxb,nz))
+
+    # output fields (in memory or written to disk step by step) and the
+    # initial fields
+    restart = irestart == 1 and os.path.exists(checkpoint_fname + '.npz')
+    output = Output(config,nout,ens,istream == 1,restart,nout_queue)
+    if iiniout == 1:
+        output.append(0,state,zht=zhtnow,prec=prec,tot_prec=tot_prec,
+                      dthetadt=dthetadt)
+
+    def checkpoint_arrays():
+        # fields carried from one time step to the next (besides the
+        # prognostic fields of state and the output)
+        arrays = dict(mtg=mtg,prs=prs,exn=exn,zhtold=zhtold,zhtnow=zhtnow,
+                      topo=topo,sbnd1=sbnd1,sbnd2=sbnd2,ubnd1=ubnd1,
+                      ubnd2=ubnd2)
+        if imoist == 1:
+            arrays.update(prec=prec,tot_prec=tot_prec,qbnd1=qbnd1,qbnd2=qbnd2)
+            if idthdt == 1:
+                arrays.update(dthetadt=dthetadt,dthetadtbnd1=dthetadtbnd1,
+                              dthetadtbnd2=dthetadtbnd2)
+        return arrays
+
+    # continue from the checkpoint of a previous run
+    its_start = 0
+    if restart:
+        saved = read_checkpoint(checkpoint_fname)
+        state.restore({name: saved['state_' + name] for name in state.fields})
+        restore(checkpoint_arrays(),saved)
+        output.restore(saved)
+        its_start = int(saved['its'])
+        print('Restart from %s.npz at timestep %g\n' %(checkpoint_fname,its_start))
+
+    # ########## TIME LOOP #######################################################
+    # ----------------------------------------------------------------------------
+    # Loop over all time steps
+    # ----------------------------------------------------------------------------
+    if idbg == 1:
+        print('Starting time loop ...\n')
+
+    t0 = tm()
+    for its in range(its_start+1,int(nts+1)):
+        # calculate time
+        time = its*dt
+
+        if itime == 1:
+            if idbg == 1 or idbg == 0:
+                print('========================================================\n')
+                print('Working on timestep %g; time = %g s\n' %(its,time))
+                print('========================================================\n')
+
+        # initially increase height of topography only slowly
+        topofact = min(1., float(time)/topotim)
+
+        # Special treatment of first time step
+        #-------------------------------------------------------------------------
+        if its == 1:
+            dtdx = dt/dx/2.
+            if imoist==1 and idthdt == 1:
+                # No latent heating for first time-step
+                dthetadt[:] = 0.
+            if idbg == 1:
+                print('Using Euler forward step for 1. step ...\n')
+        else:
+            dtdx = dt/dx
+
+        # *** Exercise 2.1 isentropic mass density ***
+        # *** time step for isentropic mass density ***
+        snew = prog_isendens(config,sold,snow,unow,dtdx,dthetadt,snew=snew)
+
+        # *** Exercise 2.1 isentropic mass density ***
+
+
+        # *** Exercise 4.1 / 5.1 moisture ***
+        # *** time step for moisture scalars and number densities ***
+        if imoist == 1:
+            qnew = prog_tracers(config,unow,qold,qnow,dtdx,dthetadt,qnew=qnew)
+
+        # *** Exercise 4.1 / 5.1 moisture scalars *** 
+
+        # *** Exercise 2.1 velocity ***
+        # *** time step for momentum ***
+        # *** edit here ***
+        unew = prog_velocity(config,uold,unow,mtg,dtdx,dthetadt,unew=unew)
+
+
+
+        # *** Exercise 2.1 velocity ***
+
+        # exchange boundaries if periodic
+        #-------------------------------------------------------------------------
+        if irelax == 0:
+            snew = periodic(snew,nx,nb)
+            unew = periodic(unew,nx+1,nb)
+
+            if imoist == 1:
+                qnew = periodic(qnew,nx,nb)
+
+
+        # relaxation of prognostic fields
+        #-------------------------------------------------------------------------
+        if irelax == 1:
+            if idbg == 1:
+                print('Relaxing prognostic fields ...\n')
+            relax_s.apply(snew,sbnd1,sbnd2)
+            relax_u.apply(unew,ubnd1,ubnd2)
+            if imoist == 1:
+                relax_s.apply(qnew,qbnd1,qbnd2)
+
+        # Diffusion and gravity wave absorber
+        #------------------------------------
+
+        if imoist == 0:
+            [unew,snew] = horizontal_diffusion(config,diffop,unew,snew)
+        else:
+            [unew,snew,qnew] = horizontal_diffusion(config,diffop,unew,snew,
+                                                 qnew=qnew)
+
+        # *** Exercise 2.2 (also 1.4) Diagnostic computation of pressure ***
+        # *** Diagnostic computation of pressure ***
+        prs = diag_pressure(config,prs0,prs,snew)
+
+        # *** Exercise 2.2 Diagnostic computation of pressure ***
+
+
+        # *** Exercise 2.2 (also 1.5) Diagnostic computation of Montgomery ***
+        # *** Calculate Exner function and Montgomery potential ***
+        exn, mtg = diag_montgomery(config,prs,mtg,exn,th0,topo,topofact)
+
+        # *** Exercise 2.2 Diagnostic computation  ***
+
+
+        # Calculation of geometric height (staggered)
+        # needed for output and microphysics schemes
+        # (double buffered: zhtold keeps the height of the previous step)
+        #---------------------------------
+        zhtold, zhtnow = zhtnow, zhtold
+        zhtnow = diag_height(config,prs,exn,th0,topo,topofact,zhtnow)
+
+        # Thermodynamic state on the model levels, shared by the microphysics
+        #---------------------------------
+        if imoist == 1 and imicrophys == 1:
+            thermo.update(snew,th0,prs,exn,zhtnow)
+        elif imoist == 1 and imicrophys == 2:
+            thermo.update(snew,th0,prs,exn,zhtnow,u=unew,dthetadt=dthetadt)
+
+        if imoist == 1:
+
+            # *** Exercise 4.1 Moisture ***
+            # *** Clipping of negative values (all tracers at once) ***
+            np.maximum(qnew,0.,out=qnew)
+
+            # *** Exercise 4.1 Moisture ***
+
+        if imoist == 1 and imicrophys > 0:
+            # The microphysics runs only on the columns and levels holding
+            # moisture (box = ..., columns ic, levels). Outside the box there is
+            # no latent heating and no precipitation.
+            box = active_region(qnew,micro_thresh)
+            tmp[:] = 0.
+            prec[:] = 0.
+            if box is not None:
+                ic = box[:-1]
+                thermo_box = thermo.sub(box)
+
+        if imoist == 1 and imicrophys == 1:
+
+            # *** Exercise 4.2 Kessler ***
+            # *** Kessler scheme ***
+            if idbg == 1:
+                print("Add function to Kessler microphysics")
+
+            # add call of kessler, which computes latent heat tmp,
+            # subfunction here: 
+            # (the updated tracers are copied back into the state buffers)
+            if box is not None:
+                [tmp[box],qvnew[box],qcnew[box],qrnew[box],tot_prec[ic],prec[ic]] = \
+                    kessler(config,thermo_box,qvnew[box],qcnew[box],
+                            qrnew[box],tot_prec[ic],prec[ic])
+
+            # *** Exercise 4.2 Kessler ***
+
+        elif imoist == 1 and imicrophys == 2:
+
+            # *** Exercise 5.1 Two Moment Scheme ***
+            # *** Two Moment Scheme ***
+            # *** Edit here ***
+
+            if idbg == 1:
+                print("Add function call to two moment microphysics")
+
+            # (the updated tracers are copied back into the state buffers)
+            if box is not None:
+                tmp[box],qvnew[box],qcnew[box],qrnew[box],tot_prec[ic],prec[ic], \
+                    ncnew[box],nrnew[box] = \
+                    seifert(config,thermo_box,qvnew[box],qcnew[box],
+                            qrnew[box],tot_prec[ic],prec[ic],ncnew[box],
+                            nrnew[box])
+
+
+              # *** Exercise 5.1 Two Moment Scheme ***
+
+        if imoist == 1 and  imicrophys > 0:
+            if idthdt == 1:
+                k=np.arange(1,nz)      # Stagger heating tmp to model levels and
+                                       # compute tendency. Get tendency by
+                                       # division through 2dt -> leapfrog
+                dthetadt[...,k] = topofact*0.5*(tmp[...,k-1]+tmp[...,k])/(2.*dt)
+
+                dthetadt[...,0]  = 0.   # force dthetadt to zero at bottom
+                dthetadt[...,-1] = 0.   # and at the top
+
+                # periodic lateral boundary conditions
+                # ----------------------------
+                if irelax==0:
+                   dthetadt = periodic(dthetadt,nx,nb)
+                else:
+                    # Relax latent heat fields
+                    # ----------------------------
+                    relax_s.apply(dthetadt,dthetadtbnd1,dthetadtbnd2)
+
+        if idbg == 1:
+            print('Preparing next time step ...\n')
+
+        # *** Exercise 2.1 / 4.1 / 5.1 ***
+        # *** exchange isentropic mass density and velocity ***
+        # *** (later also qv,qc,qr,nc,nr) ***
+        # rotate the time levels of all prognostic fields: old <- now <- new
+        # (the local names are views into the state buffers)
+        state.rotate()
+
+        sold, snow, snew = state.levels('s')
+        uold, unow, unew = state.levels('u')
+        if imoist == 1:
+            qold, qnow, qnew = state.levels('q')
+            qvold, qvnow, qvnew = state.levels('qv')
+            qcold, qcnow, qcnew = state.levels('qc')
+            qrold, qrnow, qrnew = state.levels('qr')
+            if imicrophys == 2:
+                ncold, ncnow, ncnew = state.levels('nc')
+                nrold, nrnow, nrnew = state.levels('nr')
+
+        # *** Exercise 2.1 / 4.1 / 5.1 ***
+
+
+        # check maximum cfl criterion
+        # (after the rotation, unow holds the velocity of this step)
+        #---------------------------------
+        if iprtcfl == 1:
+            u_max = np.amax(np.abs(unow))
+            cfl_max = u_max*dtdx
+            print('============================================================\n')
+            print('CFL MAX: %g U MAX: %g m/s \n' %(cfl_max,u_max))
+            if cfl_max > 1:
+                print('!!! WARNING: CFL larger than 1 !!!\n')
+            elif np.isnan(cfl_max):
+                print('!!! MODEL ABORT: NaN values !!!\n')
+            print('============================================================\n')
+
+        # output every 'iout'-th time step
+        #---------------------------------
+        if np.mod(its,iout) == 0:
+            output.append(its,state,zht=zhtnow,prec=prec,tot_prec=tot_prec,
+                          dthetadt=dthetadt)
+
+        # checkpoint every 'icheckpoint'-th time step
+        #---------------------------------
+        if icheckpoint > 0 and its % icheckpoint == 0:
+            arrays = {'state_' + name: phi
+                      for name, phi in state.checkpoint().items()}
+            arrays.update(checkpoint_arrays(),its=its)
+            arrays.update(output.checkpoint())
+            write_checkpoint(checkpoint_fname,arrays)
+            if idbg == 1:
+                print('Writing checkpoint %s.npz ...\n' %checkpoint_fname)
+
+        if idbg == 1:
+            print('\n\n')
+
+    #-----------------------------------------------------------------------------
+    # ########## END OF TIME LOOP ################################################
+    if idbg > 0:
+        print('\nEnd of time loop ...\n')
+
+    # wait for the output steps still queued for writing
+    output.flush()
+
+    tt = tm()
+    print('Elapsed computation time without writing: %g s\n' %(tt-t0))
+
+    fields = output.result()
+    return Result(config,elapsed=tt-t0,members=member_configs,**fields)
+
+# END OF MODEL.PY
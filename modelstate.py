@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+class ModelState:
+    """
+    Prognostic model state with three preallocated leapfrog time levels
+    (old, now, new) for every prognostic field. Advancing to the next
+    time step rotates the level indices instead of copying or
+    reallocating the fields.
+
+    Several fields can be kept in one stacked array, e.g. the tracers
+    q(ntracer,nxb,nz). The members of a stack are then accessible by
+    name as views into the stacked array.
+
+    The floating point type is given by dtype, either for all fields or
+    as a dictionary per field (e.g. float32 tracers).
+
+    Usage:  state = ModelState({'s': (nxb,nz), 'u': (nxb1,nz),
+                                'q': (2,nxb,nz)}, stacks={'q': ['qv','qc']})
+            sold, snow, snew = state.levels('s')
+            qvold, qvnow, qvnew = state.levels('qv')
+            state.rotate()
+    """
+
+    def __init__(self, shapes, stacks=None, dtype=np.float64):
+        # one (3, ...) buffer per field, time levels along the first axis
+        self.fields = {}
+        for name, shape in shapes.items():
+            ftype = dtype.get(name,np.float64) if isinstance(dtype,dict) \
+                else dtype
+            self.fields[name] = np.zeros((3,) + tuple(shape), dtype=ftype)
+
+        # members of stacked fields: name -> (stack, index)
+        self.members = {}
+        if stacks is not None:
+            for stack, names in stacks.items():
+                for n, name in enumerate(names):
+                    self.members[name] = (stack, n)
+
+        # buffer index of the old, now and new time level
+        self.iold, self.inow, self.inew = 0, 1, 2
+
+    def __contains__(self, name):
+        return name in self.fields or name in self.members
+
+    def _buffer(self, name):
+        if name in self.members:
+            stack, n = self.members[name]
+            return self.fields[stack][:, n]
+        return self.fields[name]
+
+    def old(self, name):
+        return self._buffer(name)[self.iold]
+
+    def now(self, name):
+        return self._buffer(name)[self.inow]
+
+    def new(self, name):
+        return self._buffer(name)[self.inew]
+
+    def levels(self, name):
+        """
+        Return the old, now and new time level of a field.
+        The returned arrays are views into the state buffers.
+        """
+        buf = self._buffer(name)
+        return buf[self.iold], buf[self.inow], buf[self.inew]
+
+    def rotate(self):
+        """
+        Exchange time levels: old <- now, now <- new. The buffer of the
+        previous old level is reused for the next new level.
+        """
+        self.iold, self.inow, self.inew = self.inow, self.inew, self.iold
+
+    def checkpoint(self):
+        """
+        Copies of the fields with the time levels in the order old, now,
+        new (independent of the current buffer indices).
+        """
+        order = [self.iold, self.inow, self.inew]
+        return {name: buf[order] for name, buf in self.fields.items()}
+
+    def restore(self, fields):
+        """
+        Set the fields from a checkpoint (in place, such that the views
+        returned by levels remain valid).
+        """
+        for name, buf in self.fields.items():
+            if fields[name].shape != buf.shape:
+                raise ValueError('ModelState: field %s of shape %s can not '
+                                 'be restored from shape %s'
+                                 % (name, buf.shape, fields[name].shape))
+            buf[[self.iold, self.inow, self.inew]] = fields[name]
+
+
+def precision_dtypes(precision,prs_double=1):
+    """
+    Floating point types of the dynamics (s, u, dthetadt), the tracers and
+    the pressure, Exner function and Montgomery potential for the namelist
+    option precision:
+
+    'double'    ... everything in float64
+    'single'    ... dynamics and tracers in float32
+    'tracers'   ... tracers in float32, dynamics in float64
+
+    With prs_double = 1 the pressure and Montgomery integration stays in
+    float64, otherwise it uses the type of the dynamics.
+
+    Input:  precision_dtypes(precision,prs_double)
+    Output: dtype_dyn, dtype_q, dtype_prs
+    """
+    if precision == 'double':
+        dtype_dyn, dtype_q = np.float64, np.float64
+    elif precision == 'single':
+        dtype_dyn, dtype_q = np.float32, np.float32
+    elif precision == 'tracers':
+        dtype_dyn, dtype_q = np.float64, np.float32
+    else:
+        raise ValueError("precision must be 'double', 'single' or "
+                         "'tracers', not %r" % (precision,))
+
+    dtype_prs = np.float64 if prs_double == 1 else dtype_dyn
+
+    return dtype_dyn, dtype_q, dtype_prs
+
+# END OF MODELSTATE.PY
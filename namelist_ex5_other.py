@@ -13,6 +13,18 @@ and all subfunctions.
 out_fname   = 'output'          # file name of output
 iout        = 360               # write every iout-th time-step into the output file
 iiniout     = 1                 # write initial field (0 = no, 1 = yes)
+icheckpoint = 0                 # write a checkpoint every icheckpoint-th time step
+                                # into out_fname + '_checkpoint.npz' (0 = off)
+irestart    = 0                 # restart from that checkpoint if it exists (0 = no, 1 = yes)
+istream     = 0                 # write the output steps as they are computed into the
+                                # directory out_fname + '.stream' (0 = .npz at the end)
+nout_queue  = 0                 # output steps queued for a background writer thread
+                                # (0 = output written in the time loop)
+out_compress = 'none'           # compression of the .npz output: 'none', 'zlib' or 'lzma'
+out_dtype   = 'float64'         # floating point type of the output: 'float64' or 'float32'
+out_quant   = {}                # output variables stored as integers with an absolute error
+                                # bound, e.g. {'horizontal_velocity': 0.01,
+                                #              'specific_humidity': 1e-7}
 
 # Domain size
 #-------------------------------------------------
@@ -51,6 +63,15 @@ nab     = 30                    # number of grid points in absorber
 diffabs = 1.                    # maximum value of absorber
 irelax  = 1                     # lateral boundaries (0 = periodic, 1 = relax)
 nb      = 2                     # number of boundary points on each side
+nrelax  = 8                     # number of grid points of the relaxation zones
+
+# Floating point precision
+#-------------------------------------------------
+precision   = 'double'          # prognostic fields ('double' = float64, 'single' =
+                                # float32 dynamics and tracers, 'tracers' = float32
+                                # tracers only)
+prs_double  = 1                 # pressure and Montgomery integration in float64
+                                # also for single precision (0 = off, 1 = on)
 
 # Print options
 #-------------------------------------------------
@@ -65,6 +86,11 @@ imoist_diff     = 0             # apply diffusion to qv, qc, qr (0 = off, 1 = on
 imicrophys      = 2             # include microphysics (0 = off, 1 = kessler, 2 = two moment)
 idthdt          = 1             # couple physics to dynamics (0 = off, 1 = on)
 iern            = 0             # evaporation of rain droplets (0 = off, 1 = on)
+ithermo_tab     = 1             # saturation vapor pressure (0 = exact formula, 1 = look-up table)
+micro_thresh    = 1e-12         # microphysics only where a tracer exceeds this value
+                                # (< 0: whole domain)
+irain_tab       = 1             # rain size distribution in two moment scheme
+                                # (0 = analytic formulas, 1 = look-up tables)
 imoist_pert     = 0             # initial moisture perturbation
 
 # Options for Kessler scheme
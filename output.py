@@ -1,151 +1,301 @@
 # -*- coding: utf-8 -*-
+import os
+import queue
+import threading
+from collections import namedtuple
 import numpy as np
+from stream import StreamWriter, read_stream
+from checkpoint import restore
+from encoding import quantize, dequantize, save_npz
 # from netCDF4 import Dataset #python-netcdf4 is not supportet by some
 # linux distors
-from namelist import idbg, nb, nx, nz, dt, dx, out_fname,    \
-    u00, bv00, th00, pref, xl, thl, dth,  \
-    topomx, topowd, imoist, imicrophys,\
-    idthdt
 
+# Output variable: key of its output buffer (see model.Result), name in the
+# output file, units, model field (a prognostic field of the model state or
+# a diagnostic field passed to Output.append), dimensions and destaggering
+# rule ('x': horizontally staggered, 'z': vertically staggered, None).
+OutputVariable = namedtuple('OutputVariable',
+                            'key name units field dims stagger')
+
+# registry of all output variables, in the order of the output file
+output_variables = (
+    OutputVariable('Z', 'height', 'm', 'zht', 'zx', 'z'),
+    OutputVariable('U', 'horizontal_velocity', 'm/s', 'u', 'zx', 'x'),
+    OutputVariable('S', 'isentropic_density', 'kg/(m^2 K)', 's', 'zx', None),
+    OutputVariable('QV', 'specific_humidity', 'kg/kg', 'qv', 'zx', None),
+    OutputVariable('QC', 'specific_cloud_liquid_water_content', 'kg/kg', 'qc',
+                   'zx', None),
+    OutputVariable('QR', 'specific_rain_water_content', 'kg/kg', 'qr', 'zx',
+                   None),
+    OutputVariable('TOT_PREC', 'accumulated_precipitation', 'mm', 'tot_prec',
+                   'x', None),
+    OutputVariable('PREC', 'precipitation_rate', 'mm/h', 'prec', 'x', None),
+    OutputVariable('NR', 'rain_number_density', '1/kg', 'nr', 'zx', None),
+    OutputVariable('NC', 'cloud_number_density', '1/kg', 'nc', 'zx', None),
+    OutputVariable('DTHETADT', 'latent_heat_tendency', 'K/s', 'dthetadt',
+                   'zx', 'z'),
+)
+
+
+def active_variables(config):
+    """
+    Output variables of the active options of config (imoist, imicrophys,
+    idthdt).
 
-def makeoutput(unow, snow, zht, its_out, its, Z, U, S, T, qvnow=None,
-               qcnow=None, qrnow=None, tot_prec=None, prec=None,
-               nrnow=None, ncnow=None, QV=None, QC=None, QR=None,
-               TOT_PREC=None, PREC=None, NR=None, NC=None,
-               dthetadt=None, DTHETADT=None):
+    Input:  active_variables(config)
+    Output: [OutputVariable, ...]
     """
-    Write current fields into output fields. Boundaries not written to disk.
+    keys = ['Z', 'U', 'S']
+    if config.imoist == 1:
+        keys += ['QV', 'QC', 'QR', 'TOT_PREC', 'PREC']
+        if config.imicrophys == 2:
+            keys += ['NR', 'NC']
+        if config.idthdt == 1:
+            keys += ['DTHETADT']
+    return [var for var in output_variables if var.key in keys]
+
 
-    Input:  makeoutput(Unow, unow, snow, zht, its_out, its, Z, U, S, T, UU)
-    Output: its_out, Z, U, S, T
+def output_params(config):
+    """
+    Parameters of the run of config written with the output.
     """
+    return dict(u00=config.u00, thl=config.thl, th00=config.th00,
+                topomx=config.topomx, topowd=config.topowd, nx=config.nx,
+                nz=config.nz, dx=config.dx)
 
-    if idbg == 1:
-        print('Prepare output...\n')
-
-    i = nb + np.arange(nx)
-    k = np.arange(nz)
-    its_out = its_out + 1
-
-    # Horizontal destagger
-    uout = 0.5 * (unow[i, :] + unow[i + 1, :])
-    # Vertical destagger
-    if idthdt == 1:
-        dthetadtout = 0.5 * (dthetadt[:, k] + dthetadt[:, k + 1])
-
-    print('Writing output...\n')
-
-    T[its_out] = its * dt
-    Z[its_out, :, :] = np.swapaxes(zht[i, :], 0, 1)
-    U[its_out, :, :] = np.swapaxes(uout, 0, 1)
-    S[its_out, :, :] = np.swapaxes(snow[i, :], 0, 1)
-
-    #if imoist == 1 and imicrophys != 0:
-    if imoist == 1:
-        QV[its_out, :, :] = np.swapaxes(qvnow[i, :], 0, 1)
-        QC[its_out, :, :] = np.swapaxes(qcnow[i, :], 0, 1)
-        QR[its_out, :, :] = np.swapaxes(qrnow[i, :], 0, 1)
-        if imicrophys != 0:
-            TOT_PREC[its_out, :] = tot_prec[i]
-            PREC[its_out, :] = prec[i]
-            if idthdt == 1:
-                DTHETADT[its_out, :, :] = np.swapaxes(dthetadtout[i, :], 0, 1)
-        if imicrophys == 2:
-            NR[its_out, :, :] = np.swapaxes(nrnow[i, :], 0, 1)
-            NC[its_out, :, :] = np.swapaxes(ncnow[i, :], 0, 1)
-
-    if imoist == 0:
-        return its_out, Z, U, S, T
-    elif imoist == 1:
-        if imicrophys == 0 or imicrophys == 1:
-            if idthdt == 1:
-                return its_out, Z, U, S, T, QC, QV, QR, TOT_PREC, PREC, DTHETADT
-            else:
-                return its_out, Z, U, S, T, QC, QV, QR, TOT_PREC, PREC
 
-        if imicrophys == 2:
-            if idthdt == 1:
-                return its_out, Z, U, S, T, QC, QV, QR, TOT_PREC, PREC, NR, NC, DTHETADT
+def destagger(config, phi, var):
+    """
+    Interior points of the model field phi of the output variable var on
+    the unstaggered grid of config, as (..., z, x) or (..., x).
+
+    Input:  destagger(config, phi, var)
+    Output: phi_out
+    """
+    nz = config.nz
+    i = config.nb + np.arange(config.nx)
+
+    if var.dims == 'x':
+        return phi[..., i]
+
+    if var.stagger == 'x':
+        # Horizontal destagger
+        phi = 0.5 * (phi[..., i, :] + phi[..., i + 1, :])
+    elif var.stagger == 'z':
+        # Vertical destagger
+        phi = phi[..., i, :]
+        phi = 0.5 * (phi[..., 0:nz] + phi[..., 1:nz + 1])
+    else:
+        phi = phi[..., i, :]
+    return np.swapaxes(phi, -2, -1)
+
+
+class Output:
+    """
+    Output of the active variables of the run of config: buffers (nout, ...)
+    in memory, or with stream=True written step by step to
+    config.out_fname + '.stream' (see stream.py). The fields can have a
+    leading ensemble axis ens (nens,nxb,nz); the output fields are then
+    (nout,nens,nz,nx). Boundaries are not written.
+
+    With nqueue > 0 the output steps are written by a background thread,
+    while the time loop continues. append copies the output step into a
+    queue of nqueue steps and waits only if the queue is full. The thread
+    converts the steps to out_dtype and, for streamed output, writes them
+    to disk and updates the value ranges. The quantization and compression
+    of the .npz file (write_output) need all output steps and run after
+    the model.
+
+    Usage:  output = Output(config, nout, ens)
+            output.append(its, state, zht=zhtnow, ...)
+            fields = output.result()        # T, Z, U, ...
+    """
+
+    def __init__(self, config, nout, ens=(), stream=False, restart=False,
+                 nqueue=0):
+        self.config = config
+        self.variables = active_variables(config)
+        nx, nz = config.nx, config.nz
+        self.its_out = -1
+        self.stream = None
+        self.queue = None
+
+        if stream:
+            params = dict(output_params(config),
+                          x=list(config.dx * np.arange(0, nx) / 1000.))
+            self.stream = StreamWriter(config.out_fname + '.stream', params,
+                                       nout, restart)
+            self.T = self.stream.field('time', (), int, 's')
+        else:
+            self.T = np.arange(1, nout + 1)
+
+        self.fields = {}
+        for var in self.variables:
+            shape = ens + ((nz, nx) if var.dims == 'zx' else (nx,))
+            if self.stream is not None:
+                self.fields[var.key] = self.stream.field(var.name, shape,
+                                                         config.out_dtype,
+                                                         var.units)
             else:
-                return its_out, Z, U, S, T, QC, QV, QR, TOT_PREC, PREC, NR, NC
+                self.fields[var.key] = np.zeros((nout,) + shape,
+                                                config.out_dtype)
+
+        if nqueue > 0:
+            self.queue = queue.Queue(maxsize=nqueue)
+            self.error = None
+            self.thread = threading.Thread(target=self._writer, daemon=True)
+            self.thread.start()
+
+    def append(self, its, state, **fields):
+        """
+        Write the current fields into the next output step. The fields of
+        the output variables are taken from the model state (time level
+        now) or from fields.
+
+        Input:  append(its, state, zht=zhtnow, prec=prec, ...)
+        Output: none
+        """
+        if self.config.idbg == 1:
+            print('Prepare output...\n')
+
+        self.its_out += 1
+
+        print('Writing output...\n')
+
+        # (destagger copies the fields, the model continues with its own)
+        step = {}
+        for var in self.variables:
+            if var.field in state:
+                phi = state.now(var.field)
+            else:
+                phi = fields[var.field]
+            step[var.key] = destagger(self.config, phi, var)
+
+        time = its * self.config.dt
+        if self.queue is None:
+            self._write(self.its_out, time, step)
+        else:
+            self._check()
+            self.queue.put((self.its_out, time, step))
+
+    def _write(self, n, time, step):
+        # write the output step n
+        self.T[n] = time
+        for key, phi in step.items():
+            self.fields[key][n] = phi
+
+        if self.stream is not None:
+            self.stream.commit(n + 1)
+
+    def _writer(self):
+        # background thread writing the queued output steps
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                if self.error is None:
+                    self._write(*item)
+            except BaseException as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def _check(self):
+        # raise the error of the writer thread in the model
+        if self.queue is not None and self.error is not None:
+            raise RuntimeError('Output: writing the output failed') \
+                from self.error
+
+    def flush(self):
+        """
+        Wait until all queued output steps are written.
+        """
+        if self.queue is not None:
+            self.queue.join()
+            self._check()
+
+    def checkpoint(self):
+        """
+        Output index and the output buffers (streamed output is already on
+        disk).
+        """
+        self.flush()
+        arrays = {'its_out': self.its_out}
+        if self.stream is None:
+            arrays.update(self.fields, T=self.T)
+        return arrays
+
+    def restore(self, saved):
+        """
+        Continue the output of a checkpoint (output steps after it are
+        written again).
+        """
+        if self.stream is None:
+            restore(dict(self.fields, T=self.T), saved)
+        self.its_out = int(saved['its_out'])
+        if self.stream is not None:
+            self.stream.rewind(self.its_out + 1)
+
+    def result(self):
+        """
+        Output times T and the output fields by key (memory mapped when
+        streamed), after all output steps are written.
+        """
+        self.flush()
+        if self.queue is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.queue = None
+
+        fields = dict(T=self.T, **self.fields)
+        if self.stream is not None:
+            self.stream.close()
+            fields = {key: phi.read() for key, phi in fields.items()}
+        return fields
 
 # -----------------------------------------------------------------------------
 
 
-def write_output(nout, Z, U, S, T, QV=None, QC=None, QR=None, PREC=None,
-                 TOT_PREC=None, NR=None, NC=None, DTHETADT=None):
+def write_output(config, T, **fields):
     """
-    Record output in .npz file.
+    Record output of the run of config in .npz file, written once with the
+    output variables in fields (by key, see output_variables). The
+    variables in out_quant are stored quantized (name, name_scale,
+    name_offset; see encoding.py), the others as out_dtype, and the file is
+    compressed with out_compress.
 
-    Input:  write_output(nout)
+    Input:  write_output(config, T, Z=Z, U=U, S=S, ...)
     Output: none
     """
-    if idbg == 1 or idbg == 0:
+    out_fname, out_quant = config.out_fname, config.out_quant
+    nout = len(T)
+    if config.idbg == 1 or config.idbg == 0:
         print('Writing to file %s.npz \n' % out_fname)
         print('Output contains %u output steps\n' % nout)
 
-    # destagger height
-    Z = 0.5 * (Z[:, 0:nz, :] + Z[:, 1:nz + 1, :])
-    x_out = dx * np.arange(0, nx) / 1000.
-    z_out = Z[0, :, 0] / 1000.
-
-    u_out = u00
-    bv_out = bv00
-    th_out = th00
-    p_ref = pref
+    x_out = config.dx * np.arange(0, config.nx) / 1000.
+    z_out = fields['Z'][0, :, 0] / 1000.
 
-    np.savez(out_fname, u00=u00, thl=thl, th00=th00, topomx=topomx,
-             topowd=topowd, nx=nx, nz=nz, dx=dx, time=T, x=x_out, z=z_out)
+    unknown = set(out_quant) - set(var.name for var in output_variables)
+    if unknown:
+        raise ValueError('write_output: no output variables '
+                         + ', '.join(sorted(unknown)))
 
     # write data to binary
-    if imoist == 0:
-        np.savez(out_fname, u00=u00, thl=thl, th00=th00, topomx=topomx,
-                 topowd=topowd, nx=nx, nz=nz, dx=dx, time=T, x=x_out,
-                 z=z_out, height=Z, horizontal_velocity=U,
-                 isentropic_density=S)
-    else:
-        if imoist == 1:
-            np.savez(out_fname, u00=u00, thl=thl, th00=th00,
-                     topomx=topomx, topowd=topowd, nx=nx, nz=nz, dx=dx,
-                     time=T, x=x_out, z=z_out, height=Z, horizontal_velocity=U,
-                     isentropic_density=S, specific_humidity=QV,
-                     specific_cloud_liquid_water_content=QC,
-                     specific_rain_water_content=QR,
-                     accumulated_precipitation=TOT_PREC,
-                     precipitation_rate=PREC)
-            if idthdt == 1:
-                np.savez(out_fname, u00=u00, thl=thl, th00=th00, topomx=topomx,
-                         topowd=topowd, nx=nx, nz=nz, dx=dx, time=T, x=x_out,
-                         z=z_out, height=Z, horizontal_velocity=U,
-                         isentropic_density=S, specific_humidity=QV,
-                         specific_cloud_liquid_water_content=QC,
-                         specific_rain_water_content=QR,
-                         accumulated_precipitation=TOT_PREC,
-                         precipitation_rate=PREC,
-                         latent_heat_tendency=DTHETADT)
-            if imicrophys == 2:
-                np.savez(out_fname, u00=u00, thl=thl, th00=th00, topomx=topomx,
-                         topowd=topowd, nx=nx, nz=nz, dx=dx, time=T, x=x_out,
-                         z=z_out, height=Z, horizontal_velocity=U,
-                         isentropic_density=S, specific_humidity=QV,
-                         specific_cloud_liquid_water_content=QC,
-                         specific_rain_water_content=QR,
-                         accumulated_precipitation=TOT_PREC,
-                         precipitation_rate=PREC,
-                         rain_number_density=NR,
-                         cloud_number_density=NC)
-                if idthdt == 1:
-                    np.savez(out_fname, u00=u00, thl=thl, th00=th00,
-                             topomx=topomx, topowd=topowd, nx=nx, nz=nz, dx=dx,
-                             time=T, x=x_out, z=z_out, height=Z,
-                             horizontal_velocity=U, isentropic_density=S,
-                             specific_humidity=QV,
-                             specific_cloud_liquid_water_content=QC,
-                             specific_rain_water_content=QR,
-                             accumulated_precipitation=TOT_PREC,
-                             precipitation_rate=PREC,
-                             rain_number_density=NR, cloud_number_density=NC,
-                             latent_heat_tendency=DTHETADT)
+    arrays = dict(output_params(config), time=T, x=x_out, z=z_out)
+    for var in output_variables:
+        phi = fields.get(var.key)
+        if phi is None:
+            continue
+        if var.name in out_quant:
+            q, scale, offset = quantize(phi, out_quant[var.name])
+            arrays[var.name] = q
+            arrays[var.name + '_scale'] = scale
+            arrays[var.name + '_offset'] = offset
+        else:
+            arrays[var.name] = np.asarray(phi, config.out_dtype)
+    save_npz(out_fname, arrays, config.out_compress)
 
 # -----------------------------------------------------------------------------
 
@@ -266,4 +416,63 @@ def write_output(nout, Z, U, S, T, QV=None, QC=None, QR=None, PREC=None,
     # dtheta[:,:,:]=DTHETADT[:,:,:]
     # ncfile.close()
 
+# -----------------------------------------------------------------------------
+
+
+class OutputFile:
+    """
+    .npz output file, with the quantized variables decoded when read.
+    """
+
+    def __init__(self, fname):
+        self.data = np.load(fname)
+        self.files = [name for name in self.data.files
+                      if not name.endswith(('_scale', '_offset'))]
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def __getitem__(self, name):
+        phi = self.data[name]
+        if name + '_scale' in self.data.files:
+            phi = dequantize(phi, self.data[name + '_scale'],
+                             self.data[name + '_offset'])
+        return phi
+
+    def range(self, name):
+        """
+        Minimum and maximum of the variable name (NaN ignored).
+        """
+        phi = self[name]
+        return float(np.nanmin(phi)), float(np.nanmax(phi))
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_output(fname):
+    """
+    Output of a run, either the .npz file fname written by write_output or
+    the directory fname written step by step (istream = 1, see stream.py).
+    The streamed fields are memory mapped and named as in the .npz file.
+    data.range(name) is the value range of a variable (of a stream taken
+    from its header, without reading the variable).
+
+    Input:  read_output(fname)
+    Output: data (OutputFile or StreamData)
+    """
+    if not os.path.isdir(fname):
+        return OutputFile(fname)
+
+    data = read_stream(fname)
+    if len(data['height']) > 0:
+        data['z'] = data['height'][0, ..., :, 0] / 1000.
+    return data
+
 # END OF OUTPUT.PY
@@ -1,131 +1,172 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-from namelist import idbg, idthdt, nx, nxb, nb, nz, dth, dt # global variables
+from stencil import stencil, work
 
-k = np.arange(1,nz-1)
 
-def prog_isendens(sold,snow,unow,dtdx,dthetadt=None):
+def clear_halo(config,phi,n):
+    """
+    Reset the 'nb' boundary points on each side of a reused output
+    buffer, such that the boundary routines see the same values as for
+    a freshly allocated field.
+
+    Input:      clear_halo(config,phi,n)
+    Output:     phi
+    """
+    left, right = stencil(config).halo(n)
+    phi[...,left,:] = 0.
+    phi[...,right,:] = 0.
+
+    return phi
+
+
+def vertical_advection(config,phinew,phinow,i,dthsum,den):
+    """
+    Add the vertical advection by the latent heating to the interior
+    points i, k = 1...nz-2 of phinew:
+    phinew -= dt/dth*(phinow[k+1]-phinow[k-1])*dthsum/den
+    where dthsum is the sum of the den surrounding dthetadt values.
+
+    Input:      vertical_advection(config,phinew,phinow,i,dthsum,den)
+    Output:     phinew
+    """
+    st = stencil(config)
+    k0, km1, kp1 = st.k0, st.km1, st.kp1
+
+    tmp = work(phinew[...,i,k0].shape,phinew.dtype,2)
+    np.subtract(phinow[...,i,kp1],phinow[...,i,km1],out=tmp)
+    np.multiply(tmp,config.dt/config.dth,out=tmp)
+    np.multiply(tmp,dthsum,out=tmp)
+    np.divide(tmp,den,out=tmp)
+    np.subtract(phinew[...,i,k0],tmp,out=phinew[...,i,k0])
+
+    return phinew
+
+
+def prog_isendens(config,sold,snow,unow,dtdx,dthetadt=None,snew=None):
     """
     Prognostic step for isentropic mass density
 
-    Input:      prog_isendens(sold,snow,unow,dtdx,dthetadt)
+    Input:      prog_isendens(config,sold,snow,unow,dtdx,dthetadt,snew)
     Output:     snew
     """
-    if idbg == 1:
+    st = stencil(config)
+    i0, im1, ip1, ip2, k0, kp1 = st.i0, st.im1, st.ip1, st.ip2, st.k0, st.kp1
+
+    if config.idbg == 1:
         print('Prognostic step: Isentropic mass density ...\n')
 
-    # Declare
-    snew = np.zeros((nxb,nz))
+    # Declare (or reuse the caller-supplied buffer)
+    if snew is None:
+        snew = np.zeros((config.nxb,config.nz))
+    else:
+        clear_halo(config,snew,config.nx)
 
     # *** Exercise 2.1/5.2 isentropic mass density ***
     # *** time step for isentropic mass density ***
     # *** edit here ***
-    i = nb+np.arange(0,nx)
-    snew[i,:] = sold[i,:] - dtdx/2 * ((unow[i+1,:]+unow[i+2,:]) * snow[i+1,:] - (unow[i-1,:]+unow[i,:]) * snow[i-1,:])
-    
-    if idthdt:
-        ii,kk = np.ix_(i,k)
-        snew[ii,kk] = snew[ii,kk]- dt/dth * (snow[ii,kk+1]-snow[ii,kk-1]) * (dthetadt[ii,kk]+dthetadt[ii,kk+1]) / 2
+    # snew[i] = sold[i] - dtdx/2 * ((unow[i+1]+unow[i+2]) * snow[i+1]
+    #                               - (unow[i-1]+unow[i]) * snow[i-1])
+    flx = work(snew[...,i0,:].shape,snew.dtype,0)
+    tmp = work(snew[...,i0,:].shape,snew.dtype,1)
+    np.add(unow[...,ip1,:],unow[...,ip2,:],out=flx)
+    np.multiply(flx,snow[...,ip1,:],out=flx)
+    np.add(unow[...,im1,:],unow[...,i0,:],out=tmp)
+    np.multiply(tmp,snow[...,im1,:],out=tmp)
+    np.subtract(flx,tmp,out=flx)
+    np.multiply(flx,dtdx/2,out=flx)
+    np.subtract(sold[...,i0,:],flx,out=snew[...,i0,:])
+
+    if config.idthdt:
+        dthsum = dthetadt[...,i0,k0] + dthetadt[...,i0,kp1]
+        vertical_advection(config,snew,snow,i0,dthsum,2)
     # *** Exercise 2.1/5.2 isentropic mass density ***
 
     return snew
 
-def prog_velocity(uold,unow,mtg,dtdx,dthetadt=None):
+def prog_velocity(config,uold,unow,mtg,dtdx,dthetadt=None,unew=None):
     """
     Prognostic step for momentum
 
-    Input:      prog_velocity(uold,unow,mtg,dtdx,dthetadt)
+    Input:      prog_velocity(config,uold,unow,mtg,dtdx,dthetadt,unew)
     Output:     unew
     """
-    if idbg == 1:
+    st = stencil(config)
+    iu0, ium1, iup1, k0, kp1 = st.iu0, st.ium1, st.iup1, st.k0, st.kp1
+
+    if config.idbg == 1:
         print('Prognostic step: Velocity ...\n')
 
-    # Declare
-    unew = np.zeros((nx+1+2*nb,nz))
-    
+    # Declare (or reuse the caller-supplied buffer)
+    if unew is None:
+        unew = np.zeros((config.nxb1,config.nz))
+    else:
+        clear_halo(config,unew,config.nx1)
+
     # *** Exercise 2.1/5.2 velocity ***
     # *** time step for momentum ***
     # *** edit here ***
-    i = nb+np.arange(0,nx+1)
-    unew[i,:] = uold[i,:] - unow[i,:]* dtdx * (unow[i+1,:]-unow[i-1,:]) - 2*dtdx*(mtg[i,:]-mtg[i-1,:])
-    
-    if idthdt:
-        ii,kk = np.ix_(i,k)
-        unew[ii,kk] = unew[ii,kk]- dt/dth * (unow[ii,kk+1]-unow[ii,kk-1]) * (dthetadt[ii,kk+1]+dthetadt[ii-1,kk+1] + dthetadt[ii,kk]+dthetadt[ii-1,kk]) / 4 
-    
+    # unew[i] = uold[i] - unow[i]*dtdx*(unow[i+1]-unow[i-1])
+    #           - 2*dtdx*(mtg[i]-mtg[i-1])
+    adv = work(unew[...,iu0,:].shape,unew.dtype,0)
+    tmp = work(unew[...,iu0,:].shape,unew.dtype,1)
+    np.multiply(unow[...,iu0,:],dtdx,out=adv)
+    np.subtract(unow[...,iup1,:],unow[...,ium1,:],out=tmp)
+    np.multiply(adv,tmp,out=adv)
+    np.subtract(uold[...,iu0,:],adv,out=unew[...,iu0,:])
+    np.subtract(mtg[...,iu0,:],mtg[...,ium1,:],out=tmp)
+    np.multiply(tmp,2*dtdx,out=tmp)
+    np.subtract(unew[...,iu0,:],tmp,out=unew[...,iu0,:])
+
+    if config.idthdt:
+        dthsum = dthetadt[...,iu0,kp1] + dthetadt[...,ium1,kp1] + \
+                 dthetadt[...,iu0,k0] + dthetadt[...,ium1,k0]
+        vertical_advection(config,unew,unow,iu0,dthsum,4)
+
     # *** Exercise 2.1/5.2 velocity ***
     return unew
 
-def prog_moisture(unow,qvold,qcold,qrold,
-                  qvnow,qcnow,qrnow,qvnew,qcnew,qrnew,dtdx,dthetadt=None):
+def prog_tracers(config,unow,qold,qnow,dtdx,dthetadt=None,qnew=None):
     """
-    Prognostic step for hydrometeors
+    Prognostic step for the tracer stack (hydrometeors and number
+    densities). All tracers q[n,:,:] are advected in one operation.
 
-    Input:      prog_moisture(unow,qvold,qcold,qrold, \
-                              qvnow,qcnow,qrnow,qvnew,qcnew,qrnew,dtdx, \
-                              dthetadt)
-    Output:     qvnew,qcnew,qrnew
+    Input:      prog_tracers(config,unow,qold,qnow,dtdx,dthetadt,qnew)
+    Output:     qnew
     """
+    st = stencil(config)
+    i0, im1, ip1, k0, kp1 = st.i0, st.im1, st.ip1, st.k0, st.kp1
 
-    if idbg == 1:
-        print('Prognostic step: Moisture scalars ...\n')
+    if config.idbg == 1:
+        print('Prognostic step: Tracers ...\n')
 
-    # Declare
-    qvnew = np.zeros((nx+2*nb,nz))
-    qcnew = np.zeros((nx+2*nb,nz))
-    qrnew = np.zeros((nx+2*nb,nz))
+    # Declare (or reuse the caller-supplied buffer)
+    if qnew is None:
+        qnew = np.zeros(qnow.shape)
+    else:
+        clear_halo(config,qnew,config.nx)
+
+    # *** Exercise 4.1/5.1/5.2 moisture and number density advection ***
 
-    # *** Exercise 4.1/5.2 moisture advection ***
-    
-    i = nb+np.arange(0,nx)
-    
     # Advection
-    qvnew[i,:] = qvold[i,:] - dtdx/2 * ((qvnow[i+1,:] - qvnow[i-1,:]) * (unow[i,:] + unow[i+1,:]))
-    qcnew[i,:] = qcold[i,:] - dtdx/2 * ((qcnow[i+1,:] - qcnow[i-1,:]) * (unow[i,:] + unow[i+1,:]))
-    qrnew[i,:] = qrold[i,:] - dtdx/2 * ((qrnow[i+1,:] - qrnow[i-1,:]) * (unow[i,:] + unow[i+1,:]))
-    
+    # qnew[i] = qold[i] - dtdx/2 * ((qnow[i+1] - qnow[i-1])
+    #                               * (unow[i] + unow[i+1]))
+    ucen = work(unow[...,i0,:].shape,unow.dtype,3)
+    adv = work(qnew[...,i0,:].shape,qnew.dtype,0)
+    np.add(unow[...,i0,:],unow[...,ip1,:],out=ucen)
+    np.subtract(qnow[...,ip1,:],qnow[...,im1,:],out=adv)
+    np.multiply(adv,ucen,out=adv)
+    np.multiply(adv,dtdx/2,out=adv)
+    np.subtract(qold[...,i0,:],adv,out=qnew[...,i0,:])
+
     # Conservation form
-    # qvnew[i,:] = qvold[i,:] - dtdx/2 * ((unow[i+1,:]+unow[i+2,:]) * qvnow[i+1,:] - (unow[i-1,:]+unow[i,:]) * qvnow[i-1,:])
-    # qcnew[i,:] = qcold[i,:] - dtdx/2 * ((unow[i+1,:]+unow[i+2,:]) * qcnow[i+1,:] - (unow[i-1,:]+unow[i,:]) * qcnow[i-1,:])
-    # qrnew[i,:] = qrold[i,:] - dtdx/2 * ((unow[i+1,:]+unow[i+2,:]) * qrnow[i+1,:] - (unow[i-1,:]+unow[i,:]) * qrnow[i-1,:])
-    
-    if idthdt:
-        ii,kk = np.ix_(i,k)
-        qvnew[ii,kk] = qvnew[ii,kk]- dt/dth * (qvnow[ii,kk+1]-qvnow[ii,kk-1]) * (dthetadt[ii,kk]+dthetadt[ii,kk+1]) / 2
-        qcnew[ii,kk] = qcnew[ii,kk]- dt/dth * (qcnow[ii,kk+1]-qcnow[ii,kk-1]) * (dthetadt[ii,kk]+dthetadt[ii,kk+1]) / 2
-        qrnew[ii,kk] = qrnew[ii,kk]- dt/dth * (qrnow[ii,kk+1]-qrnow[ii,kk-1]) * (dthetadt[ii,kk]+dthetadt[ii,kk+1]) / 2
-    # *** Exercise 4.1/5.2  ***
-    
-    return qvnew,qcnew,qrnew
-
-
-def prog_numdens(unow,ncold,nrold,ncnow,nrnow,ncnew,nrnew,dtdx,dthetadt=None):
-    """
-    Prognostic step for number densities
+    # qnew[i] = qold[i] - dtdx/2 * ((unow[i+1]+unow[i+2]) * qnow[i+1]
+    #                               - (unow[i-1]+unow[i]) * qnow[i-1])
 
-    Input:      prog_numdens(unow,ncold,nrold,ncnow,nrnow,ncnew,nrnew,
-                             dthetadt=0)
-    Output:     ncnew,nrnew
-    """
+    if config.idthdt:
+        dthsum = dthetadt[...,i0,k0] + dthetadt[...,i0,kp1]
+        vertical_advection(config,qnew,qnow,i0,dthsum,2)
+    # *** Exercise 4.1/5.1/5.2  ***
+
+    return qnew
 
-    if idbg == 1:
-       print('Prognostic step: Number densities ...')
-
-    # Declare
-    ncnew = np.zeros((nx+2*nb,nz))
-    nrnew = np.zeros((nx+2*nb,nz))
-
-    # *** Exercise 5.1/5.2 number densities ***
-    i = nb+np.arange(0,nx)
-    
-    ncnew[i,:] = ncold[i,:] - dtdx/2 * ((ncnow[i+1,:] - ncnow[i-1,:]) * (unow[i,:] + unow[i+1,:]))
-    nrnew[i,:] = nrold[i,:] - dtdx/2 * ((nrnow[i+1,:] - nrnow[i-1,:]) * (unow[i,:] + unow[i+1,:]))
-    
-    if idthdt:
-        ii,kk = np.ix_(i,k)
-        ncnew[ii,kk] = ncnew[ii,kk]- dt/dth * (ncnow[ii,kk+1]-ncnow[ii,kk-1]) * (dthetadt[ii,kk]+dthetadt[ii,kk+1]) / 2
-        nrnew[ii,kk] = nrnew[ii,kk]- dt/dth * (nrnow[ii,kk+1]-nrnow[ii,kk-1]) * (dthetadt[ii,kk]+dthetadt[ii,kk+1]) / 2
-        
-    # *** Exercise 5.1/5.2  *
-
-    return ncnew,nrnew
+# END OF PROGNOSTICS.PY
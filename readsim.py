@@ -7,6 +7,7 @@
 import numpy as np
 import sys
 from namelist import mtn_topo, h_ratio, w_ratio, leeHill_rel
+from output import read_output
 
 
 class dotdict(dict):
@@ -18,10 +19,29 @@ class dotdict(dict):
     __setattr__ = dict.__setitem__
     __delattr__ = dict.__delitem__
 
+
+class scaled:
+
+    """array phi / divisor, computed only for the slices read"""
+
+    def __init__(self, phi, divisor):
+        self.phi = phi
+        self.divisor = divisor
+        self.shape = phi.shape
+
+    def __len__(self):
+        return len(self.phi)
+
+    def __getitem__(self, index):
+        return np.asarray(self.phi[index]) / self.divisor
+
 # -----------------------------------------------------------------------------
 
 
 def readsim(filename, varnames):
+    # The variables of streamed output (a directory, see stream.py) are
+    # memory mapped and read only where they are sliced; var.ranges holds
+    # the value range of the variables, taken from the stream header.
 
     if isinstance(varnames, str):
         varnames = [varnames]
@@ -36,16 +56,19 @@ def readsim(filename, varnames):
 
     # allows to access var.xp
     var = dotdict()
-    # with automatically closes the file
-    with np.load(filename) as data:
-        for variable in variables:
-            var[variable] = data[variable]
+    # .npz file or streamed output directory
+    data = read_output(filename)
+    for variable in variables:
+        var[variable] = data[variable]
+
+    for varname in varnames:
+        try:
+            var[varname] = data[varname]
+        except:
+            sys.exit("Variable not in NetCDF File or wrong timestep passed")
 
-        for varname in varnames:
-            try:
-                var[varname] = data[varname]
-            except:
-                sys.exit("Variable not in NetCDF File or wrong timestep passed")
+    var.ranges = {varname: data.range(varname) for varname in varnames}
+    data.close()
 
     if 'specific_rain_water_content' in varnames:
         varnames.remove('accumulated_precipitation')
@@ -54,7 +77,7 @@ def readsim(filename, varnames):
     var.dx = var.dx / 1000.
     var.topomx = var.topomx / 1000.
     var.topowd = var.topowd / 1000.
-    var.zp = var.height / 1000.
+    var.zp = scaled(var.height, 1000.)
 
     var.xp = np.zeros(shape=var.zp.shape[-2:])
     var.xp[:, :] = var.x[np.newaxis, :]                           # Add an Axis
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed index slices and scratch buffers for the finite difference
+stencils. Fields are indexed as phi[...,i,k] (x is the second last and
+z the last axis), so the same slices serve single fields and stacks of
+fields. Basic slices return views, i.e. stencil reads do not copy.
+"""
+
+import functools
+import numpy as np
+
+
+class Stencil:
+    """
+    Index slices of a grid with nb boundary points on each side, nx
+    interior points in x and nz levels.
+
+    i0, im1, ip1, ip2   ... interior points i of unstaggered fields and
+                            neighbours i-1, i+1, i+2
+    iu0, ium1, iup1     ... interior points i of staggered fields (u) and
+                            neighbours i-1, i+1
+    k0, km1, kp1        ... interior levels k = 1...nz-2 and neighbours
+                            k-1, k+1
+
+    Usage:  st = stencil(config)
+            phi[...,st.ip1,st.k0]
+    """
+
+    def __init__(self,nb,nx,nz):
+        self.nb = nb
+
+        self.i0  = self.xshift(nx)
+        self.im1 = self.xshift(nx,-1)
+        self.ip1 = self.xshift(nx,1)
+        self.ip2 = self.xshift(nx,2)
+
+        self.iu0  = self.xshift(nx+1)
+        self.ium1 = self.xshift(nx+1,-1)
+        self.iup1 = self.xshift(nx+1,1)
+
+        self.k0  = slice(1,nz-1)
+        self.km1 = slice(0,nz-2)
+        self.kp1 = slice(2,nz)
+
+    def xshift(self,n,shift=0):
+        """
+        Slice of the n interior points in x, shifted by 'shift' points.
+
+        Input:      xshift(n,shift)
+        Output:     slice
+        """
+        return slice(self.nb+shift, self.nb+n+shift)
+
+    def halo(self,n):
+        """
+        Left and right boundary slices of a field with n interior points.
+
+        Input:      halo(n)
+        Output:     left, right
+        """
+        return slice(0,self.nb), slice(self.nb+n, n+2*self.nb)
+
+
+@functools.lru_cache(maxsize=None)
+def _stencil(nb,nx,nz):
+    return Stencil(nb,nx,nz)
+
+
+def stencil(config):
+    """
+    Stencil of the grid of config, shared by all configurations with the
+    same grid.
+
+    Input:      stencil(config)
+    Output:     st
+    """
+    return _stencil(config.nb,config.nx,config.nz)
+
+
+# scratch buffers, cached by shape and dtype
+_work = {}
+
+def work(shape,dtype=np.float64,n=0):
+    """
+    Return the n-th cached scratch array of the given shape and dtype.
+    Its content is undefined; it is meant for out= arguments of ufuncs.
+
+    Input:      work(shape,dtype,n)
+    Output:     array
+    """
+    key = (tuple(shape), np.dtype(dtype), n)
+    if key not in _work:
+        _work[key] = np.empty(shape,dtype=dtype)
+    return _work[key]
+
+# END OF STENCIL.PY
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Output written step by step while the model runs, instead of being kept in
+memory until the end of the run.
+
+A stream is a directory with one .npy file per variable (name.npy), holding
+the output steps as consecutive records of a fixed shape, and the metadata
+sidecar header.json with the parameters of the run, the dtype, record
+shape, units and value range of every variable and the number of complete
+output steps. The .npy files are created for all output steps and filled
+as the run proceeds; the header is rewritten (atomically) after every
+output step, so the steps finished before a crash remain readable.
+
+The variables are read as memory maps: opening a stream reads only the
+header, and slicing a variable reads only the pages of the slice.
+
+Usage:  stream = StreamWriter('outputs/run.stream', params, nout)
+        U = stream.field('horizontal_velocity', (nz,nx))
+        U[n] = u                # writes the output step n
+        stream.commit(n + 1)    # steps 0, ..., n are complete
+        stream.close()
+        data = read_stream('outputs/run.stream')
+        data['horizontal_velocity'][-1]
+"""
+
+import json
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+
+
+class StreamField:
+    """
+    Output buffer of one variable of a stream: assigning an output step
+    writes it to disk.
+    """
+
+    def __init__(self, writer, name):
+        self.writer = writer
+        self.name = name
+
+    def __setitem__(self, n, value):
+        self.writer.write(self.name, n, value)
+
+    def read(self):
+        return self.writer.read(self.name)
+
+
+class StreamWriter:
+    """
+    Writer of the stream fname with up to nmax output steps. With
+    restart=True the records of an existing stream are kept, such that a
+    restarted run continues it; its variables must have the same dtype and
+    record shape (ValueError otherwise).
+    """
+
+    def __init__(self, fname, params, nmax, restart=False):
+        self.fname = fname
+        self.params = params
+        self.nmax = nmax
+        self.restart = restart
+        self.arrays = {}
+        self.units = {}
+        self.ranges = {}
+        self.nsteps = 0
+        os.makedirs(fname, exist_ok=True)
+
+        # variables of the stream to be continued
+        self.stored = {}
+        header = os.path.join(fname, 'header.json')
+        if restart and os.path.exists(header):
+            with open(header) as f:
+                self.stored = json.load(f)['variables']
+
+    def field(self, name, shape, dtype=np.float64, units=None):
+        """
+        Add the variable name with records of the given shape.
+
+        Input:  field(name,shape,dtype,units)
+        Output: StreamField
+        """
+        path = os.path.join(self.fname, name + '.npy')
+        shape = (self.nmax,) + tuple(shape)
+        if self.restart and os.path.exists(path):
+            phi = np.load(path, mmap_mode='r+')
+            self._check(name, phi, shape, dtype)
+            if phi.shape != shape:
+                # continued with more output steps
+                tmp = path + '.tmp.npy'
+                new = open_memmap(tmp, 'w+', dtype, shape)
+                n = min(len(phi), len(new))
+                new[:n] = phi[:n]
+                new.flush()
+                del phi, new
+                os.replace(tmp, path)
+                phi = np.load(path, mmap_mode='r+')
+        else:
+            phi = open_memmap(path, 'w+', dtype, shape)
+
+        self.arrays[name] = phi
+        self.units[name] = units
+        self.ranges[name] = None
+        return StreamField(self, name)
+
+    def _check(self, name, phi, shape, dtype):
+        # the continued variable must have the dtype and record shape of
+        # the run and at most nmax output steps (in the file and header)
+        var = self.stored.get(name, {})
+        dtypes = {phi.dtype, np.dtype(var.get('dtype', phi.dtype))}
+        shapes = {phi.shape[1:], tuple(var.get('shape', phi.shape[1:]))}
+        if dtypes != {np.dtype(dtype)} or shapes != {shape[1:]}:
+            raise ValueError('StreamWriter: %s in %s is stored as %s %s, '
+                             'not as %s %s' % (name, self.fname,
+                                               '/'.join(map(str, dtypes)),
+                                               '/'.join(map(str, shapes)),
+                                               np.dtype(dtype), shape[1:]))
+        if len(phi) > self.nmax:
+            raise ValueError('StreamWriter: %s in %s has %d output steps, '
+                             'more than %d' % (name, self.fname, len(phi),
+                                               self.nmax))
+
+    def write(self, name, n, value):
+        """
+        Write the output step n of the variable name.
+        """
+        self.arrays[name][n] = value
+        self._extend(name, value)
+
+    def _extend(self, name, value):
+        # extend the value range of the variable name by value
+        lo, hi = float(np.nanmin(value)), float(np.nanmax(value))
+        if self.ranges[name] is not None:
+            lo = min(lo, self.ranges[name][0])
+            hi = max(hi, self.ranges[name][1])
+        self.ranges[name] = (lo, hi)
+
+    def commit(self, nsteps):
+        """
+        Mark the first nsteps output steps as complete.
+        """
+        self.nsteps = nsteps
+
+        header = {'params': self.params, 'nsteps': nsteps,
+                  'variables': {name: {'dtype': phi.dtype.str,
+                                       'shape': phi.shape[1:],
+                                       'units': self.units[name],
+                                       'range': self.ranges[name]}
+                                for name, phi in self.arrays.items()}}
+        fname = os.path.join(self.fname, 'header.json')
+        with open(fname + '.tmp', 'w') as f:
+            json.dump(header, f, indent=1)
+        os.replace(fname + '.tmp', fname)
+
+    def rewind(self, nsteps):
+        """
+        Continue after the first nsteps output steps (of a restart), the
+        later ones are written again.
+        """
+        for name, phi in self.arrays.items():
+            self.ranges[name] = None
+            if nsteps > 0:
+                self._extend(name, phi[:nsteps])
+        self.commit(nsteps)
+
+    def read(self, name):
+        """
+        Complete output steps of the variable name (memory mapped).
+        """
+        return self.arrays[name][:self.nsteps]
+
+    def close(self):
+        for phi in self.arrays.values():
+            phi.flush()
+        self.commit(self.nsteps)
+
+
+class StreamData(dict):
+    """
+    Parameters and variables of a stream (dict name: value), with the
+    value range of every variable.
+    """
+
+    def __init__(self, data, ranges):
+        super().__init__(data)
+        self.ranges = ranges
+
+    def range(self, name):
+        """
+        Minimum and maximum of the variable name (NaN ignored).
+        """
+        return self.ranges[name]
+
+    def close(self):
+        pass
+
+
+def read_stream(fname):
+    """
+    Parameters (as arrays) and complete output steps of all variables
+    (memory mapped) of the stream fname.
+
+    Input:  read_stream(fname)
+    Output: data (StreamData)
+    """
+    with open(os.path.join(fname, 'header.json')) as f:
+        header = json.load(f)
+
+    data = {name: np.asarray(value)
+            for name, value in header['params'].items()}
+    ranges = {}
+    for name, var in header['variables'].items():
+        phi = np.load(os.path.join(fname, name + '.npy'), mmap_mode='r')
+        data[name] = phi[:header['nsteps']]
+        ranges[name] = var['range']
+    return StreamData(data, ranges)
+
+# END OF STREAM.PY
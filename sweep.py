@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Parameter sweep over namelist variants, run in a pool of processes.
+
+The members of a sweep are namelist overrides of a base namelist, given
+either as a grid (all combinations of the values of every option) or as
+an explicit list. Several options can be varied together, e.g. the shear
+layer k_shl,k_sht. A member may select its own base namelist with the key
+'namelist'.
+
+Every member writes its output to <outdir>/<member>.npz. The summary
+index <outdir>/index.json lists the members with their overrides, output
+file and computation time. A member is finished when its output exists;
+rerunning an interrupted sweep skips the finished members.
+
+Usage:  python sweep.py namelist_ex4 outputs/sweep u00_sh=5.,10.,15. \\
+                        topomx=500,1000 k_shl,k_sht="(5,8),(6,12)"
+        python sweep.py namelist_ex5 outputs/sweep --members members.json
+        python sweep.py ... --workers 4
+
+        members.json: [{"topomx": 500}, {"namelist": "namelist_ex4"}, ...]
+"""
+
+import argparse
+import ast
+import contextlib
+import io
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import Config
+from model import run
+
+
+def grid(**values):
+    """
+    Members for all combinations of the values of every option. Options
+    varied together are given as one key 'a,b' with tuples of values.
+
+    Input:  grid(u00_sh=[5.,10.],**{'k_shl,k_sht': [(5,8),(6,12)]})
+    Output: [{'u00_sh': 5., 'k_shl': 5, 'k_sht': 8}, ...]
+    """
+    axes = []
+    for key, vals in values.items():
+        names = key.split(',')
+        if len(names) == 1:
+            axes.append([{key: v} for v in vals])
+        else:
+            axes.append([dict(zip(names, v)) for v in vals])
+
+    members = []
+    for combination in itertools.product(*axes):
+        member = {}
+        for overrides in combination:
+            member.update(overrides)
+        members.append(member)
+    return members
+
+
+def member_config(base, overrides, out_fname):
+    """
+    Configuration of a member: the namelist 'namelist' of the overrides
+    (default base) with the other overrides applied.
+    """
+    overrides = dict(overrides)
+    name = overrides.pop('namelist', base)
+    return Config.from_namelist(name, out_fname=out_fname, itime=0,
+                                iprtcfl=0, **overrides)
+
+
+def run_member(config, fname):
+    """
+    Run one member and move its output to fname.npz when it is complete.
+
+    Input:  run_member(config,fname)
+    Output: elapsed
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = run(config)
+        result.write()
+    os.replace(config.out_fname + '.npz', fname + '.npz')
+    return result.elapsed
+
+
+def write_index(outdir, base, members):
+    """
+    Write the summary index (atomically, it is rewritten as members finish).
+    """
+    fname = os.path.join(outdir, 'index.json')
+    with open(fname + '.tmp', 'w') as f:
+        json.dump({'namelist': base, 'members': members}, f, indent=1)
+    os.replace(fname + '.tmp', fname)
+
+
+def sweep(base, overrides, outdir, workers=None):
+    """
+    Run the members (list of namelist overrides) of the base namelist in a
+    pool of workers (default: number of cores) and write the outputs and
+    the summary index to outdir. Finished members are skipped.
+
+    Input:  sweep(base,overrides,outdir,workers)
+    Output: members (entries of the index)
+    """
+    os.makedirs(outdir, exist_ok=True)
+
+    # the overrides as stored in the index (tuples become lists)
+    overrides = json.loads(json.dumps(list(overrides)))
+
+    # an interrupted sweep is continued only with the same members
+    fname = os.path.join(outdir, 'index.json')
+    if os.path.exists(fname):
+        with open(fname) as f:
+            index = json.load(f)
+        if index['namelist'] != base or \
+                [m['overrides'] for m in index['members']] != overrides:
+            raise ValueError('sweep: %s holds a different sweep' % outdir)
+
+    members, todo = [], []
+    for n, member in enumerate(overrides):
+        name = 'member%04d' % n
+        path = os.path.join(outdir, name)
+        entry = {'name': name, 'overrides': member,
+                 'output': name + '.npz', 'elapsed': None}
+        if os.path.exists(fname):
+            entry['elapsed'] = index['members'][n]['elapsed']
+
+        # configurations are checked before any member is started
+        config = member_config(base, member, path + '.part')
+        if not os.path.exists(path + '.npz'):
+            todo.append((n, config, path))
+        members.append(entry)
+
+    write_index(outdir, base, members)
+    print('sweep: %d members, %d finished' % (len(members),
+                                             len(members) - len(todo)))
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(run_member, config, path): n
+                   for n, config, path in todo}
+        for future in as_completed(futures):
+            n = futures[future]
+            members[n]['elapsed'] = future.result()
+            write_index(outdir, base, members)
+            print('sweep: %s finished (%g s)' % (members[n]['name'],
+                                                 members[n]['elapsed']))
+
+    return members
+
+
+def parse_grid(args):
+    """
+    Grid of the command line arguments name=v1,v2,... (values are Python
+    literals; 'a,b=(1,2),(3,4)' varies a and b together).
+    """
+    values = {}
+    for arg in args:
+        key, vals = arg.split('=', 1)
+        values[key] = ast.literal_eval('[' + vals + ']')
+    return grid(**values)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parameter sweep over '
+                                     'namelist variants.')
+    parser.add_argument('namelist', help='base namelist, e.g. namelist_ex4')
+    parser.add_argument('outdir', help='output directory of the sweep')
+    parser.add_argument('grid', nargs='*', help='name=v1,v2,...')
+    parser.add_argument('--members', help='JSON file with a list of '
+                        'namelist overrides')
+    parser.add_argument('--workers', type=int, help='number of processes '
+                        '(default: number of cores)')
+    args = parser.parse_args()
+
+    if args.members:
+        with open(args.members) as f:
+            overrides = json.load(f)
+    else:
+        overrides = parse_grid(args.grid)
+
+    sweep(args.namelist, overrides, args.outdir, args.workers)
+
+# END OF SWEEP.PY
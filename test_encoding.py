@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Round trip of the quantized and compressed output (encoding.py): the
+fields written by write_output and read back with readsim are within the
+error bounds of out_quant.
+
+Usage:  python -m pytest test_encoding.py
+"""
+
+import numpy as np
+import pytest
+
+from config import Config
+from encoding import quantize, dequantize
+from output import write_output
+from readsim import readsim
+
+nout, nz, nx = 4, 10, 20
+
+# error bounds of the quantized variables: the range of the velocity fits
+# int16, the range of the isentropic density needs int32
+out_quant = {'horizontal_velocity': 1e-3, 'isentropic_density': 1e-3,
+             'specific_humidity': 1e-7}
+
+
+def tolerance(phi, bound):
+    # error bound up to the rounding of q*scale + offset
+    return bound + 4*np.finfo(np.float64).eps*np.max(np.abs(phi))
+
+
+def random_fields(seed):
+    rng = np.random.default_rng(seed)
+    Z = np.cumsum(rng.uniform(100., 300., (nout, nz, nx)), axis=1)
+    U = rng.uniform(-20., 20., (nout, nz, nx))
+    S = rng.uniform(0., 1000., (nout, nz, nx))
+    QV = rng.uniform(0., 1e-2, (nout, nz, nx))
+    return dict(Z=Z, U=U, S=S, QV=QV)
+
+
+@pytest.mark.parametrize('compress', ['zlib', 'lzma'])
+def test_round_trip(tmp_path, compress):
+    config = Config(nx=nx, nz=nz, out_fname=str(tmp_path / 'output'),
+                    out_quant=out_quant, out_compress=compress)
+    fields = random_fields(0)
+    T = 360.*np.arange(nout)
+    write_output(config, T, **fields)
+    fname = config.out_fname + '.npz'
+
+    # integer type of the stored variables
+    with np.load(fname) as data:
+        assert data['horizontal_velocity'].dtype == np.int16
+        assert data['isentropic_density'].dtype == np.int32
+        assert data['specific_humidity'].dtype == np.int16
+        assert data['height'].dtype == np.float64
+
+    var = readsim(fname, list(out_quant))
+    for name, key in (('horizontal_velocity', 'U'),
+                      ('isentropic_density', 'S'),
+                      ('specific_humidity', 'QV')):
+        phi = fields[key]
+        err = np.max(np.abs(var[name] - phi))
+        assert err <= tolerance(phi, out_quant[name]), name
+    assert np.array_equal(var.height, fields['Z'])
+
+
+@pytest.mark.parametrize('bound', [1e-1, 1e-3, 1e-5])
+def test_quantize(bound):
+    phi = random_fields(1)['U']
+    q, scale, offset = quantize(phi, bound)
+    # int16 up to 32767 steps of 2*bound on either side of the offset
+    if 20./(2*bound) <= np.iinfo(np.int16).max:
+        assert q.dtype == np.int16
+    else:
+        assert q.dtype == np.int32
+    err = np.max(np.abs(dequantize(q, scale, offset) - phi))
+    assert err <= tolerance(phi, bound)
+
+
+def test_quantize_constant():
+    phi = np.full((nz, nx), 273.15)
+    q, scale, offset = quantize(phi, 1e-3)
+    assert q.dtype == np.int16
+    assert np.array_equal(dequantize(q, scale, offset), phi)
+
+
+@pytest.mark.parametrize('bad', [np.nan, np.inf, -np.inf])
+def test_quantize_not_finite(tmp_path, bad):
+    fields = random_fields(2)
+    fields['U'][1, 2, 3] = bad
+    with pytest.raises(ValueError, match='not finite'):
+        quantize(fields['U'], 1e-3)
+
+    config = Config(nx=nx, nz=nz, out_fname=str(tmp_path / 'output'),
+                    out_quant=out_quant, out_compress='zlib')
+    with pytest.raises(ValueError, match='not finite'):
+        write_output(config, 360.*np.arange(nout), **fields)
+
+
+def test_quantize_bound():
+    phi = random_fields(3)['U']
+    with pytest.raises(ValueError, match='must be positive'):
+        quantize(phi, 0.)
+    with pytest.raises(ValueError, match='too small'):
+        quantize(phi, 1e-12)
+
+# END OF TEST_ENCODING.PY
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Ensemble test: every member of an ensemble run gives the output of the
+single run of its configuration.
+
+Usage:  python -m pytest test_ensemble.py
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from config import Config
+from model import run
+
+output_fields = ('Z', 'U', 'S', 'QV', 'QC', 'QR', 'PREC', 'TOT_PREC',
+                 'DTHETADT')
+
+# namelist and options of the ensemble cases: the dry case and a shortened
+# case with the Kessler scheme (clouds and rain form)
+cases = {
+    'dry': ('namelist_ex2', dict(time=2*60*60)),
+    'kessler': ('namelist_ex4', dict(time=3*60*60, iout=120)),
+}
+
+
+def quiet_run(config, members=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run(config, members)
+
+
+@pytest.mark.parametrize('case', sorted(cases))
+def test_identical_members(case):
+    name, options = cases[case]
+    config = Config.from_namelist(name, itime=0, iprtcfl=0, **options)
+
+    single = quiet_run(config)
+    ens = quiet_run(config, members=[{}, {}])
+    if config.imoist == 1:
+        assert np.max(single.QC) > 0 and np.max(single.QR) > 0
+
+    assert np.array_equal(ens.T, single.T)
+    for m in range(2):
+        member = ens.member(m)
+        assert member.config == config
+        for field in output_fields:
+            phi = getattr(single, field)
+            if phi is None:
+                assert getattr(member, field) is None
+            else:
+                assert np.array_equal(getattr(member, field), phi), field
+
+
+def test_two_moment():
+    config = Config.from_namelist('namelist_ex5', itime=0, iprtcfl=0)
+    with pytest.raises(ValueError, match='no ensemble with the two moment '
+                       'scheme'):
+        run(config, members=[{}, {}])
+
+# END OF TEST_ENSEMBLE.PY
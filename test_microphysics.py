@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the rain look-up tables, regression tests of the CCN
+activation lookup and of the rain sedimentation flux (microphysics.py)
+against the former loops over the points and levels, and a test of the
+restriction of the microphysics to the moist region (micro_thresh).
+
+Usage:  python -m pytest test_microphysics.py
+"""
+
+import contextlib
+import io
+import warnings
+
+import numpy as np
+import pytest
+
+from config import Config
+from model import run
+from microphysics import sedimentation_flux, rain_tables, rain_vq, \
+    rain_evap, rain_tab_rel_err, rain_x_min, rain_x_max, x_kink_sedi, \
+    x_kink_evap, interp_table2d, ltab_nuc, ncn_ind, wcb_ind
+
+# functions of the rain tables and their kinks
+rain_functions = {
+    'vq_cloud': (lambda x_r: rain_vq(x_r,True),x_kink_sedi),
+    'vq_rain': (lambda x_r: rain_vq(x_r,False),x_kink_sedi),
+    'mue1_lam': (lambda x_r: rain_evap(x_r)[0],x_kink_evap),
+    'vent': (lambda x_r: rain_evap(x_r)[1],x_kink_evap),
+    'gamma_eva': (lambda x_r: rain_evap(x_r)[2],x_kink_evap),
+}
+
+
+def test_rain_tables_cached():
+    assert set(rain_tables()) == set(rain_functions)
+    assert rain_tables() is rain_tables()
+
+
+@pytest.mark.parametrize('name',sorted(rain_functions))
+def test_rain_table(name):
+    f,x_kink = rain_functions[name]
+    tab = rain_tables()[name]
+    assert tab.max_rel_err() <= rain_tab_rel_err
+
+    # random mean masses, and the ends of the table
+    rng = np.random.default_rng(0)
+    x_r = np.exp(rng.uniform(np.log(rain_x_min),np.log(rain_x_max),1000))
+    x_r = np.append(x_r,[rain_x_min,x_kink,rain_x_max])
+    err = np.max(np.abs(tab(x_r)-f(x_r)))/np.max(np.abs(tab.val))
+    assert err <= rain_tab_rel_err
+
+
+def nccn_loop(n_cn,w_cb):
+    """
+    Former lookup of the activated CCN in the Seifert scheme, point by
+    point.
+
+    Input:  nccn_loop(n_cn,w_cb)
+    Output: nccn
+    """
+    nccn = np.zeros(n_cn.shape)
+    for j in range(len(n_cn)):
+        maty, = np.where(wcb_ind>w_cb[j])
+        matx, = np.where(ncn_ind>n_cn[j])
+
+        if (not np.any(matx)):
+            matx=1
+        if (not np.any(maty)):
+            maty=1
+
+        locy = np.min(maty)-1
+        locx = np.min(matx)-1
+        if (locx<8) and (locy<4):
+            indx0 = (n_cn[j]-ncn_ind[locx])/(ncn_ind[locx+1]-ncn_ind[locx])
+            indx1 = 1-indx0
+            indy0 = (w_cb[j]-wcb_ind[locy])/(wcb_ind[locy+1]-wcb_ind[locy])
+            indy1 = 1-indy0
+            nccn[j] = (indx0*ltab_nuc[locy,locx]+indx1*ltab_nuc[locy,locx+1])*indy0+\
+                (indx0*ltab_nuc[locy+1,locx]+indx1*ltab_nuc[locy+1,locx+1])*indy1
+        elif (locx<8) and (locy>=4):
+            indx0 = (n_cn[j]-ncn_ind[locx])/(ncn_ind[locx+1]-ncn_ind[locx])
+            indx1 = 1-indx0
+            locy = np.min([locy,4])
+            nccn[j] = indx0*ltab_nuc[locy,locx]+indx1*ltab_nuc[locy,locx+1]
+        elif (locy<4) and (locx>=8):
+            indy0 = (w_cb[j]-wcb_ind[locy])/(wcb_ind[locy+1]-wcb_ind[locy])
+            indy1 = 1-indy0
+            locx = np.min([locx,8])
+            nccn[j] = ltab_nuc[locy,locx]*indy0+ltab_nuc[locy+1,locy]*indy1
+        else:
+            locy = 4
+            locx = 8
+            nccn[j] = ltab_nuc[locy,locx]
+    return nccn
+
+
+def test_nccn_lookup():
+    # updrafts and CN numbers inside and beyond the table, and at its nodes
+    rng = np.random.default_rng(0)
+    w_cb = np.concatenate((rng.uniform(1e-3,8.,2000),wcb_ind[1:],
+                           rng.uniform(1e-3,8.,len(ncn_ind))))
+    n_cn = np.concatenate((rng.uniform(0.,8000e6,2000),
+                           rng.uniform(0.,8000e6,len(wcb_ind)-1),ncn_ind))
+    nccn = interp_table2d(n_cn,w_cb,ncn_ind,wcb_ind,ltab_nuc)
+    assert np.array_equal(nccn,nccn_loop(n_cn,w_cb))
+
+
+def sedimentation_flux_loop(phi,v,adz,dt_sedi):
+    """
+    Former sedimentation flux of the Seifert scheme, level by level from the
+    top. For Courant numbers > 1 all columns share the level counter kk,
+    such that the partial departure level is only right for a single
+    column (see test_sedimentation_flux).
+
+    Input:  sedimentation_flux_loop(phi,v,adz,dt_sedi)
+    Output: flux
+    """
+    nxb,nz = adz.shape
+    flux = np.zeros((nxb,nz))
+    for k in range(nz-2,-1,-1):
+        v_v = 0.5*(v[:,k+1]+v[:,k])
+        c_v = -v_v*adz[:,k]*dt_sedi
+
+        kk = k
+        s_v = np.zeros((nxb))
+        s_v[c_v<=1] = v_v[c_v<=1]*phi[c_v<=1,k]
+        if np.any(c_v > 1):
+            cflag = np.zeros((nxb),dtype=bool)
+            while (np.any(c_v > 1) and (kk<nz-1)):
+                ind = (c_v>1)
+                cflag[ind] = True
+                s_v[ind] = s_v[ind]+phi[ind,kk]/adz[ind,kk]
+                c_v[ind] = (c_v[ind]-1)*adz[ind,kk+1]/adz[ind,kk]
+                kk = kk+1
+            s_v[cflag] = s_v[cflag]+phi[cflag,kk]/adz[cflag,kk]* \
+                np.minimum(c_v[cflag],1.0)
+            s_v[cflag] = -s_v[cflag]/dt_sedi
+
+        # Flux-limiter to avoid negative values
+        flux[:,k] = np.maximum(s_v,flux[:,k+1]-phi[:,k]/(adz[:,k]*dt_sedi))
+
+    # uppper boundary condition
+    flux[:,nz-1] = 0.0
+
+    return flux
+
+
+def random_columns(seed,nxb=40,nz=30,vmax=30.):
+    """
+    Random rain columns: layer depths of 50 to 500 m, fall velocities up to
+    vmax (Courant numbers up to about 6 for dt_sedi = 10 s), some columns
+    without fall speed and some without rain.
+    """
+    rng = np.random.default_rng(seed)
+    adz = 1./rng.uniform(50.,500.,(nxb,nz))
+    v = -rng.uniform(0.,vmax,(nxb,nz))
+    phi = rng.uniform(0.,1e-3,(nxb,nz))
+    # sparse rain, as in the model
+    phi[rng.random((nxb,nz)) < 0.3] = 0.
+    v[:4] = 0.
+    phi[4:8] = 0.
+    v[8:12,:nz//2] = 0.
+    return phi,v,adz
+
+
+@pytest.mark.parametrize('seed',range(10))
+@pytest.mark.parametrize('vmax',[1.,30.])
+def test_sedimentation_flux(seed,vmax):
+    phi,v,adz = random_columns(seed,vmax=vmax)
+    dt_sedi = 10.
+    c = -0.5*(v[:,1:]+v[:,:-1])*adz[:,:-1]*dt_sedi
+    if vmax > 1.:
+        assert np.any(c > 1)
+
+    flux = sedimentation_flux(phi,v,adz,dt_sedi)
+    if vmax > 1.:
+        # the former loop column by column (each with its own departure
+        # levels)
+        expected = np.concatenate([
+            sedimentation_flux_loop(phi[i:i+1],v[i:i+1],adz[i:i+1],dt_sedi)
+            for i in range(len(adz))])
+        # (the cumulative sums lose a few digits of fluxes much smaller
+        # than the largest one)
+        np.testing.assert_allclose(flux,expected,rtol=1e-12,
+                                   atol=1e-12*np.max(np.abs(expected)))
+    else:
+        expected = sedimentation_flux_loop(phi,v,adz,dt_sedi)
+        np.testing.assert_array_equal(flux,expected)
+
+
+def test_sedimentation_flux_zero():
+    phi,v,adz = random_columns(0)
+    flux = sedimentation_flux(np.zeros_like(phi),v,adz,10.)
+    assert np.array_equal(flux,np.zeros_like(phi))
+    flux = sedimentation_flux(phi,np.zeros_like(v),adz,10.)
+    assert np.array_equal(flux,np.zeros_like(phi))
+
+
+def test_sedimentation_flux_stack():
+    # a stack of fields (number density and mixing ratio) at once
+    phi1,v1,adz = random_columns(1)
+    phi2,v2,_ = random_columns(2)
+    phi2 = 1e6*phi2
+    flux = sedimentation_flux(np.stack((phi1,phi2)),np.stack((v1,v2)),adz,
+                              10.)
+    np.testing.assert_array_equal(flux[0],
+                                  sedimentation_flux(phi1,v1,adz,10.))
+    np.testing.assert_array_equal(flux[1],
+                                  sedimentation_flux(phi2,v2,adz,10.))
+
+
+# micro_thresh cases: namelist (Kessler or two moment scheme, shortened to
+# the formation of clouds and rain) and the bound of the difference to the
+# microphysics on the full domain (micro_thresh = -1), relative to the
+# largest value of each field. The Kessler scheme gives the same result,
+# the two moment scheme differs in the last digits.
+thresh_cases = {
+    'kessler': ('namelist_ex4', 0.),
+    'seifert': ('namelist_ex5', 1e-12),
+}
+
+
+@pytest.mark.parametrize('case',sorted(thresh_cases))
+def test_micro_thresh(case):
+    name, rel_err = thresh_cases[case]
+    results = []
+    for micro_thresh in (-1., Config.micro_thresh):
+        config = Config.from_namelist(name,time=3*60*60,iout=120,itime=0,
+                                      iprtcfl=0,micro_thresh=micro_thresh)
+        with contextlib.redirect_stdout(io.StringIO()), \
+                warnings.catch_warnings():
+            warnings.simplefilter('ignore',RuntimeWarning)
+            results.append(run(config))
+    full, thresh = results
+    assert np.max(full.QC) > 0 and np.max(full.QR) > 0
+
+    for field in ('U','S','QV','QC','QR','PREC','TOT_PREC','NR','NC',
+                  'DTHETADT'):
+        phi = getattr(full,field)
+        if phi is None:
+            continue
+        err = np.max(np.abs(getattr(thresh,field)-phi))
+        assert err <= rel_err*np.max(np.abs(phi)), field
+
+# END OF TEST_MICROPHYSICS.PY
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Restart test: a run continued from its checkpoint gives the same output as
+an uninterrupted run.
+
+Usage:  python -m pytest test_restart.py
+"""
+
+import contextlib
+import io
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from config import Config
+from checkpoint import read_checkpoint
+from model import run
+
+output_fields = ('Z', 'U', 'S', 'QV', 'QC', 'QR', 'PREC', 'TOT_PREC', 'NR',
+                 'NC', 'DTHETADT')
+
+# namelist and options of the restart cases: the dry case and a shortened
+# moist case with the two moment scheme and latent heating (clouds and
+# rain form within the first half, the restart falls between two output
+# steps)
+cases = {
+    'dry': ('namelist_ex2', {}),
+    'moist': ('namelist_ex5', dict(time=3*60*60, iout=120)),
+}
+
+
+def quiet_run(config):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run(config)
+
+
+@pytest.mark.parametrize('istream', [0, 1])
+@pytest.mark.parametrize('case', sorted(cases))
+def test_restart(tmp_path, case, istream):
+    name, options = cases[case]
+    config = Config.from_namelist(name, itime=0, iprtcfl=0, istream=istream,
+                                  **options)
+
+    full = quiet_run(replace(config, out_fname=str(tmp_path / 'full')))
+    if config.imoist == 1:
+        assert np.max(full.QC) > 0 and np.max(full.QR) > 0
+
+    # first half with a checkpoint after every step, then the restart
+    fname = str(tmp_path / 'restart')
+    quiet_run(replace(config, out_fname=fname, time=config.time/2,
+                      icheckpoint=1))
+    assert read_checkpoint(fname + '_checkpoint')['its'] == config.nts/2
+    restart = quiet_run(replace(config, out_fname=fname, irestart=1))
+
+    assert np.array_equal(restart.T, full.T)
+    for name in output_fields:
+        phi = getattr(full, name)
+        if phi is None:
+            assert getattr(restart, name) is None
+        else:
+            assert np.array_equal(getattr(restart, name), phi), name
+
+# END OF TEST_RESTART.PY
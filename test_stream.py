@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the streamed output (stream.py).
+
+Usage:  python -m pytest test_stream.py
+"""
+
+import numpy as np
+import pytest
+
+from stream import StreamWriter, read_stream
+
+
+def write_stream(fname, nmax, nsteps, dtype=np.float64, shape=(3, 4),
+                 restart=False, start=0):
+    stream = StreamWriter(fname, {'nx': 4}, nmax, restart)
+    U = stream.field('u', shape, dtype, 'm/s')
+    for n in range(start, nsteps):
+        U[n] = np.full(shape, n)
+        stream.commit(n + 1)
+    stream.close()
+
+
+def test_read(tmp_path):
+    fname = str(tmp_path / 'run.stream')
+    write_stream(fname, 5, 3)
+    data = read_stream(fname)
+    assert data['u'].shape == (3, 3, 4)
+    assert np.array_equal(data['u'][:, 0, 0], [0, 1, 2])
+    assert data.range('u') == [0, 2]
+
+
+def test_restart(tmp_path):
+    # continued with more output steps
+    fname = str(tmp_path / 'run.stream')
+    write_stream(fname, 5, 3)
+    write_stream(fname, 8, 8, restart=True, start=3)
+    data = read_stream(fname)
+    assert np.array_equal(data['u'][:, 0, 0], np.arange(8))
+
+
+@pytest.mark.parametrize('change', [dict(dtype=np.float32),
+                                    dict(shape=(3, 5)),
+                                    dict(nmax=4, nsteps=4)])
+def test_restart_mismatch(tmp_path, change):
+    fname = str(tmp_path / 'run.stream')
+    write_stream(fname, 5, 3)
+    options = dict(dict(nmax=5, nsteps=5), **change)
+    with pytest.raises(ValueError):
+        write_stream(fname, restart=True, start=3, **options)
+
+# END OF TEST_STREAM.PY
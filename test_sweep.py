@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the parameter sweep (sweep.py): the expansion of the grid, and
+the continuation of an interrupted sweep.
+
+Usage:  python -m pytest test_sweep.py
+"""
+
+import contextlib
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+
+from sweep import grid, parse_grid, sweep
+
+# short members of the dry namelist (10 time steps)
+base = 'namelist_ex2'
+members = [{'time': 100., 'iout': 5, 'u00': 10.},
+           {'time': 100., 'iout': 5, 'u00': 15.}]
+
+
+def quiet_sweep(overrides, outdir):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return sweep(base, overrides, str(outdir), workers=1)
+
+
+def read_index(outdir):
+    with open(os.path.join(outdir, 'index.json')) as f:
+        return json.load(f)
+
+
+def test_grid():
+    assert grid(u00=[10., 15.]) == [{'u00': 10.}, {'u00': 15.}]
+    assert grid(u00=[10., 15.], topomx=[500, 1000]) == [
+        {'u00': 10., 'topomx': 500}, {'u00': 10., 'topomx': 1000},
+        {'u00': 15., 'topomx': 500}, {'u00': 15., 'topomx': 1000}]
+
+
+def test_grid_joint():
+    # k_shl and k_sht varied together, combined with u00_sh
+    values = {'u00_sh': [5., 10.], 'k_shl,k_sht': [(5, 8), (6, 12)]}
+    assert grid(**values) == [
+        {'u00_sh': 5., 'k_shl': 5, 'k_sht': 8},
+        {'u00_sh': 5., 'k_shl': 6, 'k_sht': 12},
+        {'u00_sh': 10., 'k_shl': 5, 'k_sht': 8},
+        {'u00_sh': 10., 'k_shl': 6, 'k_sht': 12}]
+    assert parse_grid(['u00_sh=5.,10.', 'k_shl,k_sht=(5,8),(6,12)']) == \
+        grid(**values)
+
+
+def test_resume(tmp_path):
+    outdir = tmp_path / 'sweep'
+    first = quiet_sweep(members, outdir)
+    assert [m['overrides'] for m in first] == members
+    assert all(m['elapsed'] is not None for m in first)
+    assert read_index(outdir)['members'] == first
+
+    # interrupted before the second member finished
+    os.remove(outdir / 'member0001.npz')
+    stat0 = os.stat(outdir / 'member0000.npz')
+    u0 = np.load(outdir / 'member0000.npz')['horizontal_velocity']
+
+    # the finished member is skipped and keeps its entry; the overrides
+    # are given as tuples, stored as lists in the index
+    resumed = quiet_sweep(tuple(members), outdir)
+    assert os.stat(outdir / 'member0000.npz').st_mtime_ns == \
+        stat0.st_mtime_ns
+    assert resumed[0] == first[0]
+    assert os.path.exists(outdir / 'member0001.npz')
+    assert read_index(outdir)['members'] == resumed
+    assert not np.array_equal(
+        np.load(outdir / 'member0001.npz')['horizontal_velocity'], u0)
+
+
+def test_resume_tuples(tmp_path):
+    # a finished sweep whose index holds a tuple value as a list (the value
+    # is only compared, the finished member is not run again)
+    outdir = tmp_path / 'sweep'
+    os.makedirs(outdir)
+    entry = {'name': 'member0000', 'overrides': {'u00': [10., 15.]},
+             'output': 'member0000.npz', 'elapsed': 1.}
+    with open(outdir / 'index.json', 'w') as f:
+        json.dump({'namelist': base, 'members': [entry]}, f)
+    open(outdir / 'member0000.npz', 'w').close()
+
+    assert quiet_sweep([{'u00': (10., 15.)}], outdir) == [entry]
+
+
+@pytest.mark.parametrize('other', ['overrides', 'namelist'])
+def test_different_sweep(tmp_path, other):
+    outdir = tmp_path / 'sweep'
+    quiet_sweep(members[:1], outdir)
+    with pytest.raises(ValueError, match='different sweep'):
+        if other == 'overrides':
+            quiet_sweep(members, outdir)
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                sweep('namelist_ex4', members[:1], str(outdir), workers=1)
+
+# END OF TEST_SWEEP.PY
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the look-up tables of thermo_tables.py.
+
+Usage:  python -m pytest test_thermo_tables.py
+"""
+
+import numpy as np
+
+import meteo_utilities
+from thermo_tables import T_tab_min, T_tab_max, tab_rel_err, eswat1_table, \
+    eswat1_function
+
+
+def test_max_rel_err():
+    assert eswat1_table().max_rel_err() <= tab_rel_err
+
+
+def test_eswat1_function():
+    assert eswat1_function(1) is eswat1_table()
+    assert eswat1_function(0) is meteo_utilities.eswat1
+
+
+def test_outside():
+    # the exact formula outside the table, at the nodes the tabulated values
+    tab = eswat1_table()
+    T = np.array([100.,T_tab_min,273.15,T_tab_max,400.])
+    exact = meteo_utilities.eswat1(T)
+    assert np.array_equal(tab(T)[[0,4]],exact[[0,4]])
+    np.testing.assert_allclose(tab(T),exact,rtol=tab_rel_err)
+
+
+def test_non_finite():
+    tab = eswat1_table()
+    T = np.array([[280.,np.nan],[np.inf,-np.inf]])
+    fT = tab(T)
+    assert fT.shape == T.shape
+    assert np.isnan(fT[0,1]) and np.isnan(fT[1,0]) and np.isnan(fT[1,1])
+    assert fT[0,0] == tab(280.)
+    assert np.isnan(tab(np.nan))
+
+# END OF TEST_THERMO_TABLES.PY
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Look-up tables for thermodynamic functions of temperature.
+
+The saturation vapor pressure eswat1 (Goff-Gratch, hPa) is tabulated
+over the temperature range of the model at a resolution of dT_tab and
+served by linear interpolation, which is about four times faster than
+the formula. Temperatures outside the table are evaluated with the exact
+formula, non-finite temperatures give NaN. The maximum relative
+interpolation error is bounded by tab_rel_err (see test_thermo_tables.py).
+(The Magnus formula eswat2 with
+a single exponential is faster than any table look-up and is not
+tabulated.)
+
+With ithermo_tab = 0 the exact formula of meteo_utilities is used
+instead (e.g. for reference runs), see eswat1_function.
+"""
+
+import functools
+import numpy as np
+import meteo_utilities
+
+# temperature range [K] and resolution [K] of the tables
+T_tab_min = 150.
+T_tab_max = 350.
+dT_tab = 0.01
+
+# bound of the relative interpolation error
+tab_rel_err = 2e-6
+
+
+class ThermoTable:
+    """
+    Table of a function f(T) on the equidistant temperatures
+    T_min, T_min+dT, ..., T_max with linear interpolation. Temperatures
+    outside [T_min,T_max] are passed to f, non-finite temperatures give NaN.
+
+    Usage:  tab = ThermoTable(f,T_min,T_max,dT)
+            fT = tab(T)
+    """
+
+    def __init__(self,f,T_min,T_max,dT):
+        self.f = f
+        self.T_min = T_min
+        self.dT = dT
+        self.n = int(round((T_max-T_min)/dT)) + 1
+        self.T_max = T_min + (self.n-1)*dT
+
+        # values at the nodes and differences to the next node
+        self.val = f(T_min + dT*np.arange(self.n))
+        self.dval = np.append(np.diff(self.val),0.)
+
+    def __call__(self,T):
+        T = np.asarray(T,dtype=np.float64)
+
+        # non-finite temperatures are looked up at T_min and set to NaN
+        # (the index of NaN or inf is undefined)
+        bad = ~np.isfinite(T)
+        if np.any(bad):
+            T = np.where(bad,self.T_min,T)
+
+        x = np.clip((T - self.T_min)/self.dT,0,self.n-1)
+        i = x.astype(np.intp)
+        fT = np.asarray(self.val[i])
+        fT += (x-i)*self.dval[i]
+
+        # exact formula outside the table
+        out = (T < self.T_min) | (T > self.T_max)
+        if np.any(out):
+            fT[out] = self.f(T[out])
+
+        if np.any(bad):
+            fT[bad] = np.nan
+
+        return fT
+
+    def max_rel_err(self):
+        """
+        Maximum relative interpolation error, attained between the nodes.
+        """
+        T = self.T_min + self.dT*(np.arange(self.n-1) + 0.5)
+        exact = self.f(T)
+        return np.max(np.abs(self(T)-exact)/exact)
+
+
+@functools.lru_cache(maxsize=None)
+def eswat1_table():
+    """
+    Table of eswat1, built at the first call.
+
+    Input:  eswat1_table()
+    Output: tab
+    """
+    return ThermoTable(meteo_utilities.eswat1,T_tab_min,T_tab_max,dT_tab)
+
+
+def eswat1_function(ithermo_tab):
+    """
+    Saturation vapor pressure eswat1(T) [hPa] used by the microphysics:
+    the table for ithermo_tab = 1, otherwise the exact formula.
+
+    Input:  eswat1_function(ithermo_tab)
+    Output: eswat1
+    """
+    if ithermo_tab == 1:
+        return eswat1_table()
+    return meteo_utilities.eswat1
+
+# END OF THERMO_TABLES.PY
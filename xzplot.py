@@ -233,11 +233,11 @@ def plot_dict(args, var, varnames):
         # If no limits are given, they will be set automatically according
         # to the values in the data.
         if np.isnan(vMinInt):
-            minVel = scale * np.nanmin(var.horizontal_velocity)
+            minVel = scale * var.ranges['horizontal_velocity'][0]
             vciDiff = int((var.u00 - minVel) / args.vci + 0.5)
             vMinInt = var.u00 - vciDiff * args.vci
         if np.isnan(vMaxInt):
-            maxVel = scale * np.nanmax(var.horizontal_velocity)
+            maxVel = scale * var.ranges['horizontal_velocity'][1]
             vciDiff = int((maxVel - var.u00) / args.vci + 0.5)
             vMaxInt = var.u00 + vciDiff * args.vci
         
@@ -256,7 +256,7 @@ def plot_dict(args, var, varnames):
         # If no upper limit is given, it will be set automatically
         # according to the values in the data.
         if np.isnan(vMaxInt):
-            maxQv = scale * np.nanmax(var.specific_humidity)
+            maxQv = scale * var.ranges['specific_humidity'][1]
             qvciDiff = int((maxQv - vMinInt) / args.qvci + 1.)
             vMaxInt = vMinInt + qvciDiff * args.qvci
         
@@ -275,7 +275,7 @@ def plot_dict(args, var, varnames):
         # If no upper limit is given, it will be set automatically
         # according to the values in the data.
         if np.isnan(vMaxInt):
-            maxQc = scale * np.nanmax(var.specific_cloud_liquid_water_content)
+            maxQc = scale * var.ranges['specific_cloud_liquid_water_content'][1]
             qcciDiff = int((maxQc - vMinInt) / args.qcci + 1.)
             vMaxInt = vMinInt + qcciDiff * args.qcci
         
@@ -294,7 +294,7 @@ def plot_dict(args, var, varnames):
         # If no upper limit is given, it will be set automatically
         # according to the values in the data.
         if np.isnan(vMaxInt):
-            maxNc = scale * np.nanmax(var.cloud_number_density)
+            maxNc = scale * var.ranges['cloud_number_density'][1]
             ncciDiff = int((maxNc - vMinInt) / args.ncci + 1.)
             vMaxInt = vMinInt + ncciDiff * args.ncci
         
@@ -313,7 +313,7 @@ def plot_dict(args, var, varnames):
         # If no upper limit is given, it will be set automatically
         # according to the values in the data.
         if np.isnan(vMaxInt):
-            maxNr = scale * np.nanmax(var.rain_number_density)
+            maxNr = scale * var.ranges['rain_number_density'][1]
             nrciDiff = int((maxNr - vMinInt) / args.nrci + 1.)
             vMaxInt = vMinInt + nrciDiff * args.nrci
         
@@ -332,7 +332,7 @@ def plot_dict(args, var, varnames):
         # If no upper limit is given, it will be set automatically
         # according to the values in the data.
         if np.isnan(vMaxInt):
-            maxQr = scale * np.nanmax(var.specific_rain_water_content)
+            maxQr = scale * var.ranges['specific_rain_water_content'][1]
             qrciDiff = int((maxQr - vMinInt) / args.qrci + 1.)
             vMaxInt = vMinInt + qrciDiff * args.qrci
             if (vMaxInt - vMinInt) / args.qrci < 1.:
@@ -415,7 +415,7 @@ def plot_figure(varnames, var, timestep, plot_cbar):
             # If no upper limit is given, it will be set automatically
             # according to the values in the data.
             if np.isnan(vMaxInt):
-                maxTp = np.nanmax(var.accumulated_precipitation[:, :])
+                maxTp = var.ranges['accumulated_precipitation'][1]
                 tpDiff = int((maxTp - vMinInt) / tpi + 1.)
                 vMaxInt = vMinInt + tpDiff * tpi
         